@@ -1,13 +1,17 @@
 '''
 Key Value Store Management Router
 '''
+import os
 from waitress import serve
 from flask import Flask, jsonify, request, send_file
 from logic import DatasetDistributor
 from helpers.file import get_OK_file
+from helpers.unix_socket import serve_unix_socket
 
 app = Flask(__name__)
 
+UNIX_SOCKET = os.getenv('UNIX_SOCKET', '')
+
 
 datasetDistributor = DatasetDistributor()
 
@@ -99,5 +103,9 @@ def get_dataset_metadata():
 
 
 if __name__ == '__main__':
+    # also listen on a unix socket, for the nodes on this host
+    if UNIX_SOCKET:
+        serve_unix_socket(app, UNIX_SOCKET)
+
     app.run(port=8888, debug=False, host='0.0.0.0')
     # serve(app, host="0.0.0.0", port=8888)
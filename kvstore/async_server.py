@@ -0,0 +1,642 @@
+'''
+Asyncio HTTP Server for the Key Value Store
+
+Serves the same HTTP API as the Flask app in main.py, on a single event loop
+with keep-alive connections, so that thousands of concurrent uploads do not
+need a thread each. Request bodies are streamed into a single preallocated
+buffer while being hashed, and values are written out without copies,
+using sendfile for the values held on disk.
+'''
+import os
+import json
+import struct
+import asyncio
+import traceback
+from time import perf_counter
+from typing import Union
+from hashlib import md5
+from urllib.parse import urlsplit, parse_qs
+from key_val_store import KeyValueStore
+from framing import pack_get_frame, PUT_FRAME_FORMAT, PUT_FRAME_SIZE
+from transfer import UploadSessions, parse_range
+from metrics import RouteMetrics
+
+# size of the chunks request bodies are read in, and in-memory values are written in
+CHUNK_SIZE = 1024 * 1024
+
+# limit of the request line and headers
+HEADER_LIMIT = 64 * 1024
+
+STATUS_TEXT = {200: 'OK', 206: 'Partial Content', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 406: 'Not Acceptable', 409: 'Conflict', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    '''
+    Error with an HTTP status, sent as the reply
+    '''
+
+    def __init__(self, status: int):
+        super().__init__(STATUS_TEXT.get(status, ''))
+        self.status = status
+
+
+class Request:
+    '''
+    Parsed HTTP request, the body is left on the stream
+    '''
+
+    def __init__(self, method: str, path: str, args: dict, headers: dict, reader: asyncio.StreamReader):
+        self.method = method
+        self.path = path
+        self.args = args
+        self.headers = headers
+        self.reader = reader
+
+        self.chunked = headers.get(
+            'transfer-encoding', '').lower() == 'chunked'
+        self.remaining = int(headers.get('content-length', '0'))
+
+    async def read(self, size: int) -> bytes:
+        '''
+        Read up to size bytes of the body, b'' at its end
+        '''
+        if self.chunked:
+            if self.remaining == 0:
+                line = await self.reader.readline()
+                self.remaining = int(line.split(b';')[0].strip() or b'0', 16)
+
+                if self.remaining == 0:
+                    # consume the trailers up to the final blank line
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    self.chunked = False
+                    return b''
+
+            chunk = await self.reader.read(min(size, self.remaining))
+            self.remaining -= len(chunk)
+
+            if self.remaining == 0:
+                await self.reader.readline()
+
+            return chunk
+
+        if self.remaining == 0:
+            return b''
+
+        chunk = await self.reader.read(min(size, self.remaining))
+        if not chunk:
+            raise HTTPError(400)
+
+        self.remaining -= len(chunk)
+
+        return chunk
+
+    async def read_into(self, size: int, hasher=None) -> bytearray:
+        '''
+        Read exactly size bytes of the body into a preallocated buffer,
+        updating the hasher on the way
+        '''
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+
+        position = 0
+        while position < size:
+            chunk = await self.read(min(CHUNK_SIZE, size - position))
+            if not chunk:
+                raise HTTPError(400)
+
+            view[position:position + len(chunk)] = chunk
+            if hasher is not None:
+                hasher.update(chunk)
+            position += len(chunk)
+
+        return buffer
+
+    async def read_body(self) -> bytearray:
+        '''
+        Read the whole body, into a single buffer if the length is known
+        '''
+        if not self.chunked:
+            return await self.read_into(self.remaining)
+
+        buffer = bytearray()
+        while True:
+            chunk = await self.read(CHUNK_SIZE)
+            if not chunk:
+                return buffer
+            buffer += chunk
+
+    async def read_json(self):
+        '''
+        Read the body as JSON
+        '''
+        try:
+            return json.loads(await self.read_body())
+        except ValueError as e:
+            raise HTTPError(400) from e
+
+
+class AsyncServer:
+    '''
+    Asyncio Server Class, routes the requests of each keep-alive connection
+    to the handlers of the key value store API
+    '''
+
+    def __init__(self, store: KeyValueStore, uploads: UploadSessions, metrics: RouteMetrics):
+        self.store = store
+        self.uploads = uploads
+        self.metrics = metrics
+
+        self.routes = {
+            ('GET', '/'): self.root,
+            ('GET', '/get'): self.get_val,
+            ('GET', '/delete'): self.delete_val,
+            ('POST', '/set'): self.set_val,
+            ('POST', '/blob/put'): self.put_blob,
+            ('POST', '/blob/upload'): self.create_upload,
+            ('POST', '/mget'): self.mget_blobs,
+            ('POST', '/mput'): self.mput_blobs,
+            ('POST', '/namespace/retire'): self.retire_namespace,
+            ('POST', '/namespace/drop_job'): self.drop_job_namespace,
+            ('GET', '/keys'): self.list_keys,
+            ('GET', '/size'): self.get_size,
+            ('GET', '/metrics'): self.get_metrics,
+        }
+
+    async def serve(self, host: str, port: int, unix_path: Union[str, None] = None) -> None:
+        '''
+        Serve forever on host:port, and on the unix socket if given
+        '''
+        server = await asyncio.start_server(self.handle_connection, host, port,
+                                            limit=HEADER_LIMIT, backlog=4096)
+
+        print(f'Asyncio KVStore server listening on {host}:{port}')
+
+        servers = [server]
+        if unix_path is not None:
+            # replace a leftover socket file of a previous run
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+
+            servers.append(await asyncio.start_unix_server(self.handle_connection, unix_path,
+                                                           limit=HEADER_LIMIT, backlog=4096))
+
+            print(f'Asyncio KVStore server listening on unix://{unix_path}')
+
+        await asyncio.gather(*[server.serve_forever() for server in servers])
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Serve the requests of a connection, one after the other
+        '''
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+
+                keep_alive = request.headers.get(
+                    'connection', '').lower() != 'close'
+
+                start_time = perf_counter()
+                status = 200
+
+                try:
+                    await self.dispatch(request, writer)
+                except HTTPError as e:
+                    status = e.status
+                    await self.send_json(writer, {'status': False}, e.status, keep_alive=False)
+                    keep_alive = False
+                except KeyError:
+                    status = 400
+                    await self.send_json(writer, {'status': False}, 400, keep_alive=False)
+                    keep_alive = False
+                except Exception:
+                    traceback.print_exc()
+                    status = 500
+                    await self.send_json(writer, {'status': False}, 500, keep_alive=False)
+                    keep_alive = False
+
+                self.metrics.observe(self.route_label(request),
+                                     perf_counter() - start_time, status)
+
+                # drain any unread body, to keep the connection in sync
+                while keep_alive and (await request.read(CHUNK_SIZE)):
+                    pass
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        '''
+        Read and parse the request line and the headers, None at the end of the connection
+        '''
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            return None
+
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+
+        headers = dict()
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        args = {name: values[0]
+                for name, values in parse_qs(url.query).items()}
+
+        return Request(method, url.path, args, headers, reader)
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        Route a request to its handler
+        '''
+        if request.method == 'GET' and request.path.startswith('/blob/get/'):
+            await self.get_blob(request, writer, request.path[len('/blob/get/'):])
+            return
+
+        if request.path.startswith('/blob/upload/'):
+            upload_id, _, action = request.path[len(
+                '/blob/upload/'):].partition('/')
+
+            if request.method == 'GET' and action == '':
+                await self.upload_status(request, writer, upload_id)
+            elif request.method == 'PUT' and action == '':
+                await self.upload_chunk(request, writer, upload_id)
+            elif request.method == 'POST' and action == 'commit':
+                await self.commit_upload(request, writer, upload_id)
+            else:
+                raise HTTPError(404)
+            return
+
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            raise HTTPError(404)
+
+        await handler(request, writer)
+
+    def route_label(self, request: Request) -> str:
+        '''
+        Get the route rule of a request, without the path parameters
+        '''
+        if request.path.startswith('/blob/get/'):
+            return '/blob/get/<key>'
+
+        if request.path.startswith('/blob/upload/'):
+            if request.path.endswith('/commit'):
+                return '/blob/upload/<upload_id>/commit'
+            return '/blob/upload/<upload_id>'
+
+        if (request.method, request.path) in self.routes:
+            return request.path
+
+        return 'unmatched'
+
+    ###################
+    # Route Handlers
+    ###################
+
+    async def root(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        root route, provides a brief description of the service
+        '''
+        await self.send_json(writer, {'message': 'This is the Key Value Store Microservice.'})
+
+    async def get_val(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        get value of key
+        '''
+        value, status = self.store.get(request.args['key'])
+
+        if status:
+            try:
+                value = bytes(value).decode()
+            except UnicodeDecodeError:
+                # binary values are only served by /blob/get/<key>
+                await self.send_json(writer, {'status': False, 'value': None,
+                                              'message': 'Value is binary, get it from /blob/get/<key>'}, 406)
+                return
+
+        await self.send_json(writer, {'status': status, 'value': value}, 200 if status else 404)
+
+    async def delete_val(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        delete value of key
+        '''
+        loop = asyncio.get_running_loop()
+        value, status = await loop.run_in_executor(None, self.store.delete, request.args['key'])
+
+        if status:
+            value = bytes(value).decode(errors='replace')
+
+        await self.send_json(writer, {'status': status, 'value': value}, 200 if status else 404)
+
+    async def set_val(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        set a JSON string value
+        '''
+        data = await request.read_json()
+
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(None, self.store.set, data['value'], get_namespace(data))
+
+        await self.send_json(writer, {'status': True, 'key': key})
+
+    async def get_blob(self, request: Request, writer: asyncio.StreamWriter, key: str) -> None:
+        '''
+        get the raw bytes value of key as an octet-stream,
+        or a part of it if a Range header is given
+        '''
+        location = self.store.locate(key)
+        if location is not None:
+            path, offset, length = location
+            byte_range = parse_range(request.headers.get('range'), length)
+
+            if await self.send_file(writer, (path, offset, length), byte_range):
+                return
+
+        value, status = self.store.get(key)
+        if not status:
+            await self.send_json(writer, {'status': False, 'value': None}, 404)
+            return
+
+        byte_range = parse_range(request.headers.get('range'), len(value))
+        writer.write(range_head(len(value), byte_range))
+
+        if byte_range is not None:
+            value = memoryview(value)[byte_range[0]:byte_range[1] + 1]
+
+        await self.send_value(writer, value)
+
+    async def put_blob(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        store the raw octet-stream request body and return its key,
+        the body is hashed while it is streamed in
+        '''
+        hasher = md5()
+        if request.chunked:
+            value = await request.read_body()
+            hasher.update(value)
+        else:
+            value = await request.read_into(request.remaining, hasher)
+
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(None, self.store.set, value,
+                                         get_namespace(request.args), hasher.hexdigest())
+
+        await self.send_json(writer, {'status': True, 'key': key})
+
+    async def create_upload(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        start a chunked upload of a value of the given size
+        '''
+        upload_id = self.uploads.create(int(request.args['size']),
+                                        get_namespace(request.args))
+
+        await self.send_json(writer, {'status': True, 'upload_id': upload_id})
+
+    async def upload_status(self, request: Request, writer: asyncio.StreamWriter, upload_id: str) -> None:
+        '''
+        get the offset received so far of a chunked upload, to resume it from
+        '''
+        offset = self.uploads.status(upload_id)
+
+        await self.send_json(writer, {'status': offset is not None, 'offset': offset},
+                             200 if offset is not None else 404)
+
+    async def upload_chunk(self, request: Request, writer: asyncio.StreamWriter, upload_id: str) -> None:
+        '''
+        write the octet-stream chunk of a chunked upload at the given offset
+        '''
+        chunk = await request.read_body()
+
+        status, offset = self.uploads.write(upload_id, int(request.args['offset']), chunk)
+
+        if offset is None:
+            await self.send_json(writer, {'status': False, 'offset': None}, 404)
+            return
+
+        await self.send_json(writer, {'status': status, 'offset': offset}, 200 if status else 409)
+
+    async def commit_upload(self, request: Request, writer: asyncio.StreamWriter, upload_id: str) -> None:
+        '''
+        store the value of a completed chunked upload and return its key
+        '''
+        upload = self.uploads.commit(upload_id)
+
+        if upload is None:
+            await self.send_json(writer, {'status': False, 'key': None}, 404)
+            return
+
+        value, namespace, key = upload
+
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(None, self.store.set, value, namespace, key)
+
+        await self.send_json(writer, {'status': True, 'key': key})
+
+    async def mget_blobs(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        get the raw bytes values of many keys, as one framed octet-stream
+        '''
+        keys = (await request.read_json())['keys']
+
+        values = [self.store.get(key)[0] for key in keys]
+        length = sum(len(pack_get_frame(key, value)) + (len(value) if value is not None else 0)
+                     for key, value in zip(keys, values))
+
+        writer.write(response_head(200, 'application/octet-stream', length))
+
+        for key, value in zip(keys, values):
+            writer.write(pack_get_frame(key, value))
+            if value is not None:
+                await self.send_value(writer, value)
+
+        await writer.drain()
+
+    async def mput_blobs(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        store many values from one framed octet-stream request body,
+        each value is stored as soon as it is streamed in
+        '''
+        namespace = get_namespace(request.args)
+        loop = asyncio.get_running_loop()
+
+        keys = []
+        while True:
+            header = await request.read(PUT_FRAME_SIZE)
+            if not header:
+                break
+
+            if len(header) < PUT_FRAME_SIZE:
+                header += await request.read_into(PUT_FRAME_SIZE - len(header))
+
+            (length,) = struct.unpack(PUT_FRAME_FORMAT, header)
+
+            hasher = md5()
+            value = await request.read_into(length, hasher)
+
+            keys.append(await loop.run_in_executor(None, self.store.set, value,
+                                                   namespace, hasher.hexdigest()))
+
+        await self.send_json(writer, {'status': True, 'keys': keys})
+
+    async def retire_namespace(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        retire a (job_name, cluster_id, round) namespace
+        '''
+        data = await request.read_json()
+
+        namespace = get_namespace(data)
+        keep = data['keep'] if 'keep' in data else []
+        carry_to = None
+        if 'carry_to_round' in data and data['carry_to_round'] is not None:
+            carry_to = (namespace[0], namespace[1], int(data['carry_to_round']))
+
+        loop = asyncio.get_running_loop()
+        deleted = await loop.run_in_executor(None, self.store.retire, namespace, keep, carry_to)
+
+        await self.send_json(writer, {'status': True, 'deleted': deleted})
+
+    async def drop_job_namespace(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        drop all the namespaces of a job
+        '''
+        data = await request.read_json()
+
+        loop = asyncio.get_running_loop()
+        deleted = await loop.run_in_executor(None, self.store.drop_job, data['job_name'])
+
+        await self.send_json(writer, {'status': True, 'deleted': deleted})
+
+    async def list_keys(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        list all the keys with their namespaces
+        '''
+        await self.send_json(writer, {'status': True, 'keys': self.store.list_keys()})
+
+    async def get_size(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        get the size of the stored values, in memory and on disk
+        '''
+        stats = self.store.stats()
+
+        await self.send_json(writer, {'status': True, 'size': stats['memory_bytes'] + stats['disk_bytes'],
+                                      'memory': stats['memory_bytes'], 'disk': stats['disk_bytes']})
+
+    async def get_metrics(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        '''
+        get the running counters of the store, and the
+        request counts and latency histograms of every route
+        '''
+        await self.send_json(writer, {'status': True, 'store': self.store.stats(),
+                                      'routes': self.metrics.snapshot()})
+
+    ###################
+    # Response Writers
+    ###################
+
+    async def send_json(self, writer: asyncio.StreamWriter, data, status=200, keep_alive=True) -> None:
+        '''
+        Send a JSON reply, keep_alive off tells the client the connection is closed after it
+        '''
+        body = json.dumps(data).encode()
+
+        writer.write(response_head(status, 'application/json', len(body), keep_alive=keep_alive))
+        writer.write(body)
+
+        await writer.drain()
+
+    async def send_value(self, writer: asyncio.StreamWriter, value) -> None:
+        '''
+        Write a value from a memoryview over it, in chunks, so that at most
+        one chunk is buffered by the transport if the socket is backed up
+        '''
+        view = memoryview(value)
+        for position in range(0, len(view), CHUNK_SIZE):
+            writer.write(view[position:position + CHUNK_SIZE])
+            await writer.drain()
+
+        await writer.drain()
+
+    async def send_file(self, writer: asyncio.StreamWriter, location: tuple, byte_range=None) -> bool:
+        '''
+        Send an on-disk value (or a byte range of it) with sendfile, returns False
+        if its file is gone (e.g., compacted), so that it can be sent from memory instead
+        '''
+        path, offset, length = location
+
+        try:
+            # a file object of its own, since sendfile moves the file position
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        with f:
+            writer.write(range_head(length, byte_range))
+            await writer.drain()
+
+            if byte_range is not None:
+                offset, length = offset + \
+                    byte_range[0], byte_range[1] - byte_range[0] + 1
+
+            loop = asyncio.get_running_loop()
+            await loop.sendfile(writer.transport, f, offset, length)
+
+        return True
+
+
+def response_head(status: int, content_type: str, length: int, headers: dict = None, keep_alive=True) -> bytes:
+    '''
+    Build the status line and headers of a response, keep-alive unless keep_alive is off
+    '''
+    extra = ''.join(f'{name}: {value}\r\n'
+                    for name, value in (headers or {}).items())
+
+    return (f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {length}\r\n'
+            f'{extra}'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n').encode('latin-1')
+
+
+def range_head(total: int, byte_range) -> bytes:
+    '''
+    Build the head of a whole value (200) or byte range (206) response
+    '''
+    if byte_range is None:
+        return response_head(200, 'application/octet-stream', total,
+                             {'Accept-Ranges': 'bytes'})
+
+    start, end = byte_range
+
+    return response_head(206, 'application/octet-stream', end - start + 1,
+                         {'Accept-Ranges': 'bytes', 'Content-Range': f'bytes {start}-{end}/{total}'})
+
+
+def get_namespace(data: dict):
+    '''
+    get the (job_name, cluster_id, round) namespace from request data,
+    returns None if the request is not namespaced
+    '''
+    if 'job_name' not in data or data['job_name'] is None:
+        return None
+
+    return (data['job_name'], data['cluster_id'], int(data['round']))
+
+
+def serve(store: KeyValueStore, uploads: UploadSessions, metrics: RouteMetrics, host: str, port: int,
+          unix_path: Union[str, None] = None) -> None:
+    '''
+    Run the asyncio server for the store
+    '''
+    asyncio.run(AsyncServer(store, uploads, metrics).serve(host, port, unix_path))
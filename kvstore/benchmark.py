@@ -0,0 +1,121 @@
+'''
+Concurrency Benchmark for the Key Value Store Servers
+
+Usage: python benchmark.py --url http://localhost:6666 --clients 500 --size 10000000
+
+Emulates the end of a round, where every client uploads its trained model
+at (nearly) the same time, and the worker then downloads all of them.
+Each client is a thread with its own connection, started together behind
+a barrier. Reports the wall time, throughput and latency percentiles of
+the upload and download phases, so that the Flask server (SERVER_MODE=flask)
+and the asyncio server (SERVER_MODE=async) can be compared on the same host.
+'''
+import os
+import json
+import argparse
+import threading
+import http.client
+from time import perf_counter
+from urllib.parse import urlsplit
+
+
+def percentile(values: list, q: float) -> float:
+    '''
+    Get the q-th percentile of a list of values
+    '''
+    if len(values) == 0:
+        return float('nan')
+
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+
+    return values[index]
+
+
+def run_phase(url: str, clients: int, task) -> dict:
+    '''
+    Run a task on all the clients concurrently, and collect their latencies
+    '''
+    target = urlsplit(url)
+    barrier = threading.Barrier(clients + 1)
+    latencies = [None] * clients
+    errors = [0]
+    errors_lock = threading.Lock()
+
+    def client(index: int):
+        conn = http.client.HTTPConnection(target.hostname, target.port, timeout=3600)
+        barrier.wait()
+
+        start = perf_counter()
+        try:
+            task(conn, index)
+            latencies[index] = perf_counter() - start
+        except Exception:
+            with errors_lock:
+                errors[0] += 1
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = perf_counter()
+
+    for thread in threads:
+        thread.join()
+
+    wall_time = perf_counter() - start
+    done = [latency for latency in latencies if latency is not None]
+
+    return {'wall_time': wall_time, 'errors': errors[0],
+            'p50': percentile(done, 50), 'p95': percentile(done, 95), 'p99': percentile(done, 99)}
+
+
+def benchmark(url: str, clients: int, size: int) -> None:
+    '''
+    Upload a distinct blob from every client, then download them all back
+    '''
+    # distinct payloads, so that the content addressed store keeps them all
+    payloads = [os.urandom(min(16, size)) + bytes(max(0, size - 16))
+                for _ in range(clients)]
+    keys = [None] * clients
+
+    def upload(conn, index):
+        conn.request('POST', '/blob/put', body=payloads[index],
+                     headers={'Content-Type': 'application/octet-stream'})
+        reply = conn.getresponse()
+        keys[index] = json.loads(reply.read())['key']
+
+    def download(conn, index):
+        conn.request('GET', f'/blob/get/{keys[index]}')
+        reply = conn.getresponse()
+        if len(reply.read()) != size:
+            raise ValueError('Incomplete download')
+
+    total_mb = clients * size / (1024 * 1024)
+
+    for name, task in (('upload', upload), ('download', download)):
+        stats = run_phase(url, clients, task)
+
+        print(f'{name:>8}: {stats["wall_time"]:8.2f}s wall, {total_mb / stats["wall_time"]:8.1f} MB/s, '
+              f'latency p50 {stats["p50"]:.2f}s p95 {stats["p95"]:.2f}s p99 {stats["p99"]:.2f}s, '
+              f'{stats["errors"]} errors')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Concurrency benchmark for the kvstore server.')
+    parser.add_argument('--url', type=str, default='http://localhost:6666',
+                        help='url of the kvstore server')
+    parser.add_argument('--clients', type=int, default=100,
+                        help='number of concurrent clients')
+    parser.add_argument('--size', type=int, default=10 * 1024 * 1024,
+                        help='size of each client payload in bytes')
+    args = parser.parse_args()
+
+    print(f'Benchmarking {args.url} with {args.clients} clients of {args.size} bytes each.')
+
+    benchmark(args.url, args.clients, args.size)
@@ -0,0 +1,65 @@
+'''
+Framing of Multiple Values in a Single Request or Response Body
+'''
+import struct
+from typing import Iterator, Tuple, Union
+
+# mget response frame header: raw md5 digest of the key, found flag, value length
+GET_FRAME_FORMAT = '!16sBQ'
+GET_FRAME_SIZE = struct.calcsize(GET_FRAME_FORMAT)
+
+# mput request frame header: value length
+PUT_FRAME_FORMAT = '!Q'
+PUT_FRAME_SIZE = struct.calcsize(PUT_FRAME_FORMAT)
+
+
+def pack_get_frame(key: str, value: Union[bytes, memoryview, None]) -> bytes:
+    '''
+    Pack the header of an mget response frame, the value follows it
+    '''
+    if value is None:
+        return struct.pack(GET_FRAME_FORMAT, bytes.fromhex(key), 0, 0)
+
+    return struct.pack(GET_FRAME_FORMAT, bytes.fromhex(key), 1, len(value))
+
+
+def iter_put_frames(stream) -> Iterator[bytes]:
+    '''
+    Iterate over the values of an mput request body stream
+    '''
+    while True:
+        header = read_exact(stream, PUT_FRAME_SIZE)
+        if header is None:
+            return
+
+        (length,) = struct.unpack(PUT_FRAME_FORMAT, header)
+
+        value = read_exact(stream, length)
+        if value is None:
+            raise ValueError('Truncated mput frame')
+
+        yield value
+
+
+def read_exact(stream, size: int) -> Union[bytes, None]:
+    '''
+    Read exactly size bytes from a stream,
+    returns None at the end of the stream
+    '''
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    if remaining == size and size > 0:
+        return None
+
+    if remaining > 0:
+        raise ValueError('Truncated frame')
+
+    return b''.join(chunks)
+
@@ -2,75 +2,493 @@
 Key Value Store Class
 '''
 import threading
+from time import sleep
 from hashlib import md5
+from collections import OrderedDict
 from typing import Tuple, Union
+from spill_file import SpillFile
+from segment_log import SegmentLog, NamespaceJournal, RECORD_PUT, RECORD_DELETE
 
 
 class KeyValueStore:
     '''
     Key Val Store Class
+
+    Values are held in an in-memory LRU tier of at most memory_budget bytes,
+    the least recently used values beyond it are spilled to an on-disk file
+    and served back from there via mmap. The spill file is rotated and compacted
+    in the background once most of its values are deleted.
+
+    In durable mode (log_dir given) every set is appended to a segmented log,
+    which then also serves as the on-disk tier, and the in-memory tier only
+    caches the hot values. On restart the offset index is rebuilt by scanning
+    the segment headers.
+
+    Keys can be tagged with (job_name, cluster_id, round) namespaces, each tag
+    holds a reference to the key, and a key is deleted when its last namespace
+    is retired. Untagged keys are never garbage collected.
     '''
 
-    def __init__(self):
-        self.table = dict()
+    def __init__(self, memory_budget=0, spill_path='./spill/spill.seg', log_dir=None, segment_size=256 * 1024 * 1024):
+        # in-memory tier, ordered from least to most recently used
+        self.table = OrderedDict()
         self.locks = dict()
 
-    def get(self, key: str) -> Tuple[Union[str, None], bool]:
+        # on-disk tier, key -> location of the value in the spill file or the log,
+        # i.e., (generation, offset, length) or (segment_id, offset, length)
+        self.on_disk = dict()
+        self.spill_path = spill_path
+
+        # durable log, None if not in durable mode
+        self.log = SegmentLog(log_dir, segment_size) if log_dir else None
+        self.journal = NamespaceJournal(log_dir) if log_dir else None
+        self.disk = self.log
+
+        # memory budget in bytes, 0 means unlimited
+        self.memory_budget = memory_budget
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+
+        # running counters, of the stored objects and of the bytes set and deleted
+        self.object_count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        self.table_lock = threading.Lock()
+
+        # namespace -> set of keys, and key -> number of namespaces holding it
+        self.namespaces = dict()
+        self.refcounts = dict()
+        self.namespace_lock = threading.Lock()
+
+        if self.log is not None:
+            self._recover()
+
+    def get(self, key: str) -> Tuple[Union[bytes, memoryview, None], bool]:
         '''
-        Get Value
+        Get Value, on-disk values are returned as memoryviews over their file
         '''
+        self.table_lock.acquire()
+
         if key in self.table:
-            return self.table[key], True
+            self.table.move_to_end(key)
+            value = self.table[key]
+        elif key in self.on_disk:
+            value = self.disk.read(*self.on_disk[key])
         else:
-            return None, False
+            value = None
+
+        self.table_lock.release()
+
+        return value, value is not None
+
+    def locate(self, key: str) -> Union[Tuple[str, int, int], None]:
+        '''
+        Get the (file path, offset, length) of an on-disk value,
+        None if the value is held in memory or not found
+        '''
+        self.table_lock.acquire()
+
+        location = None
+        if key not in self.table and key in self.on_disk:
+            location = self.disk.locate(*self.on_disk[key])
+
+        self.table_lock.release()
 
-    def set(self, value: str) -> str:
+        return location
+
+    def set(self, value: Union[str, bytes, bytearray], namespace: Union[tuple, None] = None, key: Union[str, None] = None) -> str:
         '''
-        Set Value
+        Set Value, values are always held as raw bytes,
+        optionally tagged with a (job_name, cluster_id, round) namespace.
+        The key (md5 hash of the value) can be passed if already computed,
+        e.g., incrementally while streaming the value in.
         '''
-        key = hash_function(value)
+        if isinstance(value, str):
+            value = value.encode()
+
+        if key is None:
+            key = hash_function(value)
         if key not in self.locks:
             self.locks[key] = threading.Lock()
 
         self.locks[key].acquire()
 
-        self.table[key] = value
+        # content addressed, so an existing key already holds the value
+        if self.check(key):
+            self.table_lock.acquire()
+            if key in self.table:
+                self.table.move_to_end(key)
+            self.table_lock.release()
+        else:
+            # the log is appended outside the table lock, the key lock
+            # already serializes all the writers of this key
+            location = self.log.append_put(
+                key, value) if self.log is not None else None
+
+            self.table_lock.acquire()
+
+            if location is not None:
+                self.on_disk[key] = location
+                self.disk_bytes += len(value)
+                self.log.mark_live(location[0], len(value))
+
+            self.table[key] = value
+            self.memory_bytes += len(value)
+
+            self.object_count += 1
+            self.bytes_in += len(value)
+
+            self._evict()
+
+            self.table_lock.release()
 
         self.locks[key].release()
 
+        if namespace is not None:
+            self.namespace_lock.acquire()
+            self._tag(key, namespace)
+            self.namespace_lock.release()
+
         return key
 
-    def delete(self, key: str) -> Tuple[Union[str, None], bool]:
+    def delete(self, key: str, fetch=True) -> Tuple[Union[bytes, memoryview, None], bool]:
         '''
-        Delete Value
+        Delete Value, a spilled value is only read back if fetch is set
         '''
         if key not in self.locks:
             return None, False
         else:
             self.locks[key].acquire()
 
-            value = self.table[key]
+            if self.log is not None:
+                self.log.append_delete(key)
+
+            self.table_lock.acquire()
 
-            del self.table[key]
+            value, size = None, None
+            if key in self.table:
+                value = self.table.pop(key)
+                size = len(value)
+                self.memory_bytes -= size
+
+            if key in self.on_disk:
+                location = self.on_disk.pop(key)
+                if value is None and fetch:
+                    value = self.disk.read(*location)
+                size = location[-1]
+                self.disk_bytes -= size
+                self.disk.mark_dead(location[0], size)
+
+            if size is not None:
+                self.object_count -= 1
+                self.bytes_out += size
+
+            self.table_lock.release()
 
             self.locks[key].release()
 
             del self.locks[key]
 
+            self.namespace_lock.acquire()
+            if key in self.refcounts:
+                del self.refcounts[key]
+            self.namespace_lock.release()
+
             return value, True
 
     def check(self, key: str) -> bool:
         '''
         Check if Key has been Set
         '''
-        if key in self.table:
+        if key in self.table or key in self.on_disk:
             return True
         else:
             return False
 
+    def stats(self) -> dict:
+        '''
+        Get the running counters of the store, in O(1)
+        '''
+        return {'objects': self.object_count, 'memory_bytes': self.memory_bytes,
+                'disk_bytes': self.disk_bytes, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+    def list_keys(self) -> dict:
+        '''
+        List all the keys, with the namespaces holding each of them
+        '''
+        self.table_lock.acquire()
+        keys = {key: [] for key in list(self.table.keys()) + list(self.on_disk.keys())}
+        self.table_lock.release()
+
+        self.namespace_lock.acquire()
+        for namespace, namespace_keys in self.namespaces.items():
+            for key in namespace_keys:
+                if key in keys:
+                    keys[key].append(namespace)
+        self.namespace_lock.release()
+
+        return keys
+
+    def retire(self, namespace: tuple, keep=(), carry_to: Union[tuple, None] = None) -> int:
+        '''
+        Retire a namespace, releasing its reference on all of its keys.
+        The keys in keep are not released, and are tagged with carry_to (if given).
+        Returns the number of keys deleted.
+        '''
+        self.namespace_lock.acquire()
+
+        keys = self.namespaces.pop(namespace, set())
+        keep = set(keep)
+
+        # tag the kept keys first, so that they are never released to zero
+        for key in keep:
+            if carry_to is not None and self.check(key):
+                self._tag(key, carry_to)
+
+        dead_keys = [key for key in keys - keep if self._untag(key)]
+
+        # the kept keys carried to the next namespace are held by it instead,
+        # otherwise they keep the reference of the retired one
+        if carry_to is not None:
+            for key in keys & keep:
+                self._untag(key)
+
+        if self.journal is not None:
+            self.journal.snapshot(self.namespaces)
+
+        self.namespace_lock.release()
+
+        return self._collect(dead_keys)
+
+    def drop_job(self, job_name: str) -> int:
+        '''
+        Retire all the namespaces of a job,
+        returns the number of keys deleted.
+        '''
+        self.namespace_lock.acquire()
+
+        dead_keys = []
+        for namespace in list(self.namespaces.keys()):
+            if namespace[0] != job_name:
+                continue
+
+            for key in self.namespaces.pop(namespace):
+                if self._untag(key):
+                    dead_keys.append(key)
+
+        if self.journal is not None:
+            self.journal.snapshot(self.namespaces)
+
+        self.namespace_lock.release()
+
+        return self._collect(dead_keys)
+
+    def compact(self, threshold=0.5) -> int:
+        '''
+        Compact the sealed log segments having more than threshold fraction of
+        dead bytes, by moving their live values to the active segment and
+        dropping them. Returns the number of segments dropped.
+        Without the log, the spill file is compacted instead.
+        '''
+        if self.log is None:
+            return self._compact_spill(threshold)
+
+        compacted = 0
+        for segment_id in self.log.sealed_segments():
+            if self.log.dead_ratio(segment_id) < threshold:
+                continue
+
+            # tombstones are only needed while an older segment may still hold the PUT
+            has_older = self.log.segments[0] < segment_id
+            dead_keys = set()
+
+            for rtype, key, _, offset, length in self.log.scan_segment(segment_id):
+                if rtype == RECORD_DELETE:
+                    dead_keys.add(key)
+                elif rtype == RECORD_PUT:
+                    self._relocate(key, (segment_id, offset, length))
+
+            if has_older:
+                for key in dead_keys:
+                    if not self.check(key):
+                        self.log.append_delete(key)
+
+            self.log.drop_segment(segment_id)
+            compacted += 1
+
+        return compacted
+
+    def start_compaction(self, interval: float, threshold=0.5) -> None:
+        '''
+        Start the background compaction of the log (or the spill file), every interval seconds
+        '''
+        def compaction_loop():
+            while True:
+                sleep(interval)
+                try:
+                    self.compact(threshold)
+                except Exception as e:
+                    print(f'Compaction failed, {e}')
+
+        thread = threading.Thread(target=compaction_loop, daemon=True)
+        thread.start()
+
+    def _compact_spill(self, threshold: float) -> int:
+        '''
+        Rotate the spill file once more than threshold fraction of it is dead,
+        and drop its sealed generations after moving their live values to the
+        active one. Returns the number of generations dropped.
+        '''
+        if self.disk is None:
+            return 0
+
+        if self.disk.dead_ratio(self.disk.active_id) >= threshold:
+            self.disk.rotate()
+
+        compacted = 0
+        for generation in self.disk.sealed_generations():
+            self.table_lock.acquire()
+            locations = [(key, location) for key, location in self.on_disk.items()
+                         if location[0] == generation]
+            self.table_lock.release()
+
+            for key, location in locations:
+                self._relocate(key, location)
+
+            self.disk.drop_generation(generation)
+            compacted += 1
+
+        return compacted
+
+    def _relocate(self, key: str, location: tuple) -> None:
+        '''
+        Move a live value from its sealed segment (or spill generation) to the active one.
+        Holding the key lock keeps deletes of the key ordered after the move.
+        '''
+        self.table_lock.acquire()
+        lock = self.locks.get(key)
+        self.table_lock.release()
+
+        if lock is None:
+            return
+
+        lock.acquire()
+
+        if self.on_disk.get(key) == location:
+            if self.log is not None:
+                new_location = self.log.append_put(
+                    key, self.log.read(*location))
+            else:
+                new_location = self.disk.append(key, self.disk.read(*location))
+
+            self.table_lock.acquire()
+            self.on_disk[key] = new_location
+            self.disk.mark_live(new_location[0], new_location[-1])
+            self.disk.mark_dead(location[0], location[-1])
+            self.table_lock.release()
+
+        lock.release()
+
+    def _recover(self) -> None:
+        '''
+        Rebuild the offset index and the namespaces from the durable log,
+        the values themselves stay on disk until they are read
+        '''
+        for rtype, key, segment_id, offset, length in self.log.scan():
+            if key in self.on_disk:
+                old_location = self.on_disk.pop(key)
+                self.log.mark_dead(old_location[0], old_location[-1])
+
+            if rtype == RECORD_PUT:
+                self.on_disk[key] = (segment_id, offset, length)
+                self.log.mark_live(segment_id, length)
+
+        for key, location in self.on_disk.items():
+            self.locks[key] = threading.Lock()
+            self.disk_bytes += location[-1]
+
+        self.object_count = len(self.on_disk)
+
+        # drop the tags of the keys deleted since they were journaled
+        for namespace, keys in self.journal.load().items():
+            keys = set(key for key in keys if key in self.on_disk)
+            if len(keys) == 0:
+                continue
+
+            self.namespaces[namespace] = keys
+            for key in keys:
+                self.refcounts[key] = self.refcounts.get(key, 0) + 1
+
+    def _tag(self, key: str, namespace: tuple) -> None:
+        '''
+        Add a namespace reference to a key.
+        Expects the namespace_lock to be held by the caller.
+        '''
+        keys = self.namespaces.setdefault(namespace, set())
+
+        if key not in keys:
+            keys.add(key)
+            self.refcounts[key] = self.refcounts.get(key, 0) + 1
+
+            if self.journal is not None:
+                self.journal.tag(key, namespace)
+
+    def _untag(self, key: str) -> bool:
+        '''
+        Release a namespace reference of a key,
+        returns True if it was the last reference.
+        Expects the namespace_lock to be held by the caller.
+        '''
+        if key not in self.refcounts:
+            return False
+
+        self.refcounts[key] -= 1
+
+        if self.refcounts[key] > 0:
+            return False
+
+        del self.refcounts[key]
+        return True
+
+    def _collect(self, keys: list) -> int:
+        '''
+        Delete the unreferenced keys
+        '''
+        deleted = 0
+        for key in keys:
+            _, status = self.delete(key, fetch=False)
+            deleted += int(status)
+
+        return deleted
+
+    def _evict(self) -> None:
+        '''
+        Move the least recently used values out of memory until the
+        in-memory tier fits in the memory budget. Values already
+        in the durable log are simply dropped, the rest are spilled.
+        Expects the table_lock to be held by the caller.
+        '''
+        if not self.memory_budget:
+            return
+
+        while self.memory_bytes > self.memory_budget and len(self.table) > 0:
+            key, value = self.table.popitem(last=False)
+            self.memory_bytes -= len(value)
+
+            if key in self.on_disk:
+                continue
+
+            if self.disk is None:
+                self.disk = SpillFile(self.spill_path)
+
+            self.on_disk[key] = self.disk.append(key, value)
+            self.disk.mark_live(self.on_disk[key][0], len(value))
+            self.disk_bytes += len(value)
+
 
-def hash_function(value: str) -> str:
+def hash_function(value: Union[bytes, bytearray]) -> str:
     '''
-    Return the MD5 hash of a string value
+    Return the MD5 hash of a bytes value
     '''
-    return md5(value.encode()).hexdigest()
+    return md5(value).hexdigest()
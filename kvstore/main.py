@@ -1,15 +1,60 @@
 '''
 Key Value Store Management Router
 '''
-import sys
+import os
+from time import perf_counter
+from dotenv import load_dotenv
 from waitress import serve
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g
 from key_val_store import KeyValueStore
+from framing import pack_get_frame, iter_put_frames
+from transfer import UploadSessions, parse_range
+from metrics import RouteMetrics
+from unix_socket import serve_unix_socket
+
+# import environment variables
+load_dotenv()
+
+LISTEN_PORT = int(os.getenv('LISTEN_PORT', '6666'))
+MEMORY_BUDGET = int(os.getenv('MEMORY_BUDGET', '0'))
+SPILL_PATH = os.getenv('SPILL_PATH', './spill/spill.seg')
+DURABLE_LOG_DIR = os.getenv('DURABLE_LOG_DIR', '')
+SEGMENT_SIZE = int(os.getenv('SEGMENT_SIZE', str(256 * 1024 * 1024)))
+COMPACTION_INTERVAL = float(os.getenv('COMPACTION_INTERVAL', '60'))
+SERVER_MODE = os.getenv('SERVER_MODE', 'flask')
+UPLOAD_TTL = float(os.getenv('UPLOAD_TTL', '3600'))
+UNIX_SOCKET = os.getenv('UNIX_SOCKET', '')
 
 app = Flask(__name__)
 
 
-keyValueStore = KeyValueStore()
+keyValueStore = KeyValueStore(MEMORY_BUDGET, SPILL_PATH,
+                              DURABLE_LOG_DIR or None, SEGMENT_SIZE)
+keyValueStore.start_compaction(COMPACTION_INTERVAL)
+
+uploadSessions = UploadSessions(UPLOAD_TTL)
+
+routeMetrics = RouteMetrics()
+
+
+@app.before_request
+def start_timer():
+    '''
+    note the start time of the request, for the route latency metrics
+    '''
+    g.start_time = perf_counter()
+
+
+@app.after_request
+def observe_request(response: Response):
+    '''
+    record the request in the route metrics
+    '''
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    routeMetrics.observe(route, perf_counter() - g.start_time,
+                         response.status_code)
+
+    return response
 
 
 @app.route('/')
@@ -32,6 +77,14 @@ def get_val():
 
     value, status = keyValueStore.get(key)
 
+    if status:
+        try:
+            value = bytes(value).decode()
+        except UnicodeDecodeError:
+            # binary values are only served by /blob/get/<key>
+            return jsonify({'status': False, 'value': None,
+                            'message': 'Value is binary, get it from /blob/get/<key>'}), 406
+
     return jsonify({'status': status, 'value': value}), 200 if status else 404
 
 
@@ -45,6 +98,9 @@ def delete_val():
 
     value, status = keyValueStore.delete(key)
 
+    if status:
+        value = bytes(value).decode(errors='replace')
+
     return jsonify({'status': status, 'value': value}), 200 if status else 404
 
 
@@ -57,45 +113,234 @@ def set_val():
     value = data['value']
 
     try:
-        key = keyValueStore.set(value)
+        key = keyValueStore.set(value, get_namespace(data))
         return jsonify({'status': True, 'key': key}), 200
     except:
         return jsonify({'status': False, 'key': None}), 500
 
 
-@app.route('/size')
-def get_size():
+@app.route('/blob/get/<key>')
+def get_blob(key: str):
+    '''
+    get the raw bytes value of key as an octet-stream,
+    or a part of it if a Range header is given
+    '''
+
+    value, status = keyValueStore.get(key)
+
+    if not status:
+        return jsonify({'status': False, 'value': None}), 404
+
+    byte_range = parse_range(request.headers.get('Range'), len(value))
+    if byte_range is None:
+        return Response(bytes(value), status=200, mimetype='application/octet-stream',
+                        headers={'Accept-Ranges': 'bytes'})
+
+    start, end = byte_range
+
+    return Response(bytes(value[start:end + 1]), status=206, mimetype='application/octet-stream',
+                    headers={'Accept-Ranges': 'bytes', 'Content-Range': f'bytes {start}-{end}/{len(value)}'})
+
+
+@app.route('/blob/put', methods=['POST'])
+def put_blob():
+    '''
+    store the raw octet-stream request body and return its key
+    '''
+    value = request.get_data()
+
+    try:
+        key = keyValueStore.set(value, get_namespace(request.args))
+        return jsonify({'status': True, 'key': key}), 200
+    except:
+        return jsonify({'status': False, 'key': None}), 500
+
+
+@app.route('/blob/upload', methods=['POST'])
+def create_upload():
+    '''
+    start a chunked upload of a value of the given size
     '''
-    get the size of the kvstore object
-    '''
-
-    def get_size(obj, seen=None):
-        """Recursively finds size of objects"""
-        size = sys.getsizeof(obj)
-        if seen is None:
-            seen = set()
-        obj_id = id(obj)
-        if obj_id in seen:
-            return 0
-        # Important mark as seen *before* entering recursion to gracefully handle
-        # self-referential objects
-        seen.add(obj_id)
-        if isinstance(obj, dict):
-            size += sum([get_size(v, seen) for v in obj.values()])
-            size += sum([get_size(k, seen) for k in obj.keys()])
-        elif hasattr(obj, '__dict__'):
-            size += get_size(obj.__dict__, seen)
-        elif hasattr(obj, '__iter__') and not isinstance(obj, (str, bytes, bytearray)):
-            size += sum([get_size(i, seen) for i in obj])
-        return size
+    try:
+        upload_id = uploadSessions.create(int(request.args['size']),
+                                          get_namespace(request.args))
+        return jsonify({'status': True, 'upload_id': upload_id}), 200
+    except:
+        return jsonify({'status': False, 'upload_id': None}), 500
+
+
+@app.route('/blob/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id: str):
+    '''
+    get the offset received so far of a chunked upload, to resume it from
+    '''
+    offset = uploadSessions.status(upload_id)
+
+    return jsonify({'status': offset is not None, 'offset': offset}), 200 if offset is not None else 404
+
+
+@app.route('/blob/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id: str):
+    '''
+    write the octet-stream chunk of a chunked upload at the given offset,
+    replies with the expected offset if it does not match the received one
+    '''
+    status, offset = uploadSessions.write(upload_id, int(request.args['offset']),
+                                          request.get_data())
+
+    if offset is None:
+        return jsonify({'status': False, 'offset': None}), 404
+
+    return jsonify({'status': status, 'offset': offset}), 200 if status else 409
+
+
+@app.route('/blob/upload/<upload_id>/commit', methods=['POST'])
+def commit_upload(upload_id: str):
+    '''
+    store the value of a completed chunked upload and return its key
+    '''
+    upload = uploadSessions.commit(upload_id)
+
+    if upload is None:
+        return jsonify({'status': False, 'key': None}), 404
+
+    value, namespace, key = upload
 
     try:
-        kv_size = get_size(keyValueStore.table)
-        return jsonify({'status': True, 'size': kv_size}), 200
+        key = keyValueStore.set(value, namespace, key)
+        return jsonify({'status': True, 'key': key}), 200
     except:
-        return jsonify({'status': False, 'size': -1}), 500
+        return jsonify({'status': False, 'key': None}), 500
+
+
+@app.route('/mget', methods=['POST'])
+def mget_blobs():
+    '''
+    get the raw bytes values of many keys, streamed as one framed octet-stream,
+    with a [key digest][found flag][length] header before each value
+    '''
+    keys = request.get_json()['keys']
+
+    def generate():
+        for key in keys:
+            value, _ = keyValueStore.get(key)
+
+            yield pack_get_frame(key, value)
+            if value is not None:
+                yield bytes(value)
+
+    return Response(generate(), status=200, mimetype='application/octet-stream')
+
+
+@app.route('/mput', methods=['POST'])
+def mput_blobs():
+    '''
+    store many values from one framed octet-stream request body,
+    with a [length] header before each value, and return their keys in order
+    '''
+    try:
+        namespace = get_namespace(request.args)
+
+        keys = [keyValueStore.set(value, namespace)
+                for value in iter_put_frames(request.stream)]
+
+        return jsonify({'status': True, 'keys': keys}), 200
+    except:
+        return jsonify({'status': False, 'keys': None}), 500
+
+
+@app.route('/namespace/retire', methods=['POST'])
+def retire_namespace():
+    '''
+    retire a (job_name, cluster_id, round) namespace, deleting the keys
+    no longer held by any namespace. The keys in keep are carried to carry_to_round.
+    '''
+    data = request.get_json()
+
+    namespace = get_namespace(data)
+    keep = data['keep'] if 'keep' in data else []
+    carry_to = None
+    if 'carry_to_round' in data and data['carry_to_round'] is not None:
+        carry_to = (namespace[0], namespace[1], int(data['carry_to_round']))
+
+    try:
+        deleted = keyValueStore.retire(namespace, keep, carry_to)
+        return jsonify({'status': True, 'deleted': deleted}), 200
+    except:
+        return jsonify({'status': False, 'deleted': 0}), 500
+
+
+@app.route('/namespace/drop_job', methods=['POST'])
+def drop_job_namespace():
+    '''
+    drop all the namespaces of a job, deleting the keys
+    no longer held by any namespace
+    '''
+    data = request.get_json()
+
+    try:
+        deleted = keyValueStore.drop_job(data['job_name'])
+        return jsonify({'status': True, 'deleted': deleted}), 200
+    except:
+        return jsonify({'status': False, 'deleted': 0}), 500
+
+
+@app.route('/keys')
+def list_keys():
+    '''
+    list all the keys with the (job_name, cluster_id, round) namespaces
+    holding each of them, used for rebalancing the shards
+    '''
+
+    keys = keyValueStore.list_keys()
+
+    return jsonify({'status': True, 'keys': keys}), 200
+
+
+@app.route('/size')
+def get_size():
+    '''
+    get the size of the kvstore object,
+    as the in-memory footprint and the spilled on-disk footprint
+    '''
+
+    stats = keyValueStore.stats()
+
+    return jsonify({'status': True, 'size': stats['memory_bytes'] + stats['disk_bytes'],
+                    'memory': stats['memory_bytes'], 'disk': stats['disk_bytes']}), 200
+
+
+@app.route('/metrics')
+def get_metrics():
+    '''
+    get the running counters of the store, and the
+    request counts and latency histograms of every route
+    '''
+
+    return jsonify({'status': True, 'store': keyValueStore.stats(),
+                    'routes': routeMetrics.snapshot()}), 200
+
+
+def get_namespace(data: dict):
+    '''
+    get the (job_name, cluster_id, round) namespace from request data,
+    returns None if the request is not namespaced
+    '''
+    if 'job_name' not in data or data['job_name'] is None:
+        return None
+
+    return (data['job_name'], data['cluster_id'], int(data['round']))
 
 
 if __name__ == '__main__':
-    app.run(port=6666, debug=False, host='0.0.0.0')
-    # serve(app, host="0.0.0.0", port=6666, threads=100, _quiet=True)
+    if SERVER_MODE == 'async':
+        from async_server import serve as serve_async
+        serve_async(keyValueStore, uploadSessions, routeMetrics,
+                    '0.0.0.0', LISTEN_PORT, UNIX_SOCKET or None)
+    else:
+        # also listen on a unix socket, for the nodes on this host
+        if UNIX_SOCKET:
+            serve_unix_socket(app, UNIX_SOCKET)
+
+        app.run(port=LISTEN_PORT, debug=False, host='0.0.0.0')
+    # serve(app, host="0.0.0.0", port=LISTEN_PORT, threads=100, _quiet=True)
@@ -0,0 +1,57 @@
+'''
+Per-route Request Metrics for the Key Value Store
+'''
+import threading
+from bisect import bisect_left
+
+# upper bounds (in seconds) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class RouteMetrics:
+    '''
+    Route Metrics Class, keeps the request count, error count and
+    latency histogram of every route, each updated in O(1)
+    '''
+
+    def __init__(self):
+        self.routes = dict()
+        self.lock = threading.Lock()
+
+    def observe(self, route: str, latency: float, status: int) -> None:
+        '''
+        Record a served request of a route
+        '''
+        self.lock.acquire()
+
+        metrics = self.routes.get(route)
+        if metrics is None:
+            metrics = {'count': 0, 'errors': 0, 'latency_sum': 0.0,
+                       'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+            self.routes[route] = metrics
+
+        metrics['count'] += 1
+        metrics['latency_sum'] += latency
+        metrics['buckets'][bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+        if status >= 500:
+            metrics['errors'] += 1
+
+        self.lock.release()
+
+    def snapshot(self) -> dict:
+        '''
+        Get a copy of the metrics of all the routes
+        '''
+        self.lock.acquire()
+
+        routes = {route: {'count': metrics['count'], 'errors': metrics['errors'],
+                          'latency_sum': metrics['latency_sum'],
+                          'latency_buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['inf'],
+                                                      metrics['buckets']))}
+                  for route, metrics in self.routes.items()}
+
+        self.lock.release()
+
+        return routes
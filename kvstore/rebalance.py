@@ -0,0 +1,74 @@
+'''
+Rebalance the keys of the kvstore shards after changing the shard list.
+
+Usage: python rebalance.py --shards http://host1:6666,http://host2:6667
+
+Every key not held by its owner on the hash ring of the given shard list
+is copied to the owner (with its namespace tags) and deleted from the old
+shard. Only the keys falling on the ring segments of added or removed
+shards are moved. The shard list must match P2PSTORE_URL of the nodes.
+'''
+import argparse
+import requests
+from hash_ring import HashRing
+
+
+def move_key(key: str, namespaces: list, source: str, target: str) -> None:
+    '''
+    Copy a key with its namespace tags from the source shard to the target shard,
+    and delete it from the source shard
+    '''
+    reply = requests.get(f'{source}/blob/get/{key}', timeout=3600)
+    if reply.status_code == 404:
+        return
+    reply.raise_for_status()
+
+    value = reply.content
+
+    # the first put stores the value, the rest only add the namespace tags
+    params_list = [{'job_name': namespace[0], 'cluster_id': namespace[1], 'round': namespace[2]}
+                   for namespace in namespaces]
+    if len(params_list) == 0:
+        params_list = [{}]
+
+    for params in params_list:
+        requests.post(f'{target}/blob/put', data=value, params=params, timeout=3600,
+                      headers={'Content-Type': 'application/octet-stream'}).raise_for_status()
+
+    requests.get(f'{source}/delete', {'key': key},
+                 timeout=3600).raise_for_status()
+
+
+def rebalance(shards: list) -> int:
+    '''
+    Move every key to its owner shard, returns the number of keys moved
+    '''
+    ring = HashRing(shards)
+
+    moved = 0
+    for shard in shards:
+        keys = requests.get(f'{shard}/keys', timeout=3600).json()['keys']
+
+        for key, namespaces in keys.items():
+            owner = ring.get_shard(key)
+            if owner == shard:
+                continue
+
+            move_key(key, namespaces, shard, owner)
+            moved += 1
+
+        print(f'Rebalanced shard [{shard}], {len(keys)} keys scanned.')
+
+    return moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Rebalance the keys of the kvstore shards.')
+    parser.add_argument('--shards', type=str, required=True,
+                        help='comma separated list of shard urls, same as P2PSTORE_URL')
+    args = parser.parse_args()
+
+    shard_urls = [url.strip() for url in args.shards.split(',') if url.strip()]
+
+    print(f'Moved {rebalance(shard_urls)} keys.')
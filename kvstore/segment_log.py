@@ -0,0 +1,298 @@
+'''
+Segmented Append-only Log for the Durable Key Value Store
+'''
+import os
+import json
+import mmap
+import struct
+import threading
+from typing import Iterator, Tuple, Union
+
+# record header: magic, record type, raw md5 digest of the key, payload length
+HEADER_FORMAT = '!4sB16sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_MAGIC = b'KVL1'
+
+RECORD_PUT = 1
+RECORD_DELETE = 2
+
+SEGMENT_SUFFIX = '.seg'
+
+
+class SegmentLog:
+    '''
+    Segmented Log Class
+
+    Every set is appended as a PUT record and every delete as a DELETE record
+    to the active segment, which is sealed and rotated once it grows beyond
+    segment_size bytes. Values are served back as memoryviews over an mmap of
+    their segment.
+    '''
+
+    def __init__(self, log_dir: str, segment_size: int):
+        self.log_dir = log_dir
+        self.segment_size = segment_size
+        self.write_lock = threading.Lock()
+
+        os.makedirs(log_dir, exist_ok=True)
+
+        self.segments = sorted(int(name[:-len(SEGMENT_SUFFIX)])
+                               for name in os.listdir(log_dir) if name.endswith(SEGMENT_SUFFIX))
+
+        # per segment bytes of all records, and of the live PUT records
+        self.total_bytes = dict()
+        self.live_bytes = dict()
+
+        # segment_id -> (mmap, mapped size)
+        self.maps = dict()
+
+        self.active_id = None
+        self.active_file = None
+        self.active_end = 0
+
+    def scan(self) -> Iterator[Tuple[int, str, int, int, int]]:
+        '''
+        Scan the headers of all the segments in order, without reading the values,
+        yields (record type, key, segment_id, offset, length) for every record.
+        A torn record at the tail of the last segment is truncated.
+        '''
+        for segment_id in self.segments:
+            position = 0
+            for record in self.scan_segment(segment_id):
+                yield record
+                position = record[3] + record[4]
+
+            path = self._segment_path(segment_id)
+            if position != os.path.getsize(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(position)
+
+            self.total_bytes[segment_id] = position
+            self.live_bytes.setdefault(segment_id, 0)
+
+        # resume appending to the last segment
+        if len(self.segments) > 0:
+            self._open_active(self.segments[-1])
+
+    def scan_segment(self, segment_id: int) -> Iterator[Tuple[int, str, int, int, int]]:
+        '''
+        Scan the headers of a segment up to its last complete record,
+        seeking past the values instead of reading them
+        '''
+        path = self._segment_path(segment_id)
+        file_size = os.path.getsize(path)
+
+        position = 0
+        with open(path, 'rb') as f:
+            while position + HEADER_SIZE <= file_size:
+                header = f.read(HEADER_SIZE)
+                magic, rtype, digest, length = struct.unpack(
+                    HEADER_FORMAT, header)
+
+                if magic != HEADER_MAGIC or position + HEADER_SIZE + length > file_size:
+                    break
+
+                offset = position + HEADER_SIZE
+                yield rtype, digest.hex(), segment_id, offset, length
+
+                # skip the value, only the headers are read
+                position = offset + length
+                f.seek(position)
+
+    def append_put(self, key: str, value: Union[bytes, memoryview]) -> Tuple[int, int, int]:
+        '''
+        Append a PUT record, returns the (segment_id, offset, length) of the value
+        '''
+        return self._append(RECORD_PUT, key, value)
+
+    def append_delete(self, key: str) -> None:
+        '''
+        Append a DELETE record (tombstone) for a key
+        '''
+        self._append(RECORD_DELETE, key, b'')
+
+    def read(self, segment_id: int, offset: int, length: int) -> memoryview:
+        '''
+        Read a value as a memoryview over the mmap of its segment,
+        the segment is re-mapped if it grew since the last mapping
+        '''
+        if length == 0:
+            return memoryview(b'')
+
+        mm, mm_size = self.maps.get(segment_id, (None, 0))
+        if mm is None or offset + length > mm_size:
+            with open(self._segment_path(segment_id), 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            # exported memoryviews keep the older mappings alive
+            self.maps[segment_id] = (mm, len(mm))
+
+        return memoryview(mm)[offset:offset + length]
+
+    def locate(self, segment_id: int, offset: int, length: int) -> Tuple[str, int, int]:
+        '''
+        Get the (file path, offset, length) of a value, for sendfile
+        '''
+        return self._segment_path(segment_id), offset, length
+
+    def mark_live(self, segment_id: int, length: int) -> None:
+        '''
+        Account a value of a segment as live
+        '''
+        self.live_bytes[segment_id] = self.live_bytes.get(
+            segment_id, 0) + length
+
+    def mark_dead(self, segment_id: int, length: int) -> None:
+        '''
+        Account a value of a segment as dead (deleted or moved)
+        '''
+        self.live_bytes[segment_id] = self.live_bytes.get(
+            segment_id, 0) - length
+
+    def sealed_segments(self) -> list:
+        '''
+        Get the ids of the sealed segments, i.e., all but the active one
+        '''
+        return [segment_id for segment_id in self.segments if segment_id != self.active_id]
+
+    def dead_ratio(self, segment_id: int) -> float:
+        '''
+        Get the fraction of a segment's bytes which are not live values
+        '''
+        total = self.total_bytes.get(segment_id, 0)
+        if total == 0:
+            return 1.0
+
+        return 1.0 - (self.live_bytes.get(segment_id, 0) / total)
+
+    def drop_segment(self, segment_id: int) -> None:
+        '''
+        Remove a compacted segment from the log
+        '''
+        self.write_lock.acquire()
+
+        self.segments.remove(segment_id)
+        self.total_bytes.pop(segment_id, None)
+        self.live_bytes.pop(segment_id, None)
+        self.maps.pop(segment_id, None)
+
+        os.remove(self._segment_path(segment_id))
+
+        self.write_lock.release()
+
+    def _append(self, rtype: int, key: str, payload: Union[bytes, memoryview]) -> Tuple[int, int, int]:
+        '''
+        Append a record to the active segment, rotating it if required
+        '''
+        header = struct.pack(HEADER_FORMAT, HEADER_MAGIC, rtype,
+                             bytes.fromhex(key), len(payload))
+
+        self.write_lock.acquire()
+
+        if self.active_file is None or self.active_end >= self.segment_size:
+            next_id = self.segments[-1] + 1 if len(self.segments) > 0 else 0
+            self.segments.append(next_id)
+            self.total_bytes[next_id] = 0
+            self.live_bytes[next_id] = 0
+            self._open_active(next_id)
+
+        segment_id = self.active_id
+
+        self.active_file.write(header)
+        self.active_file.write(payload)
+        self.active_file.flush()
+
+        offset = self.active_end + HEADER_SIZE
+        self.active_end = offset + len(payload)
+        self.total_bytes[segment_id] = self.active_end
+
+        self.write_lock.release()
+
+        return segment_id, offset, len(payload)
+
+    def _open_active(self, segment_id: int) -> None:
+        '''
+        Open a segment for appending
+        '''
+        if self.active_file is not None:
+            self.active_file.close()
+
+        self.active_id = segment_id
+        self.active_file = open(self._segment_path(segment_id), 'ab')
+        self.active_end = self.active_file.tell()
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.log_dir, f'{segment_id:08d}{SEGMENT_SUFFIX}')
+
+
+class NamespaceJournal:
+    '''
+    Namespace Journal Class, persists the namespace tags of the durable store.
+    Tags are appended to a journal, which is folded into a snapshot
+    every time namespaces are retired.
+    '''
+
+    def __init__(self, log_dir: str):
+        self.snapshot_path = os.path.join(log_dir, 'namespaces.json')
+        self.journal_path = os.path.join(log_dir, 'namespaces.log')
+        self.write_lock = threading.Lock()
+
+        self.journal = None
+
+    def load(self) -> dict:
+        '''
+        Load the namespaces from the snapshot and replay the journal on it
+        '''
+        namespaces = dict()
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf8') as f:
+                for namespace, keys in json.load(f):
+                    namespaces[tuple(namespace)] = set(keys)
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn tail of the journal
+                        break
+
+                    namespaces.setdefault(
+                        tuple(entry['ns']), set()).add(entry['key'])
+
+        self.journal = open(self.journal_path, 'a', encoding='utf8')
+
+        return namespaces
+
+    def tag(self, key: str, namespace: tuple) -> None:
+        '''
+        Journal a namespace tag of a key
+        '''
+        self.write_lock.acquire()
+
+        self.journal.write(json.dumps({'key': key, 'ns': list(namespace)}))
+        self.journal.write('\n')
+        self.journal.flush()
+
+        self.write_lock.release()
+
+    def snapshot(self, namespaces: dict) -> None:
+        '''
+        Atomically write a snapshot of the namespaces and truncate the journal
+        '''
+        self.write_lock.acquire()
+
+        temp_path = f'{self.snapshot_path}.tmp'
+        with open(temp_path, 'w', encoding='utf8') as f:
+            json.dump([[list(namespace), list(keys)]
+                      for namespace, keys in namespaces.items()], f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        self.journal.close()
+        self.journal = open(self.journal_path, 'w', encoding='utf8')
+
+        self.write_lock.release()
@@ -0,0 +1,174 @@
+'''
+Append-only Spill File for Cold Key Value Store Entries
+'''
+import os
+import mmap
+import struct
+import threading
+from typing import Tuple, Union
+
+# record header: magic, raw md5 digest of the key, value length
+HEADER_FORMAT = '!4s16sQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_MAGIC = b'KVS1'
+
+
+class SpillFile:
+    '''
+    Spill File Class, values are appended as [header][value] records
+    and served back as memoryviews over a read-only mmap of the file.
+
+    Once enough of the values are deleted, the file is rotated, i.e., a new
+    generation of it is opened for appending, and the old (sealed) generation
+    is dropped after its live values are moved to the new one.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.write_lock = threading.Lock()
+
+        directory, name = os.path.split(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # the spill file only lives as long as the process, drop the generations left by an earlier one
+        for entry in os.listdir(directory):
+            if entry.startswith(f'{name}.') and entry[len(name) + 1:].isdigit():
+                os.remove(os.path.join(directory, entry))
+
+        # generations of the file, the last one is the active one
+        self.generations = []
+
+        # per generation bytes of all the values appended, and of the live ones
+        self.total_bytes = dict()
+        self.live_bytes = dict()
+
+        # generation -> (mmap, mapped size)
+        self.maps = dict()
+
+        self.active_id = None
+        self.active_file = None
+        self.active_end = 0
+
+        self._open_active(0)
+
+    def append(self, key: str, value: Union[bytes, memoryview]) -> Tuple[int, int, int]:
+        '''
+        Append a value to the end of the active file,
+        returns the generation, offset and length of the value
+        '''
+        header = struct.pack(HEADER_FORMAT, HEADER_MAGIC,
+                             bytes.fromhex(key), len(value))
+
+        self.write_lock.acquire()
+
+        generation = self.active_id
+
+        self.active_file.write(header)
+        self.active_file.write(value)
+        self.active_file.flush()
+
+        offset = self.active_end + HEADER_SIZE
+        self.active_end = offset + len(value)
+        self.total_bytes[generation] += len(value)
+
+        self.write_lock.release()
+
+        return generation, offset, len(value)
+
+    def locate(self, generation: int, offset: int, length: int) -> Tuple[str, int, int]:
+        '''
+        Get the (file path, offset, length) of a value, for sendfile
+        '''
+        return self._generation_path(generation), offset, length
+
+    def read(self, generation: int, offset: int, length: int) -> memoryview:
+        '''
+        Read a value as a memoryview over the mmap of its generation,
+        the file is re-mapped if it grew since the last mapping
+        '''
+        if length == 0:
+            return memoryview(b'')
+
+        mm, mm_size = self.maps.get(generation, (None, 0))
+        if mm is None or offset + length > mm_size:
+            with open(self._generation_path(generation), 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            # a new mapping is made instead of resizing the old one,
+            # since exported memoryviews keep the old one alive
+            self.maps[generation] = (mm, len(mm))
+
+        return memoryview(mm)[offset:offset + length]
+
+    def mark_live(self, generation: int, length: int) -> None:
+        '''
+        Account a value of a generation as live
+        '''
+        self.live_bytes[generation] = self.live_bytes.get(
+            generation, 0) + length
+
+    def mark_dead(self, generation: int, length: int) -> None:
+        '''
+        Account a value of a generation as dead (deleted or moved)
+        '''
+        self.live_bytes[generation] = self.live_bytes.get(
+            generation, 0) - length
+
+    def dead_ratio(self, generation: int) -> float:
+        '''
+        Get the fraction of a generation's value bytes which are not live
+        '''
+        total = self.total_bytes.get(generation, 0)
+        if total == 0:
+            return 0.0
+
+        return 1.0 - (self.live_bytes.get(generation, 0) / total)
+
+    def rotate(self) -> None:
+        '''
+        Seal the active file, and open the next generation for appending
+        '''
+        self.write_lock.acquire()
+        self._open_active(self.active_id + 1)
+        self.write_lock.release()
+
+    def sealed_generations(self) -> list:
+        '''
+        Get the sealed generations, i.e., all but the active one
+        '''
+        return [generation for generation in self.generations if generation != self.active_id]
+
+    def drop_generation(self, generation: int) -> None:
+        '''
+        Remove a compacted (sealed) generation, the memoryviews
+        exported from its mapping stay readable until they are released
+        '''
+        self.write_lock.acquire()
+
+        self.generations.remove(generation)
+        self.total_bytes.pop(generation, None)
+        self.live_bytes.pop(generation, None)
+        self.maps.pop(generation, None)
+
+        os.remove(self._generation_path(generation))
+
+        self.write_lock.release()
+
+    def _open_active(self, generation: int) -> None:
+        '''
+        Open a new (empty) generation for appending
+        '''
+        if self.active_file is not None:
+            self.active_file.close()
+
+        self.active_id = generation
+        self.active_file = open(self._generation_path(generation), 'w+b')
+        self.active_end = 0
+
+        self.generations.append(generation)
+        self.total_bytes[generation] = 0
+        self.live_bytes[generation] = 0
+
+    def _generation_path(self, generation: int) -> str:
+        # the first generation keeps the configured path
+        return self.path if generation == 0 else f'{self.path}.{generation}'
@@ -0,0 +1,11 @@
+'''
+Test Setup, the kvstore modules are imported from the kvstore directory,
+and the router keeps its values in memory (no spill file, no durable log)
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['MEMORY_BUDGET'] = '0'
+os.environ['DURABLE_LOG_DIR'] = ''
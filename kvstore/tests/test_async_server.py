@@ -0,0 +1,143 @@
+'''
+Tests of the asyncio server mode, served in-process on an ephemeral port
+'''
+import json
+import asyncio
+import threading
+import http.client
+from hashlib import md5
+import pytest
+from key_val_store import KeyValueStore
+from transfer import UploadSessions
+from metrics import RouteMetrics
+from async_server import AsyncServer
+
+
+@pytest.fixture
+def served(tmp_path):
+    '''
+    Serve a store (with a memory budget of 1000 bytes) from an event loop in a thread,
+    yields the store and a keep-alive connection to the server
+    '''
+    store = KeyValueStore(1000, str(tmp_path / 'spill.seg'))
+    server = AsyncServer(store, UploadSessions(), RouteMetrics())
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    listener = asyncio.run_coroutine_threadsafe(
+        asyncio.start_server(server.handle_connection, '127.0.0.1', 0), loop).result()
+    port = listener.sockets[0].getsockname()[1]
+
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+
+    yield store, connection
+
+    connection.close()
+    asyncio.run_coroutine_threadsafe(shutdown(listener), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+async def shutdown(listener: asyncio.AbstractServer) -> None:
+    '''
+    Stop listening, and end the connections still being served
+    '''
+    listener.close()
+
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def request(connection: http.client.HTTPConnection, method: str, path: str, body=None, headers=None,
+            chunked=False):
+    '''
+    Send a request on the connection, returns the status, headers and body of the reply
+    '''
+    connection.request(method, path, body=body, headers=headers or {}, encode_chunked=chunked)
+    reply = connection.getresponse()
+
+    return reply.status, dict(reply.getheaders()), reply.read()
+
+
+def test_requests_share_a_keep_alive_connection(served):
+    _, connection = served
+
+    status, _, body = request(connection, 'POST', '/set', json.dumps({'value': 'hello'}),
+                              {'Content-Type': 'application/json'})
+    key = json.loads(body)['key']
+    assert status == 200
+
+    status, _, body = request(connection, 'GET', f'/get?key={key}')
+    assert (status, json.loads(body)['value']) == (200, 'hello')
+
+    status, _, _ = request(connection, 'GET', '/get?key=missing')
+    assert status == 404
+
+    # a binary value is only served by the blob route
+    status, _, body = request(connection, 'POST', '/blob/put', bytes(range(256)))
+    status, _, _ = request(connection, 'GET', f'/get?key={json.loads(body)["key"]}')
+    assert status == 406
+
+    # all of them on the one connection
+    assert connection.sock is not None
+
+
+def test_streamed_bodies_are_hashed_as_they_arrive(served):
+    store, connection = served
+    value = bytes(range(256)) * 3
+
+    status, _, body = request(connection, 'POST', '/blob/put?job_name=job&cluster_id=cluster&round=0', value)
+    key = json.loads(body)['key']
+
+    assert status == 200
+    assert key == md5(value).hexdigest()
+    assert bytes(store.get(key)[0]) == value
+    assert store.list_keys()[key] == [('job', 'cluster', 0)]
+
+    # a chunked body, whose size is not known up front
+    chunks = [value[:100], value[100:500], value[500:]]
+    status, _, body = request(connection, 'POST', '/blob/put', iter(chunks),
+                              {'Transfer-Encoding': 'chunked'}, chunked=True)
+    assert (status, json.loads(body)['key']) == (200, key)
+
+
+def test_spilled_values_are_sent_from_the_file(served):
+    store, connection = served
+    values = [bytes([i]) * 600 for i in range(3)]
+
+    keys = [json.loads(request(connection, 'POST', '/blob/put', value)[2])['key'] for value in values]
+
+    # the first values are spilled out of the memory budget, and sent with sendfile
+    assert store.locate(keys[0]) is not None
+
+    for key, value in zip(keys, values):
+        status, headers, body = request(connection, 'GET', f'/blob/get/{key}')
+        assert (status, body) == (200, value)
+        assert headers['Accept-Ranges'] == 'bytes'
+
+    status, headers, body = request(connection, 'GET', f'/blob/get/{keys[0]}', headers={'Range': 'bytes=100-199'})
+    assert (status, body) == (206, values[0][100:200])
+    assert headers['Content-Range'] == 'bytes 100-199/600'
+
+    status, _, body = request(connection, 'GET', f'/blob/get/{keys[2]}', headers={'Range': 'bytes=500-'})
+    assert (status, body) == (206, values[2][500:])
+
+
+def test_unknown_route_closes_the_connection(served):
+    _, connection = served
+
+    status, headers, _ = request(connection, 'GET', '/nothing')
+    assert status == 404
+    assert headers['Connection'] == 'close'
+
+    # the next request reconnects
+    status, _, body = request(connection, 'GET', '/metrics')
+    routes = json.loads(body)['routes']
+    assert status == 200
+    assert routes['unmatched']['count'] == 1
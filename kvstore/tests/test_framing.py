@@ -0,0 +1,50 @@
+'''
+Tests of the framed /mget and /mput routes
+'''
+import io
+import struct
+import pytest
+import main
+from framing import GET_FRAME_FORMAT, GET_FRAME_SIZE, PUT_FRAME_FORMAT, iter_put_frames
+from key_val_store import hash_function
+
+
+def pack_put_frames(values: list) -> bytes:
+    return b''.join(struct.pack(PUT_FRAME_FORMAT, len(value)) + value for value in values)
+
+
+def unpack_get_frames(body: bytes) -> list:
+    frames, position = [], 0
+    while position < len(body):
+        digest, found, length = struct.unpack_from(GET_FRAME_FORMAT, body, position)
+        position += GET_FRAME_SIZE
+        frames.append((digest.hex(), body[position:position + length] if found else None))
+        position += length
+
+    return frames
+
+
+def test_put_frames_round_trip():
+    values = [b'first', b'', bytes(range(256)) * 10]
+
+    assert list(iter_put_frames(io.BytesIO(pack_put_frames(values)))) == values
+
+
+def test_truncated_put_frame():
+    with pytest.raises(ValueError):
+        list(iter_put_frames(io.BytesIO(pack_put_frames([b'value'])[:-1])))
+
+
+def test_mput_then_mget():
+    client = main.app.test_client()
+    values = [b'first value', bytes(range(256))]
+
+    keys = client.post('/mput', data=pack_put_frames(values),
+                       content_type='application/octet-stream').get_json()['keys']
+    assert keys == [hash_function(value) for value in values]
+
+    # the values come back in the order of the keys, missing keys are flagged
+    missing = hash_function(b'missing')
+    reply = client.post('/mget', json={'keys': keys + [missing]})
+
+    assert unpack_get_frames(reply.data) == list(zip(keys, values)) + [(missing, None)]
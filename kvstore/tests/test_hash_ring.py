@@ -0,0 +1,34 @@
+'''
+Tests of the consistent hashing ring of the kvstore shards
+'''
+from hash_ring import HashRing
+
+KEYS = [f'{i:032x}' for i in range(2000)]
+
+
+def test_single_shard_owns_every_key():
+    ring = HashRing(['http://localhost:6666'])
+
+    assert all(ring.get_shard(key) == 'http://localhost:6666' for key in KEYS)
+
+
+def test_keys_are_spread_across_the_shards():
+    shards = [f'http://localhost:{port}' for port in range(6666, 6670)]
+    ring = HashRing(shards)
+
+    owners = [ring.get_shard(key) for key in KEYS]
+
+    # routing is stable, and every shard gets a fair part of the keys
+    assert owners == [HashRing(shards).get_shard(key) for key in KEYS]
+    assert all(owners.count(shard) > len(KEYS) / len(shards) / 2 for shard in shards)
+
+
+def test_adding_a_shard_only_moves_keys_to_it():
+    shards = [f'http://localhost:{port}' for port in range(6666, 6670)]
+    before = HashRing(shards)
+    after = HashRing(shards + ['http://localhost:6670'])
+
+    moved = [key for key in KEYS if before.get_shard(key) != after.get_shard(key)]
+
+    assert all(after.get_shard(key) == 'http://localhost:6670' for key in moved)
+    assert len(moved) < len(KEYS) / 3
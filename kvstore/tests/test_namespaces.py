@@ -0,0 +1,37 @@
+'''
+Tests of the namespace tags and the round garbage collection of the Key Value Store
+'''
+from key_val_store import KeyValueStore
+
+
+def test_retired_namespace_is_collected(tmp_path):
+    store = KeyValueStore(0, str(tmp_path / 'spill.seg'))
+
+    shared = store.set(b'shared', ('job', 'cluster', 0))
+    store.set(b'shared', ('job', 'cluster', 1))
+    old = store.set(b'old', ('job', 'cluster', 0))
+    kept = store.set(b'kept', ('job', 'cluster', 0))
+    untagged = store.set(b'untagged')
+
+    assert store.retire(('job', 'cluster', 0), keep=[kept], carry_to=('job', 'cluster', 1)) == 1
+
+    assert not store.check(old)
+    assert store.check(shared) and store.check(kept) and store.check(untagged)
+
+    # the kept key is now held by the next round
+    assert store.drop_job('job') == 2
+    assert store.check(untagged)
+    assert store.stats()['objects'] == 1
+
+
+def test_kept_keys_are_not_released_without_carry_to(tmp_path):
+    store = KeyValueStore(0, str(tmp_path / 'spill.seg'))
+
+    old = store.set(b'old', ('job', 'cluster', 0))
+    kept = store.set(b'kept', ('job', 'cluster', 0))
+
+    assert store.retire(('job', 'cluster', 0), keep=[kept]) == 1
+
+    assert not store.check(old)
+    assert store.check(kept)
+    assert store.list_keys()[kept] == []
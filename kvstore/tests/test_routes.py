@@ -0,0 +1,36 @@
+'''
+Tests of the Key Value Store routes
+'''
+import main
+
+
+def test_get_text_value():
+    client = main.app.test_client()
+
+    key = client.post('/set', json={'value': 'hello'}).get_json()['key']
+    reply = client.get('/get', query_string={'key': key})
+
+    assert reply.status_code == 200
+    assert reply.get_json()['value'] == 'hello'
+
+
+def test_get_binary_value_is_not_acceptable():
+    client = main.app.test_client()
+
+    value = bytes(range(256))
+    key = client.post('/blob/put', data=value).get_json()['key']
+    reply = client.get('/get', query_string={'key': key})
+
+    assert reply.status_code == 406
+    assert reply.get_json()['status'] is False
+
+    # the binary value is still served by the blob route
+    assert client.get(f'/blob/get/{key}').data == value
+
+
+def test_get_missing_key():
+    client = main.app.test_client()
+
+    reply = client.get('/get', query_string={'key': 'missing'})
+
+    assert reply.status_code == 404
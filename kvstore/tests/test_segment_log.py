@@ -0,0 +1,40 @@
+'''
+Tests of the durable log of the Key Value Store
+'''
+from key_val_store import KeyValueStore
+
+
+def test_durable_log_recovery(tmp_path):
+    log_dir = str(tmp_path / 'log')
+    store = KeyValueStore(0, str(tmp_path / 'spill.seg'), log_dir, 1024)
+
+    kept = store.set(b'kept' * 100, ('job', 'cluster', 0))
+    deleted = store.set(b'deleted' * 100)
+    store.delete(deleted)
+
+    # a restarted store rebuilds the index and the namespaces from the log
+    recovered = KeyValueStore(0, str(tmp_path / 'spill.seg'), log_dir, 1024)
+
+    assert bytes(recovered.get(kept)[0]) == b'kept' * 100
+    assert not recovered.check(deleted)
+    assert recovered.list_keys()[kept] == [('job', 'cluster', 0)]
+
+
+def test_durable_log_compaction(tmp_path):
+    log_dir = str(tmp_path / 'log')
+    store = KeyValueStore(0, str(tmp_path / 'spill.seg'), log_dir, 1024)
+
+    values = [bytes([i]) * 600 for i in range(6)]
+    keys = [store.set(value) for value in values]
+
+    # the segments of the first values are mostly dead
+    for key in keys[:4]:
+        store.delete(key)
+
+    assert store.compact(0.5) > 0
+
+    recovered = KeyValueStore(0, str(tmp_path / 'spill.seg'), log_dir, 1024)
+    for key, value in zip(keys, values):
+        assert recovered.check(key) == (key in keys[4:])
+        if key in keys[4:]:
+            assert bytes(recovered.get(key)[0]) == value
@@ -0,0 +1,60 @@
+'''
+Tests of the in-memory and spilled tiers of the Key Value Store
+'''
+import os
+from key_val_store import KeyValueStore, hash_function
+
+
+def test_spilled_values_round_trip(tmp_path):
+    store = KeyValueStore(100, str(tmp_path / 'spill.seg'))
+
+    values = [bytes([i]) * 60 for i in range(5)]
+    keys = [store.set(value) for value in values]
+
+    # only the most recent value fits in the budget
+    assert store.stats()['memory_bytes'] <= 100
+    assert store.stats()['disk_bytes'] == 60 * 4
+
+    for key, value in zip(keys, values):
+        assert key == hash_function(value)
+        assert bytes(store.get(key)[0]) == value
+
+
+def test_deleted_bytes_are_counted_without_reading_back(tmp_path, monkeypatch):
+    store = KeyValueStore(100, str(tmp_path / 'spill.seg'))
+
+    spilled = store.set(b'a' * 60, ('job', 'cluster', 0))
+    store.set(b'b' * 60)
+
+    # the counters come from the location of the spilled value
+    monkeypatch.setattr(store.disk, 'read', None)
+
+    assert store.retire(('job', 'cluster', 0)) == 1
+    assert not store.check(spilled)
+    assert store.stats()['bytes_out'] == 60
+    assert store.stats()['disk_bytes'] == 0
+    assert store.stats()['objects'] == 1
+
+
+def test_spill_file_is_compacted(tmp_path):
+    spill_path = str(tmp_path / 'spill.seg')
+    store = KeyValueStore(1, spill_path)
+
+    values = [bytes([i]) * 1000 for i in range(10)]
+    keys = [store.set(value) for value in values]
+
+    for key in keys[:8]:
+        store.delete(key)
+
+    assert store.stats()['disk_bytes'] == 1000 * 2
+
+    # the spilled file is rotated, and only the live values are carried over
+    assert store.compact(0.5) == 1
+    assert not os.path.exists(spill_path)
+    assert os.path.getsize(f'{spill_path}.1') < 2 * 1100
+
+    for key, value in zip(keys[8:], values[8:]):
+        assert bytes(store.get(key)[0]) == value
+
+    # nothing to compact while most of the file is live
+    assert store.compact(0.5) == 0
@@ -0,0 +1,67 @@
+'''
+Tests of the chunked uploads and Range downloads of large values
+'''
+import main
+from key_val_store import hash_function
+from transfer import UploadSessions, parse_range
+
+
+def test_upload_is_resumed_from_its_offset():
+    sessions = UploadSessions()
+    value = bytes(range(256)) * 4
+
+    upload_id = sessions.create(len(value))
+    assert sessions.write(upload_id, 0, value[:300]) == (True, 300)
+
+    # a chunk at the wrong offset is rejected with the offset to resume from
+    assert sessions.write(upload_id, 200, value[200:500]) == (False, 300)
+    assert sessions.commit(upload_id) is None
+
+    assert sessions.status(upload_id) == 300
+    assert sessions.write(upload_id, 300, value[300:]) == (True, len(value))
+
+    buffer, namespace, key = sessions.commit(upload_id)
+    assert bytes(buffer) == value and namespace is None and key == hash_function(value)
+    assert sessions.status(upload_id) is None
+
+
+def test_idle_uploads_expire():
+    sessions = UploadSessions(ttl=-1)
+
+    upload_id = sessions.create(10)
+    sessions.expire()
+
+    assert sessions.write(upload_id, 0, b'0123456789') == (False, None)
+
+
+def test_parse_range():
+    assert parse_range('bytes=0-9', 100) == (0, 9)
+    assert parse_range('bytes=90-', 100) == (90, 99)
+    assert parse_range('bytes=-10', 100) == (90, 99)
+    assert parse_range('bytes=90-200', 100) == (90, 99)
+
+    # unsatisfiable or unsupported ranges send the whole value
+    assert parse_range('bytes=100-', 100) is None
+    assert parse_range('bytes=0-1,5-6', 100) is None
+    assert parse_range('items=0-1', 100) is None
+    assert parse_range(None, 100) is None
+
+
+def test_chunked_upload_and_range_download():
+    client = main.app.test_client()
+    value = bytes(range(256)) * 40
+
+    upload_id = client.post('/blob/upload', query_string={'size': len(value)}).get_json()['upload_id']
+    for offset in range(0, len(value), 4096):
+        reply = client.put(f'/blob/upload/{upload_id}', query_string={'offset': offset},
+                           data=value[offset:offset + 4096])
+        assert reply.status_code == 200
+
+    key = client.post(f'/blob/upload/{upload_id}/commit').get_json()['key']
+    assert key == hash_function(value)
+
+    reply = client.get(f'/blob/get/{key}', headers={'Range': 'bytes=5000-5999'})
+
+    assert reply.status_code == 206
+    assert reply.headers['Content-Range'] == f'bytes 5000-5999/{len(value)}'
+    assert reply.data == value[5000:6000]
@@ -0,0 +1,143 @@
+'''
+Chunked Resumable Uploads and Range Requests for Large Values
+'''
+import uuid
+import threading
+from time import time
+from hashlib import md5
+from typing import Tuple, Union
+
+
+class UploadSession:
+    '''
+    Upload Session Class, the value is received in order into a buffer
+    preallocated to its full size, and hashed on the way in
+    '''
+
+    def __init__(self, size: int, namespace: Union[tuple, None]):
+        self.buffer = bytearray(size)
+        self.namespace = namespace
+        self.offset = 0
+        self.hasher = md5()
+        self.last_active = time()
+        self.lock = threading.Lock()
+
+
+class UploadSessions:
+    '''
+    Upload Sessions Class, keeps the sessions of the uploads in progress,
+    an interrupted upload is resumed from the offset of its session.
+    Sessions idle for longer than ttl seconds are dropped.
+    '''
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.sessions = dict()
+        self.sessions_lock = threading.Lock()
+
+    def create(self, size: int, namespace: Union[tuple, None] = None) -> str:
+        '''
+        Create an upload session for a value of size bytes, returns its id
+        '''
+        self.expire()
+
+        upload_id = uuid.uuid4().hex
+
+        self.sessions_lock.acquire()
+        self.sessions[upload_id] = UploadSession(size, namespace)
+        self.sessions_lock.release()
+
+        return upload_id
+
+    def status(self, upload_id: str) -> Union[int, None]:
+        '''
+        Get the offset received so far, None if the session is not found
+        '''
+        session = self.sessions.get(upload_id)
+        if session is None:
+            return None
+
+        return session.offset
+
+    def write(self, upload_id: str, offset: int, chunk: bytes) -> Tuple[bool, Union[int, None]]:
+        '''
+        Write a chunk at offset, which must be the offset received so far.
+        Returns the status and the new (or expected) offset,
+        the offset is None if the session is not found.
+        '''
+        session = self.sessions.get(upload_id)
+        if session is None:
+            return False, None
+
+        session.lock.acquire()
+
+        if offset != session.offset or offset + len(chunk) > len(session.buffer):
+            session.lock.release()
+            return False, session.offset
+
+        session.buffer[offset:offset + len(chunk)] = chunk
+        session.hasher.update(chunk)
+        session.offset += len(chunk)
+        session.last_active = time()
+
+        session.lock.release()
+
+        return True, session.offset
+
+    def commit(self, upload_id: str) -> Union[Tuple[bytearray, Union[tuple, None], str], None]:
+        '''
+        Close a completely received session,
+        returns (value, namespace, key) or None if the session is not found or incomplete
+        '''
+        self.sessions_lock.acquire()
+
+        session = self.sessions.get(upload_id)
+        if session is None or session.offset != len(session.buffer):
+            self.sessions_lock.release()
+            return None
+
+        del self.sessions[upload_id]
+
+        self.sessions_lock.release()
+
+        return session.buffer, session.namespace, session.hasher.hexdigest()
+
+    def expire(self) -> None:
+        '''
+        Drop the sessions idle for longer than the ttl
+        '''
+        now = time()
+
+        self.sessions_lock.acquire()
+        for upload_id in list(self.sessions.keys()):
+            if now - self.sessions[upload_id].last_active > self.ttl:
+                del self.sessions[upload_id]
+        self.sessions_lock.release()
+
+
+def parse_range(header: Union[str, None], total: int) -> Union[Tuple[int, int], None]:
+    '''
+    Parse a single "bytes=start-end" Range header into an inclusive (start, end),
+    returns None if there is no satisfiable range (the whole value is then sent)
+    '''
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    start, _, end = header[len('bytes='):].strip().partition('-')
+
+    try:
+        if start == '':
+            # suffix range, the last end bytes
+            length = int(end)
+            start, end = max(0, total - length), total - 1
+        else:
+            start = int(start)
+            end = int(end) if end != '' else total - 1
+    except ValueError:
+        return None
+
+    end = min(end, total - 1)
+    if start > end:
+        return None
+
+    return start, end
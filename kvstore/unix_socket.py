@@ -0,0 +1,19 @@
+'''
+Unix Domain Socket Listener, for the nodes running on the same host
+'''
+import threading
+from flask import Flask
+from werkzeug.serving import make_server
+
+
+def serve_unix_socket(app: Flask, path: str) -> None:
+    '''
+    Also serve the app on a Unix domain socket, in a background thread.
+    A leftover socket file of a previous run is replaced.
+    '''
+    server = make_server(f'unix://{path}', 0, app, threaded=True)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    print(f' * Also serving on unix://{path}')
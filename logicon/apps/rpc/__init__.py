@@ -0,0 +1,97 @@
+'''
+Binary RPC Server for the Job Operations
+
+A compact alternative to the Flask routes: msgpack frames over persistent TCP connections.
+A request is [msg_id, operation, params] and its reply is [msg_id, status_code, body],
+with the same body as the Flask route of the operation. A client can pipeline requests,
+i.e., send many of them before reading the replies, which are sent back in order.
+'''
+import socket
+import traceback
+import threading
+import socketserver
+import msgpack
+from helpers.logging import logger
+from logic.operations import OPERATIONS
+
+RECV_SIZE = 256 * 1024
+
+
+class RPCHandler(socketserver.BaseRequestHandler):
+    '''
+    RPC Connection Handler, serves the requests of a connection until it is closed
+    '''
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        unpacker = msgpack.Unpacker(raw=False)
+        packer = msgpack.Packer(use_bin_type=True)
+
+        while True:
+            try:
+                data = self.request.recv(RECV_SIZE)
+            except OSError:
+                return
+
+            if not data:
+                return
+
+            unpacker.feed(data)
+
+            # reply to all the pipelined requests received so far at once
+            try:
+                replies = [packer.pack(dispatch(message))
+                           for message in unpacker]
+            except ValueError:
+                logger.error('Malformed RPC stream, closing the connection.')
+                return
+
+            if len(replies) > 0:
+                try:
+                    self.request.sendall(b''.join(replies))
+                except OSError:
+                    return
+
+
+class RPCServer(socketserver.ThreadingTCPServer):
+    '''
+    Threaded RPC Server, a thread per connection
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def dispatch(message: list) -> list:
+    '''
+    Run the operation of a request, and get its reply
+    '''
+    try:
+        msg_id, operation, params = message
+    except (TypeError, ValueError):
+        return [None, 400, {'message': 'Malformed request.', 'status': False}]
+
+    if operation not in OPERATIONS:
+        return [msg_id, 404, {'message': f'Unknown operation [{operation}].', 'status': False}]
+
+    try:
+        body, code = OPERATIONS[operation](params if params is not None else dict())
+        return [msg_id, code, body]
+    except Exception:
+        logger.error(
+            f'Failed to serve RPC operation [{operation}].\n{traceback.format_exc()}')
+        return [msg_id, 500, {'message': f'Failed to serve operation [{operation}]!', 'status': False}]
+
+
+def start_rpc_server(port: int, host='0.0.0.0') -> RPCServer:
+    '''
+    Start the RPC server in a background thread
+    '''
+    server = RPCServer((host, port), RPCHandler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    logger.info(f'Logicon RPC server listening on {host}:{port}')
+
+    return server
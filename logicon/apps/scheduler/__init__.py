@@ -32,6 +32,18 @@ def schedule_job_status(participants: dict, job_status: dict, exec_params: dict,
         return job_status
 
     elif process_stage == 2 and node_type == 'worker':
+        # in the sharded aggregation mode, all the workers aggregate their slices in parallel
+        if 'aggregation_shards' in job_status and len(job_status['aggregation_shards']) > 0:
+            job_status['start_scheduled_execution'] = node_id in job_status['aggregation_shards']
+            return job_status
+
+        # in the digest consensus mode, the proposer aggregates first, then all the verifiers in parallel
+        if 'digest_consensus' in job_status and len(job_status['digest_consensus']) > 0:
+            proposer = job_status['digest_consensus']['proposer']
+            job_status['start_scheduled_execution'] = node_id == proposer or \
+                proposer in exec_params['worker_aggregated_params']
+            return job_status
+
         workers_to_allow = []
         for i in range(min(max_parallel, len(workers))):
             node_index = min(i+num_worker_params, len(workers)-1)
@@ -0,0 +1,181 @@
+'''
+Requests per Second Benchmark of the Logicon HTTP Routes and the RPC Endpoint
+
+Usage: python benchmark.py --url http://localhost:5555 --rpc tcp://localhost:5556 --clients 16 --requests 2000
+
+Creates a small benchmark job, then emulates the status polls of the nodes:
+every client is a thread with its own persistent connection, calling get_job_status
+over the HTTP route, then over the RPC endpoint (one request at a time, and pipelined).
+Reports the requests per second and the latency percentiles of each phase.
+'''
+import json
+import socket
+import argparse
+import threading
+import http.client
+from time import perf_counter, time
+from urllib.parse import urlsplit, urlencode
+import msgpack
+
+
+def percentile(values: list, q: float) -> float:
+    '''
+    Get the q-th percentile of a list of values
+    '''
+    if len(values) == 0:
+        return float('nan')
+
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+
+    return values[index]
+
+
+def create_job(url: str, job_name: str, nodes: int) -> None:
+    '''
+    Create the benchmark job, with a single cluster of clients and a worker
+    '''
+    clients = [f'bench-client-{i}' for i in range(nodes)]
+    manifest = {
+        'templates': [],
+        'clients': {client_id: {} for client_id in clients},
+        'workers': {'bench-worker-0': {}},
+        'clusters': {'bench': {'upstream_cluster': None, 'clients': clients, 'workers': ['bench-worker-0']}}
+    }
+
+    target = urlsplit(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port)
+    conn.request('POST', '/job/create', body=json.dumps({'job_name': job_name, 'manifest': manifest}),
+                 headers={'Content-Type': 'application/json'})
+    reply = json.loads(conn.getresponse().read())
+    conn.close()
+
+    if not reply['status']:
+        raise RuntimeError(f'Failed to create the benchmark job: {reply["message"]}')
+
+
+def run_phase(clients: int, requests: int, connect, task) -> dict:
+    '''
+    Run the requests of a task split across the clients concurrently,
+    and collect the latency of every batch of requests
+    '''
+    barrier = threading.Barrier(clients + 1)
+    latencies = [[] for _ in range(clients)]
+    errors = [0]
+    errors_lock = threading.Lock()
+
+    def client(index: int):
+        conn = connect()
+        count = requests // clients + (1 if index < requests % clients else 0)
+        barrier.wait()
+
+        try:
+            while count > 0:
+                start = perf_counter()
+                count -= task(conn, count)
+                latencies[index].append(perf_counter() - start)
+        except Exception:
+            with errors_lock:
+                errors[0] += 1
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = perf_counter()
+
+    for thread in threads:
+        thread.join()
+
+    wall_time = perf_counter() - start
+    done = [latency for client_latencies in latencies for latency in client_latencies]
+
+    return {'wall_time': wall_time, 'errors': errors[0],
+            'p50': percentile(done, 50), 'p95': percentile(done, 95), 'p99': percentile(done, 99)}
+
+
+def benchmark(url: str, rpc_url: str, clients: int, requests: int, depth: int) -> None:
+    '''
+    Poll the job status over HTTP, RPC and pipelined RPC
+    '''
+    job_name = f'benchmark-{int(time())}'
+    create_job(url, job_name, clients)
+
+    params = {'job_name': job_name, 'cluster_id': 'bench',
+              'node_id': 'bench-client-0', 'node_type': 'client'}
+
+    http_target, rpc_target = urlsplit(url), urlsplit(rpc_url)
+    query = f'/job/get_job_status?{urlencode(params)}'
+
+    def http_connect():
+        return http.client.HTTPConnection(http_target.hostname, http_target.port, timeout=60)
+
+    def http_task(conn, _):
+        conn.request('GET', query)
+        reply = conn.getresponse()
+        if not json.loads(reply.read())['status']:
+            raise ValueError('Failed request')
+
+        # the Werkzeug development server closes every connection
+        if reply.will_close:
+            conn.close()
+
+        return 1
+
+    class RPCClient(object):
+        def __init__(self):
+            self.sock = socket.create_connection((rpc_target.hostname, rpc_target.port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.unpacker = msgpack.Unpacker(raw=False)
+            self.packer = msgpack.Packer(use_bin_type=True)
+
+        def call_many(self, count: int) -> int:
+            self.sock.sendall(b''.join(self.packer.pack([msg_id, 'get_job_status', params])
+                                       for msg_id in range(count)))
+            received = 0
+            while received < count:
+                self.unpacker.feed(self.sock.recv(256 * 1024))
+                for _, code, _ in self.unpacker:
+                    if code != 200:
+                        raise ValueError('Failed request')
+                    received += 1
+            return count
+
+        def close(self):
+            self.sock.close()
+
+    phases = (('http', http_connect, http_task),
+              ('rpc', RPCClient, lambda conn, _: conn.call_many(1)),
+              (f'rpc x{depth}', RPCClient, lambda conn, count: conn.call_many(min(depth, count))))
+
+    for name, connect, task in phases:
+        stats = run_phase(clients, requests, connect, task)
+
+        print(f'{name:>8}: {stats["wall_time"]:8.2f}s wall, {requests / stats["wall_time"]:10.1f} req/s, '
+              f'latency p50 {stats["p50"] * 1000:.2f}ms p95 {stats["p95"] * 1000:.2f}ms p99 {stats["p99"] * 1000:.2f}ms, '
+              f'{stats["errors"]} errors')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Requests per second benchmark of the logicon HTTP routes and RPC endpoint.')
+    parser.add_argument('--url', type=str, default='http://localhost:5555',
+                        help='url of the logicon HTTP server')
+    parser.add_argument('--rpc', type=str, default='tcp://localhost:5556',
+                        help='url of the logicon RPC endpoint')
+    parser.add_argument('--clients', type=int, default=16,
+                        help='number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='total number of requests per phase')
+    parser.add_argument('--depth', type=int, default=16,
+                        help='number of requests pipelined per batch')
+    args = parser.parse_args()
+
+    print(f'Benchmarking {args.url} and {args.rpc} with {args.clients} clients, '
+          f'{args.requests} requests per phase.')
+
+    benchmark(args.url, args.rpc, args.clients, args.requests, args.depth)
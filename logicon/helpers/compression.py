@@ -0,0 +1,50 @@
+'''
+Gzip support for the JSON traffic of the nodes
+'''
+import io
+import gzip
+from flask import Request, Response
+
+# JSON replies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+class GzipRequestMiddleware(object):
+    '''
+    WSGI Middleware, decompresses request bodies sent with Content-Encoding: gzip,
+    so that the routes read them as usual (e.g., with request.get_json())
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            body = gzip.decompress(environ['wsgi.input'].read(length))
+
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+
+        return self.app(environ, start_response)
+
+
+def gzip_response(request: Request, response: Response) -> Response:
+    '''
+    Compress a large JSON reply, if the client accepts gzip
+    '''
+    if response.direct_passthrough or response.mimetype != 'application/json' \
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower() \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    if len(body) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(body, 5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+
+    return response
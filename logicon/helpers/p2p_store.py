@@ -0,0 +1,62 @@
+'''
+Key Value Store Module, for the garbage collection of job namespaces
+'''
+import os
+import traceback
+from dotenv import load_dotenv
+from helpers import http
+from helpers.logging import logger
+
+# import environment variables
+load_dotenv()
+
+# comma separated list of kvstore shards, namespaces span all of them
+KVS_URLS = [url.strip() for url in os.getenv('P2PSTORE_URL', '').split(',') if url.strip()]
+
+
+def retire_round(job_name: str, cluster_id: str, round_num: int, keep: list, carry_to_round: int) -> int:
+    '''
+    Retire the (job_name, cluster_id, round_num) namespace in the kvstore,
+    the keys in keep are carried over to the carry_to_round namespace.
+    Returns the number of deleted keys.
+    '''
+
+    deleted = 0
+    for kvs_url in KVS_URLS:
+        try:
+            reply = http.post(f'{kvs_url}/namespace/retire',
+                              {'job_name': job_name, 'cluster_id': cluster_id, 'round': round_num,
+                               'keep': keep, 'carry_to_round': carry_to_round})
+
+            deleted += reply['deleted']
+        except Exception:
+            logger.warning(
+                f'[{job_name}#{cluster_id}] Failed to retire round [{round_num}] in KVStore [{kvs_url}].\n{traceback.format_exc()}')
+
+    logger.info(
+        f'[{job_name}#{cluster_id}] Retired round [{round_num}], deleted {deleted} keys.')
+
+    return deleted
+
+
+def drop_job(job_name: str) -> int:
+    '''
+    Drop all the namespaces of a job in the kvstore,
+    returns the number of deleted keys.
+    '''
+
+    deleted = 0
+    for kvs_url in KVS_URLS:
+        try:
+            reply = http.post(f'{kvs_url}/namespace/drop_job',
+                              {'job_name': job_name})
+
+            deleted += reply['deleted']
+        except Exception:
+            logger.warning(
+                f'[{job_name}] Failed to drop job namespace in KVStore [{kvs_url}].\n{traceback.format_exc()}')
+
+    logger.info(
+        f'[{job_name}] Dropped job namespace, deleted {deleted} keys.')
+
+    return deleted
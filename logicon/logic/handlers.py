@@ -2,9 +2,10 @@
 Auxuliary Scripts for Job Handling
 '''
 import threading
-from typing import Dict
+from typing import Dict, Union
 from logic.job import Job
 from logic.consensus_exec import exec_consensus
+from helpers import p2p_store
 
 
 def recursive_allow_jobsheet_download(job: Job, job_locks: Dict[str, threading.Lock]) -> bool:
@@ -46,8 +47,11 @@ def recursive_allow_training(job: Job, job_locks: Dict[str, threading.Lock]) ->
     Recursively allow training in top to bottom
     '''
 
-    status, terminate = job.set_global_model_param(
-        job.exec_params['initial_params'][0], 'empty')
+    initial_param = job.exec_params['initial_params'][0]
+    status, terminate = job.set_global_model_param(initial_param, 'empty')
+    if status:
+        retire_previous_round(job, initial_param, None, False)
+
     if terminate:
         status = job.terminate_training() and status
     else:
@@ -243,6 +247,9 @@ def recursive_set_global_params_and_start_training(job: Job, param: str, extra_d
     from root to leaf
     '''
     status, terminate = job.set_global_model_param(param, extra_data, is_epoch)
+    if status:
+        retire_previous_round(job, param, extra_data, is_epoch)
+
     if terminate:
         status = job.terminate_training() and status
     else:
@@ -258,6 +265,24 @@ def recursive_set_global_params_and_start_training(job: Job, param: str, extra_d
     return status
 
 
+def retire_previous_round(job: Job, param: str, extra_data: Union[str, dict], is_epoch: bool) -> None:
+    '''
+    Retire the kvstore namespace of the round (or cluster epoch) that just ended,
+    carrying the new global param (and its delta manifest and delta) over to the current round
+    '''
+    current_round = job.job_status['global_round']
+    previous_round = current_round if is_epoch else current_round - 1
+
+    keep = [param]
+    if isinstance(extra_data, dict):
+        for field in ['delta_manifest', 'delta']:
+            if field in extra_data and extra_data[field] is not None:
+                keep.append(extra_data[field])
+
+    p2p_store.retire_round(job.job_name, job.cluster_id,
+                           previous_round, keep, current_round)
+
+
 def append_initial_params(job: Job, node_id: str, param: str) -> bool:
     '''
     Wrapper function to append initial parameters to job
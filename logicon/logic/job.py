@@ -6,6 +6,10 @@ from typing import Tuple, Union
 from state import job_state
 from helpers.logging import logger
 
+# consensus module of the digest consensus mode, and its default sample size
+DIGEST_CONSENSUS = 'digest_2_3'
+DIGEST_SAMPLES = 1024
+
 
 class Job(object):
     '''
@@ -35,6 +39,12 @@ class Job(object):
                 'global_round': 0,              # denotes the current global round of federated training
                 'current_epoch': 1,             # denotes the current epoch for the cluster
                 'abort': False,                 # denotes whether to abort the job or not
+                'aggregation_shards': {         # slices of the flat parameter space aggregated by each worker (sharded mode)
+                    # 'worker-0': {'index': 0, 'count': 2}
+                },
+                'digest_consensus': {           # proposer worker and digest sample size (digest consensus mode)
+                    # 'proposer': 'worker-0', 'samples': 1024
+                },
                 'client_info': [                # stores the information of the client's individual status
                     # {
                     #     'client_id': 'client-0',
@@ -71,10 +81,32 @@ class Job(object):
                 self.workers.append(worker_id)
                 self._add_worker(worker_id, _internal=True)
 
+            # in the sharded aggregation mode, each worker aggregates a disjoint slice of the parameters
+            train_params = self.cluster_config['train_params'] if 'train_params' in self.cluster_config else dict()
+            if 'aggregation' in train_params and train_params['aggregation'] == 'sharded':
+                for index, worker_id in enumerate(self.workers):
+                    self.job_status['aggregation_shards'][worker_id] = {
+                        'index': index, 'count': len(self.workers)}
+
+            # in the digest consensus mode, only the first worker aggregates (and uploads) the full model,
+            # the others verify the digest of its coordinates at a seeded random sample of indices
+            consensus_params = self.cluster_config['consensus_params'] if 'consensus_params' in self.cluster_config else dict()
+            consensus_file = consensus_params['runnable']['file'] if 'runnable' in consensus_params else ''
+            if consensus_file.replace('.py', '') == DIGEST_CONSENSUS:
+                if len(self.job_status['aggregation_shards']) > 0:
+                    logger.warning(
+                        f'[{self.job_name}#{self.cluster_id}] Digest consensus is not used with the sharded aggregation, every worker holds the full model.')
+                else:
+                    self.job_status['digest_consensus'] = {
+                        'proposer': self.workers[0],
+                        'samples': consensus_params['digest_samples'] if 'digest_samples' in consensus_params else DIGEST_SAMPLES}
+
             self.exec_params = {
                 # trained and aggregated params are of schema {'client_id': {'param': Any, 'extra_data': Any}}
                 'client_trained_params': dict(),
                 'worker_aggregated_params': dict(),
+                # aggregated slices of the workers in the sharded mode, of schema {'worker_id': 'param'}
+                'worker_shard_params': dict(),
                 'global_model_param': {
                     'param': None,
                     'extra_data': None
@@ -633,6 +665,7 @@ class Job(object):
             # empty out client and worker params
             self.exec_params['client_trained_params'] = dict()
             self.exec_params['worker_aggregated_params'] = dict()
+            self.exec_params['worker_shard_params'] = dict()
 
             # increment global round
             if is_epoch:
@@ -739,6 +772,35 @@ class Job(object):
         self.modification_lock.release()
         return exec_status
 
+    def append_worker_shard(self, worker_id: str, param: str) -> bool:
+        '''
+        Append the Aggregated Slice of a Worker to the exec_params.worker_shard_params{},
+        in the sharded aggregation mode. Only works if job_status.process_phase=2.
+        '''
+        # method prefixed with locking and reading state
+        self.modification_lock.acquire()
+        self._read_state()
+        exec_status = True
+
+        # method logic
+        if self.job_status['process_stage'] == 2 and worker_id in self.job_status['aggregation_shards']:
+            # add worker submitted slice
+            self.exec_params['worker_shard_params'][worker_id] = param
+
+            logger.info(
+                f"[{worker_id}] submitted its aggregated slice. Total Slices: {len(self.exec_params['worker_shard_params'].keys())}/{len(self.job_status['aggregation_shards'])}")
+
+            # method suffixed with update state and lock release
+            self._update_state()
+        else:
+            logger.warning(
+                f'[{self.job_name}#{self.cluster_id}] Cannot APPEND worker aggregated slice!\nprocess_stage is {self.job_status["process_stage"]}\nworker [{worker_id}] shard is {self.job_status["aggregation_shards"].get(worker_id)}')
+            exec_status = False
+
+        # method suffixed with update state and lock release
+        self.modification_lock.release()
+        return exec_status
+
     def append_initial_params(self, node_id: str, param: str) -> bool:
         '''
         Append Initial Model Params from Clients and Workers to the exec_params.initial_params{}.
@@ -0,0 +1,499 @@
+'''
+Job Operations Module
+
+The job operations served by both the Flask routes and the RPC server,
+each taking the request params and returning the reply body and its status code.
+'''
+import threading
+import traceback
+from typing import Any, Tuple
+from state import job_route_state, job_locks, job_template_files
+from helpers.logging import logger
+from logic.job import Job
+from logic import handlers
+from helpers import p2p_store
+from apps.scheduler import schedule_job_status
+
+
+def list_jobs(params: dict) -> Tuple[Any, int]:
+    '''
+    returns the list of all the jobs present in the system
+    '''
+
+    jobs = list(job_route_state.keys())
+    jobs = list(filter(lambda job: 'root' not in job, jobs))
+
+    return jobs, 200
+
+
+def get_templates(params: dict) -> Tuple[Any, int]:
+    '''
+    get job template files
+    '''
+    job_name = params['job_name']
+
+    if job_name not in job_template_files:
+        return {'message': f'Job [{job_name}] does not exist.', 'payload': None, 'status': False}, 404
+
+    try:
+        templates = job_template_files[job_name]
+
+        return {'message': 'Fetch successful!', 'templates': templates, 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Fetch Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to fetch job templates!', 'payload': None, 'status': False}, 500
+
+
+def get_config(params: dict) -> Tuple[Any, int]:
+    '''
+    get job config
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    config_type = params['config_type']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'payload': None, 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        payload = handlers.get_config(job, config_type)
+
+        if payload is None:
+            return {'message': 'Malformed config_type.', 'payload': payload, 'status': False}, 403
+
+        return {'message': 'Fetch successful!', 'payload': payload, 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Fetch Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to fetch job config!', 'payload': None, 'status': False}, 500
+
+
+def get_participants(params: dict) -> Tuple[Any, int]:
+    '''
+    get job config
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'payload': None, 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        payload = handlers.get_participants(job)
+
+        if payload is None:
+            raise Exception('Job does not exist in job state variable')
+
+        return {'message': 'Fetch successful!', 'payload': payload, 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Fetch Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to fetch job participants!', 'payload': None, 'status': False}, 500
+
+
+def get_job_status(params: dict) -> Tuple[Any, int]:
+    '''
+    get job config
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+
+    node_id = None
+    if 'node_id' in params:
+        node_id = params['node_id']
+        node_type = params['node_type']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'payload': None, 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        participants = handlers.get_participants(job)
+        job_status = handlers.get_job_status(job)
+        exec_params = handlers.get_exec_params(job)
+
+        if node_id is not None:
+            payload = schedule_job_status(
+                participants, job_status, exec_params, node_id, node_type)
+        else:
+            payload = job_status
+
+        if payload is None:
+            raise Exception('Job does not exist in job state variable')
+
+        return {'message': 'Fetch successful!', 'payload': payload, 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Fetch Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to fetch job status!', 'payload': None, 'status': False}, 500
+
+
+def get_exec_params(params: dict) -> Tuple[Any, int]:
+    '''
+    get job config
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'payload': None, 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        payload = handlers.get_exec_params(job)
+
+        if payload is None:
+            raise Exception('Job does not exist in job state variable')
+
+        return {'message': 'Fetch successful!', 'payload': payload, 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Fetch Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to fetch job exec_params!', 'payload': None, 'status': False}, 500
+
+
+def create(params: dict) -> Tuple[Any, int]:
+    '''
+    initialize the jobs for clusters
+    '''
+    job_name = params['job_name']
+    job_manifest = params['manifest']
+
+    if job_name in job_route_state:
+        return {'message': f'Job with name [{job_name}] already exists.', 'status': False}, 403
+
+    job_template_files[job_name] = job_manifest['templates']
+
+    try:
+        for cluster_id in job_manifest['clusters'].keys():
+            job_id = f'{job_name}#{cluster_id}'
+
+            # create the job lock
+            job_locks[job_id] = threading.Lock()
+
+            # create the job_object
+            job = Job(job_name, cluster_id,
+                      job_manifest['clients'], job_manifest['workers'], job_manifest['clusters'], job_locks[job_id])
+
+            if job.is_primary:
+                job_route_state[f'{job_name}#root'] = job
+            job_route_state[job_id] = job
+
+            logger.info(f'Created job {job_id}')
+
+        return {'message': 'Job instance created successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Create Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to create job instance!', 'status': False}, 500
+
+
+def start(params: dict) -> Tuple[Any, int]:
+    '''
+    start the job for clusters
+    '''
+    job_name = params['job_name']
+
+    root_job_name = f'{job_name}#root'
+
+    if root_job_name not in job_route_state:
+        return {'message': f'Job with name [{job_name}] does not exist.', 'status': False}, 404
+
+    try:
+        root_job = job_route_state[root_job_name]
+        status = handlers.recursive_allow_jobsheet_download(
+            root_job, job_locks)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Job instance started successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Start Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to start job instance!', 'status': False}, 500
+
+
+def append_client_params(params: dict) -> Tuple[Any, int]:
+    '''
+    Append Trained Client Params to Job Instance of a cluster.
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    client_id = params['client_id']
+    param = params['param']
+    extra_data = params['extra_data']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        status = job.append_client_params(client_id, param, extra_data)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Client param appended successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to append client params.\n{traceback.format_exc()}')
+        return {'message': 'Failed to append client params!', 'status': False}, 500
+
+
+def append_worker_params(params: dict) -> Tuple[Any, int]:
+    '''
+    Append Aggregated Worker Params to Job Instance of a cluster.
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    worker_id = params['worker_id']
+    param = params['param']
+    extra_data = params['extra_data']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        status = job.append_worker_params(worker_id, param, extra_data)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Worker param appended successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to append worker params.\n{traceback.format_exc()}')
+        return {'message': 'Failed to append worker params!', 'status': False}, 500
+
+
+def append_worker_shard(params: dict) -> Tuple[Any, int]:
+    '''
+    Append the Aggregated Slice of a Worker to Job Instance of a cluster (sharded aggregation).
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    worker_id = params['worker_id']
+    param = params['param']
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'status': False}, 404
+
+    try:
+        job = job_route_state[job_id]
+        status = job.append_worker_shard(worker_id, param)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Worker slice appended successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to append worker slice.\n{traceback.format_exc()}')
+        return {'message': 'Failed to append worker slice!', 'status': False}, 500
+
+
+def update_client_status(params: dict) -> Tuple[Any, int]:
+    '''
+    Update Client Status to Job Instance of a cluster.
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    client_id = params['client_id']
+    client_status = params['status']
+    extra_data = params['extra_data'] if params['extra_data'] is not None else None
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'status': False}, 404
+
+    status = True
+
+    try:
+        leaf_job = job_route_state[job_id]
+
+        # special case: when client status is 2,
+        # they also submit the initial global parameters, append it.
+        if extra_data is not None and 'initial_param' in extra_data:
+            status = handlers.append_initial_params(
+                leaf_job, client_id, extra_data['initial_param']) and status
+
+        _status, side_effect = handlers.recursive_client_status_handler(
+            leaf_job, client_id, client_status, job_locks)
+        status = status and _status
+
+        if not status:
+            return {'message': f'Failure in compliance with Job Logic. {side_effect}', 'status': False}, 403
+
+        return {'message': 'Client status updated successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to update client status.\n{traceback.format_exc()}')
+        return {'message': 'Failed to update client status!', 'status': False}, 500
+
+
+def update_worker_status(params: dict) -> Tuple[Any, int]:
+    '''
+    Update Worker Status to Job Instance of a cluster.
+    '''
+    job_name = params['job_name']
+    cluster_id = params['cluster_id']
+    worker_id = params['worker_id']
+    worker_status = params['status']
+    extra_data = params['extra_data'] if params['extra_data'] is not None else None
+
+    job_id = f'{job_name}#{cluster_id}'
+
+    if job_id not in job_route_state:
+        return {'message': f'Job [{job_name}] for Cluster [{cluster_id}] does not exist.', 'status': False}, 404
+
+    status = True
+
+    try:
+        leaf_job = job_route_state[job_id]
+
+        # special case: when worker status is 2,
+        # they also submit the initial global parameters, append it.
+        if extra_data is not None and 'initial_param' in extra_data:
+            status = handlers.append_initial_params(
+                leaf_job, worker_id, extra_data['initial_param']) and status
+
+        _status, side_effect = handlers.recursive_worker_status_handler(
+            leaf_job, worker_id, worker_status, job_locks)
+        status = status and _status
+
+        if not status:
+            return {'message': f'Failure in compliance with Job Logic. {side_effect}', 'status': False}, 403
+
+        return {'message': 'Worker status updated successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to update worker status.\n{traceback.format_exc()}')
+        return {'message': 'Failed to update worker status!', 'status': False}, 500
+
+
+def set_abort(params: dict) -> Tuple[Any, int]:
+    '''
+    Abort a running job instance
+    '''
+    job_name = params['job_name']
+
+    root_job_name = f'{job_name}#root'
+
+    if root_job_name not in job_route_state:
+        return {'message': f'Job with name [{job_name}] does not exist.', 'status': False}, 404
+
+    try:
+        root_job = job_route_state[root_job_name]
+        status = handlers.recursive_abort_job(root_job, job_locks)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Job instance aborted successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Abort Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to abort job instance!', 'status': False}, 500
+
+
+def terminate_training(params: dict) -> Tuple[Any, int]:
+    '''
+    Terminate a running job instance
+    '''
+    job_name = params['job_name']
+
+    root_job_name = f'{job_name}#root'
+
+    if root_job_name not in job_route_state:
+        return {'message': f'Job with name [{job_name}] does not exist.', 'status': False}, 404
+
+    try:
+        root_job = job_route_state[root_job_name]
+        status = handlers.recursive_terminate_job(root_job, job_locks)
+
+        if not status:
+            return {'message': 'Failure in compliance with Job Logic.', 'status': False}, 403
+
+        return {'message': 'Job instance terminated successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Terminate Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to terminate job instance!', 'status': False}, 500
+
+
+def delete(params: dict) -> Tuple[Any, int]:
+    '''
+    Delete a terminated job instance
+    '''
+    job_name = params['job_name']
+
+    root_job_name = f'{job_name}#root'
+
+    if root_job_name not in job_route_state:
+        return {'message': f'Job with name [{job_name}] does not exist.', 'status': False}, 404
+
+    try:
+        root_job = job_route_state[root_job_name]
+        can_delete = handlers.recursive_check_delete_job(root_job, job_locks)
+
+        if can_delete:
+            for job_id in list(job_route_state.keys()):
+                if job_name == job_id.split('#')[0]:
+                    del job_route_state[job_id]
+
+            # drop the job's whole namespace from the kvstore
+            p2p_store.drop_job(job_name)
+
+        if not can_delete:
+            return {'message': 'Error! Jobs are not terminated.', 'status': False}, 403
+
+        return {'message': 'Job instance deleted successfully!', 'status': True}, 200
+    except Exception:
+        logger.error(
+            f'Failed to Delete Job Instance.\n{traceback.format_exc()}')
+        return {'message': 'Failed to delete job instance!', 'status': False}, 500
+
+
+
+# operations that can be safely repeated, i.e., retried by the clients
+IDEMPOTENT_OPERATIONS = {'list_jobs', 'get_templates', 'get_config', 'get_participants',
+                         'get_job_status', 'get_exec_params'}
+
+OPERATIONS = {
+    'list_jobs': list_jobs,
+    'get_templates': get_templates,
+    'get_config': get_config,
+    'get_participants': get_participants,
+    'get_job_status': get_job_status,
+    'get_exec_params': get_exec_params,
+    'create': create,
+    'start': start,
+    'append_client_params': append_client_params,
+    'append_worker_params': append_worker_params,
+    'append_worker_shard': append_worker_shard,
+    'update_client_status': update_client_status,
+    'update_worker_status': update_worker_status,
+    'set_abort': set_abort,
+    'terminate_training': terminate_training,
+    'delete': delete
+}
@@ -4,23 +4,48 @@ Main Module
 import os
 import logging
 from waitress import serve
-from flask import Flask
+from flask import Flask, request
 from dotenv import load_dotenv
 from routes.job import blueprint as job_manager
+from helpers.compression import GzipRequestMiddleware, gzip_response
+from helpers.unix_socket import serve_unix_socket
 
 # import environment variables
 load_dotenv()
 
 LISTEN_PORT = int(os.getenv('LISTEN_PORT'))
+RPC_PORT = int(os.getenv('RPC_PORT', '0'))
+UNIX_SOCKET = os.getenv('UNIX_SOCKET', '')
 
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
 app = Flask(__name__)
 
+# accept gzip request bodies, and gzip large replies (e.g., job configs)
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app)
+
+
+@app.after_request
+def compress_reply(response):
+    '''
+    Gzip the large JSON replies
+    '''
+    return gzip_response(request, response)
+
+
 # register the blueprint routes
 app.register_blueprint(job_manager, url_prefix='/job')
 
 if __name__ == '__main__':
+    # the binary RPC endpoint for the nodes, alongside the HTTP routes
+    if RPC_PORT:
+        from apps.rpc import start_rpc_server
+        start_rpc_server(RPC_PORT)
+
+    # also listen on a unix socket, for the nodes on this host
+    if UNIX_SOCKET:
+        serve_unix_socket(app, UNIX_SOCKET)
+
     app.run(port=LISTEN_PORT, debug=False, host='0.0.0.0')
     # serve(app, host="0.0.0.0", port=LISTEN_PORT, threads=100, _quiet=True)
@@ -12,3 +12,7 @@ job_state = manager.dict()
 
 # job route state
 job_route_state = dict()
+
+# job locks and template files, keyed by job_id and job_name
+job_locks = dict()
+job_template_files = dict()
@@ -0,0 +1,9 @@
+'''
+Test Setup, the logicon modules are imported from the logicon directory,
+and parse the command line of the server (not the one of pytest)
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.argv = sys.argv[:1]
@@ -0,0 +1,57 @@
+'''
+Tests of the aggregation and consensus modes set up on the creation of a job
+'''
+from logic import operations
+from state import job_route_state
+
+
+def make_manifest(cluster_config: dict) -> dict:
+    '''
+    Manifest of a single cluster job, with two clients and three workers
+    '''
+    return {
+        'templates': [],
+        'clients': {'client-0': {}, 'client-1': {}},
+        'workers': {'worker-0': {}, 'worker-1': {}, 'worker-2': {}},
+        'clusters': {
+            'cluster_0': {
+                'upstream_cluster': None,
+                'clients': ['client-0', 'client-1'],
+                'workers': ['worker-0', 'worker-1', 'worker-2'],
+                **cluster_config
+            }
+        }
+    }
+
+
+def create_job(job_name: str, cluster_config: dict) -> dict:
+    assert operations.create({'job_name': job_name, 'manifest': make_manifest(cluster_config)})[1] == 200
+
+    return job_route_state[f'{job_name}#cluster_0'].get_job_status()
+
+
+def test_digest_consensus_proposer():
+    job_status = create_job('test-digest-consensus', {
+        'consensus_params': {'runnable': {'file': 'digest_2_3.py', 'content': ''}, 'digest_samples': 64},
+        'train_params': {'rounds': 2, 'cluster_epochs': 1}})
+
+    assert job_status['digest_consensus'] == {'proposer': 'worker-0', 'samples': 64}
+
+
+def test_sharded_aggregation_shards():
+    job_status = create_job('test-sharded-aggregation', {
+        'consensus_params': {'runnable': {'file': 'digest_2_3.py', 'content': ''}},
+        'train_params': {'rounds': 2, 'cluster_epochs': 1, 'aggregation': 'sharded'}})
+
+    assert job_status['aggregation_shards'] == {
+        'worker-0': {'index': 0, 'count': 3}, 'worker-1': {'index': 1, 'count': 3}, 'worker-2': {'index': 2, 'count': 3}}
+
+    # every worker holds the full model, so the digest consensus is not used
+    assert job_status['digest_consensus'] == {}
+
+
+def test_cluster_without_train_and_consensus_params():
+    job_status = create_job('test-bare-cluster', {})
+
+    assert job_status['aggregation_shards'] == {}
+    assert job_status['digest_consensus'] == {}
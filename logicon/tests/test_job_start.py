@@ -0,0 +1,66 @@
+'''
+Tests of the start of a job, from its creation to the first round of training
+'''
+from logic import operations, handlers
+from state import job_route_state
+
+JOB_NAME = 'test-job-start'
+
+
+def make_manifest(clients: list, workers: list) -> dict:
+    '''
+    Manifest of a single cluster job
+    '''
+    return {
+        'templates': [],
+        'clients': {client_id: {} for client_id in clients},
+        'workers': {worker_id: {} for worker_id in workers},
+        'clusters': {
+            'cluster_0': {
+                'upstream_cluster': None,
+                'clients': clients,
+                'workers': workers,
+                'consensus_params': {'runnable': {'file': 'majority_2_3', 'content': ''}},
+                'train_params': {'rounds': 2, 'cluster_epochs': 1}
+            }
+        }
+    }
+
+
+def test_job_starts_training(monkeypatch):
+    retired = []
+    monkeypatch.setattr(handlers.p2p_store, 'retire_round',
+                        lambda *args: retired.append(args) or 0)
+
+    clients, workers = ['client-0', 'client-1'], ['worker-0']
+    params = {'job_name': JOB_NAME, 'cluster_id': 'cluster_0'}
+
+    assert operations.create({'job_name': JOB_NAME, 'manifest': make_manifest(clients, workers)})[1] == 200
+    assert operations.start({'job_name': JOB_NAME})[1] == 200
+
+    # job sheet download ack
+    for client_id in clients:
+        assert operations.update_client_status(
+            {**params, 'client_id': client_id, 'status': 1, 'extra_data': None})[1] == 200
+    for worker_id in workers:
+        assert operations.update_worker_status(
+            {**params, 'worker_id': worker_id, 'status': 1, 'extra_data': None})[1] == 200
+
+    # dataset download ack, along with the initial params, which starts the training
+    for client_id in clients:
+        assert operations.update_client_status(
+            {**params, 'client_id': client_id, 'status': 2, 'extra_data': None})[1] == 200
+    for worker_id in workers:
+        assert operations.update_worker_status(
+            {**params, 'worker_id': worker_id, 'status': 2, 'extra_data': {'initial_param': 'initial-key'}})[1] == 200
+
+    job = job_route_state[f'{JOB_NAME}#cluster_0']
+    job_status = job.get_job_status()
+    exec_params = job.get_exec_params()
+
+    assert job_status['process_stage'] == 1
+    assert job_status['global_round'] == 1
+    assert exec_params['global_model_param']['param'] == 'initial-key'
+
+    # the namespace of round 0 is retired, carrying the initial param over to round 1
+    assert retired == [(JOB_NAME, 'cluster_0', 0, ['initial-key'], 1)]
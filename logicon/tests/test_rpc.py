@@ -0,0 +1,65 @@
+'''
+Tests of the binary RPC server of the job operations, run in-process
+'''
+import socket
+import msgpack
+import pytest
+from apps.rpc import start_rpc_server, RECV_SIZE
+from logic.operations import list_jobs
+
+
+@pytest.fixture
+def connection():
+    server = start_rpc_server(0, '127.0.0.1')
+    sock = socket.create_connection(server.server_address)
+
+    yield sock
+
+    sock.close()
+    server.shutdown()
+    server.server_close()
+
+
+def exchange(sock: socket.socket, requests: list) -> list:
+    '''
+    Send the requests pipelined, and read a reply for each of them
+    '''
+    packer, unpacker = msgpack.Packer(use_bin_type=True), msgpack.Unpacker(raw=False)
+    sock.sendall(b''.join(packer.pack(request) for request in requests))
+
+    replies = list()
+    while len(replies) < len(requests):
+        unpacker.feed(sock.recv(RECV_SIZE))
+        replies.extend(unpacker)
+
+    return replies
+
+
+def test_pipelined_replies_carry_their_message_ids(connection):
+    replies = exchange(connection, [[7, 'get_templates', {'job_name': 'missing'}],
+                                    [3, 'list_jobs', {}],
+                                    [5, 'get_templates', {'job_name': 'other'}]])
+
+    replies = {msg_id: (code, body) for msg_id, code, body in replies}
+
+    assert replies[3] == (200, list_jobs({})[0])
+    assert replies[7][0] == 404 and 'missing' in replies[7][1]['message']
+    assert replies[5][0] == 404 and 'other' in replies[5][1]['message']
+
+
+def test_unknown_operation(connection):
+    [[msg_id, code, body]] = exchange(connection, [[1, 'drop_everything', {}]])
+
+    assert (msg_id, code, body['status']) == (1, 404, False)
+    assert 'drop_everything' in body['message']
+
+
+def test_malformed_and_failing_requests(connection):
+    # a request which is not [msg_id, operation, params], and one whose operation raises
+    replies = exchange(connection, [[1, 'list_jobs'], [2, 'get_templates', {}]])
+
+    assert replies[0][:2] == [None, 400]
+    assert replies[1][:2] == [2, 500]
+
+    # the connection is still served
+    assert exchange(connection, [[3, 'list_jobs', {}]]) == [[3, 200, list_jobs({})[0]]]
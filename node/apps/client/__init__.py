@@ -6,6 +6,7 @@ from env import env
 from helpers.argsparse import args
 from helpers.logging import logger
 from helpers import p2p_store, perflog
+from helpers.delta_chain import DeltaChain
 from apps.client import handlers
 from apps.common import getters, setters, listeners
 
@@ -59,6 +60,19 @@ def client_process(job_name: str, cluster_id: str) -> None:
     # 1. Download Job Configuration
     manifest = getters.get_job_config(job_name, cluster_id, node_type)
 
+    # per-job compression {codec, level} of the uploaded payloads
+    compression = manifest['model_params']['compression'] if 'compression' in manifest['model_params'] else None
+
+    # per-job transport precision {precision, error_feedback} of the payloads
+    transport = manifest['model_params']['transport'] if 'transport' in manifest['model_params'] else None
+
+    # per-job delta-chain broadcast {max_depth} of the global payloads
+    delta_broadcast = manifest['model_params']['delta_broadcast'] if 'delta_broadcast' in manifest['model_params'] else None
+    global_chain = None
+    if delta_broadcast is not None:
+        global_chain = DeltaChain(
+            delta_broadcast['max_depth'] if 'max_depth' in delta_broadcast else 5, compression)
+
     # 2. ACK of Job Sheet Download (Client Status to 1)
     setters.update_node_status(job_name, cluster_id, node_type, 1)
     sleep(10)
@@ -69,7 +83,7 @@ def client_process(job_name: str, cluster_id: str) -> None:
         job_name, cluster_id, node_type, manifest)
 
     # obtain initial global state of the model
-    initial_global_state = strategy.get_base64_global_payload()
+    initial_global_state = strategy.get_bytes_global_payload()
 
     # 3. Wait for DatasetDownload Flag
     listeners.wait_for_dataset_flag(job_name, cluster_id, node_type)
@@ -92,7 +106,8 @@ def client_process(job_name: str, cluster_id: str) -> None:
 
     # 5. ACK of Dataset Download (Client Status to 2) & Send Back Initial Model (Global) Parameters
     # 5.1 Upload Initial Model (Global) Parameters to P2P Store
-    init_global_state_key = p2p_store.setv(initial_global_state)
+    init_global_state_key = p2p_store.setv(
+        initial_global_state, (job_name, cluster_id, 0), compression)
     # 5.2 ACK of Dataset Download (Client Status to 2)
     setters.update_node_status(
         job_name, cluster_id, node_type, 2)
@@ -110,7 +125,7 @@ def client_process(job_name: str, cluster_id: str) -> None:
 
         # 7. Donwload Global Parameter
         global_state = handlers.get_global_state(
-            job_name, cluster_id, node_type)
+            job_name, cluster_id, node_type, strategy, global_chain)
         strategy.load_base64_state(global_state)
 
         # 7.1. Apply Parameter Mixing
@@ -148,11 +163,17 @@ def client_process(job_name: str, cluster_id: str) -> None:
                            global_round, cluster_epoch, metrics, time_delta)
 
         # 10. Upload Trained Model Parameter
-        trained_local_state = strategy.get_base64_local_payload()
-        trained_state_key = p2p_store.setv(trained_local_state)
+        trained_local_state = strategy.get_bytes_local_payload()
+        trained_state_key = p2p_store.setv(
+            trained_local_state, (job_name, cluster_id, global_round), compression)
         setters.append_node_params(
             job_name, cluster_id, node_type, trained_state_key)
 
+        # 10.1. Add the Bytes Saved by the Transport Precision to PerfLog
+        if transport is not None:
+            perflog.add_transport_record(job_name, cluster_id, node_id, node_type,
+                                         global_round, strategy.get_transport_stats())
+
         # 11. Update Client Status to 4
         setters.update_node_status(job_name, cluster_id, node_type, 4)
         sleep(10)
@@ -181,4 +202,5 @@ def client_process(job_name: str, cluster_id: str) -> None:
             logger.info(
                 f"[{node_type}] Job [{job_name}] terminated. Exiting Process.")
             setters.update_node_status(job_name, cluster_id, node_type, 5)
+            p2p_store.release_shared(job_name)
             break
@@ -4,6 +4,7 @@ Logic Handlers
 import dill
 import base64
 import traceback
+from typing import Union
 import numpy
 from env import env
 from base.learn_strategy import LearnStrategyBase
@@ -11,6 +12,7 @@ from helpers.argsparse import args
 from helpers.logging import logger
 from helpers.file import check_OK_file, get_OK_file, create_dir_struct
 from helpers import p2p_store
+from helpers.delta_chain import DeltaChain
 from helpers.torch import get_device
 from helpers.converters import tensor_to_data_loader
 from apps.client import training
@@ -32,7 +34,8 @@ def init_strategy(job_name: str, cluster_id: str, node_type: str, manifest: dict
             'test_batch_size': manifest['train_params']['batch_size'],
             'learning_rate': manifest['train_params']['learning_rate'],
             'train_epochs': manifest['train_params']['local_epochs'],
-            'client_extra_params': manifest['train_params']['extra_params']
+            'client_extra_params': manifest['train_params']['extra_params'],
+            'transport_params': manifest['model_params']['transport'] if 'transport' in manifest['model_params'] else None
         }
 
         dataset_params = manifest['dataset_params']['distribution']
@@ -135,15 +138,21 @@ def create_data_loaders(train_set, test_set, manifest: dict):
     return train_loader, test_loader
 
 
-def get_global_state(job_name: str, cluster_id: str, node_type: str) -> str:
+def get_global_state(job_name: str, cluster_id: str, node_type: str,
+                     strategy: LearnStrategyBase, global_chain: DeltaChain = None) -> Union[bytes, dict]:
     '''
-    Download and load the global state as LearningStrategy state
+    Download and load the global state as LearningStrategy state (decoded, or raw bytes),
+    with a delta chain only the delta against the previous global state is downloaded
     '''
 
-    param_key, _ = getters.get_global_param(
+    param_key, extra_data = getters.get_global_param(
         job_name, cluster_id, node_type)
 
-    global_state = p2p_store.getv(param_key)
+    if global_chain is not None:
+        return global_chain.fetch(param_key, extra_data)
+
+    # a global state already decoded by this node is a cache hit
+    global_state = p2p_store.getv_decoded(param_key, strategy.decode_payload)
 
     return global_state
 
@@ -2,15 +2,15 @@
 Getters for Job
 '''
 import traceback
-from typing import Tuple
+from typing import Tuple, Union
 from env import env
 from helpers.argsparse import args
+from helpers import rpc
 from helpers.http import get, download_file
 from helpers.file import set_OK_file
 from helpers.logging import logger
 from apps.common.setters import _fail_exit
 
-logicon_url = env['LOGICON_URL']
 datadist_url = env['DATADIST_URL']
 DELAY = env['DELAY']
 node_id = args['node_id']
@@ -66,11 +66,11 @@ def get_job_config(job_name: str, cluster_id: str, node_type: str) -> dict:
     node_type: str = [client, worker]
     '''
 
-    url = f'{logicon_url}/job/get_config'
+    operation = 'get_config'
 
     try:
-        manifest = get(
-            url, {'job_name': job_name, 'cluster_id': cluster_id, 'config_type': node_type})['payload']
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id, 'config_type': node_type})['payload']
         node_config = manifest[node_id]
 
         logger.info(
@@ -91,11 +91,11 @@ def get_global_param(job_name: str, cluster_id: str, node_type: str) -> Tuple[st
         param_key, extra_data_key
     '''
 
-    url = f'{logicon_url}/job/get_exec_params'
+    operation = 'get_exec_params'
 
     try:
-        manifest = get(
-            url, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
 
         param_key = manifest['global_model_param']['param']
         extra_data_key = manifest['global_model_param']['extra_data']
@@ -110,6 +110,66 @@ def get_global_param(job_name: str, cluster_id: str, node_type: str) -> Tuple[st
         _fail_exit(job_name, cluster_id, node_type)
 
 
+def get_aggregation_shard(job_name: str, cluster_id: str, node_type: str) -> Union[dict, None]:
+    '''
+    Get the slice {index, count} of the parameters this worker aggregates,
+    None if the job is not in the sharded aggregation mode
+    '''
+
+    operation = 'get_job_status'
+
+    try:
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
+
+        shards = manifest['aggregation_shards'] if 'aggregation_shards' in manifest else dict()
+
+        return shards[node_id] if node_id in shards else None
+    except Exception:
+        logger.error(
+            f'[{node_type}] Failed to get the aggregation shard for [{job_name}] at [{cluster_id}].\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+
+def get_digest_consensus(job_name: str, cluster_id: str, node_type: str) -> Union[dict, None]:
+    '''
+    Get the {proposer, samples} of the digest consensus,
+    None if the job is not in the digest consensus mode
+    '''
+
+    operation = 'get_job_status'
+
+    try:
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
+
+        digest_consensus = manifest['digest_consensus'] if 'digest_consensus' in manifest else dict()
+
+        return digest_consensus if len(digest_consensus) > 0 else None
+    except Exception:
+        logger.error(
+            f'[{node_type}] Failed to get the digest consensus for [{job_name}] at [{cluster_id}].\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+
+def get_proposed_param(job_name: str, cluster_id: str, node_type: str, proposer: str) -> str:
+    '''
+    Get the key of the aggregated model param submitted by the proposer (digest consensus)
+    '''
+
+    operation = 'get_exec_params'
+
+    try:
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
+
+        return manifest['worker_aggregated_params'][proposer]['param']
+    except Exception:
+        logger.error(
+            f'[{node_type}] Failed to get the proposed param for [{job_name}] at [{cluster_id}].\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+
 def get_client_params(job_name: str, cluster_id: str, node_type: str) -> dict:
     '''
     Get Client Params for a given job at a given cluster
@@ -118,11 +178,11 @@ def get_client_params(job_name: str, cluster_id: str, node_type: str) -> dict:
         param_key, extra_data_key
     '''
 
-    url = f'{logicon_url}/job/get_exec_params'
+    operation = 'get_exec_params'
 
     try:
-        manifest = get(
-            url, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
+        manifest = rpc.call(
+            operation, {'job_name': job_name, 'cluster_id': cluster_id})['payload']
 
         client_params = manifest['client_trained_params']
 
@@ -6,11 +6,10 @@ from time import sleep
 from typing import Tuple
 from env import env
 from helpers.argsparse import args
-from helpers.http import get
+from helpers import rpc
 from helpers.logging import logger
 from apps.common.setters import _fail_exit
 
-logicon_url = env['LOGICON_URL']
 DELAY = env['DELAY']
 node_id = args['node_id']
 
@@ -21,14 +20,14 @@ def wait_for_jobsheet_flag(job_name: str, cluster_id: str, node_type: str):
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                           'cluster_id': cluster_id}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                      'cluster_id': cluster_id}, timeout=15)['payload']
 
             jobsheet_flag = manifest['download_jobsheet']
             abort_flag = manifest['abort']
@@ -61,14 +60,14 @@ def wait_for_dataset_flag(job_name: str, cluster_id: str, node_type: str):
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                           'cluster_id': cluster_id}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                      'cluster_id': cluster_id}, timeout=15)['payload']
 
             dataset_flag = manifest['download_dataset']
             abort_flag = manifest['abort']
@@ -101,14 +100,14 @@ def wait_for_start_end_training(job_name: str, cluster_id: str, node_type: str)
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                                 'cluster_id': cluster_id}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                            'cluster_id': cluster_id}, timeout=15)['payload']
 
             process_stage = manifest['process_stage']
             abort_flag = manifest['abort']
@@ -143,14 +142,14 @@ def wait_for_aggregation_phase(job_name: str, cluster_id: str, node_type: str) -
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                                 'cluster_id': cluster_id}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                            'cluster_id': cluster_id}, timeout=15)['payload']
 
             process_stage = manifest['process_stage']
             abort_flag = manifest['abort']
@@ -183,16 +182,16 @@ def wait_for_scheduled_execution(job_name: str, cluster_id: str, node_type: str)
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                                 'cluster_id': cluster_id,
-                                 'node_id': node_id,
-                                 'node_type': node_type}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                            'cluster_id': cluster_id,
+                                            'node_id': node_id,
+                                            'node_type': node_type}, timeout=15)['payload']
 
             start_scheduled_execution = manifest['start_scheduled_execution']
             abort_flag = manifest['abort']
@@ -225,14 +224,14 @@ def wait_for_node_stage(job_name: str, cluster_id: str, node_type: str, stage: i
     '''
     prev_flag = -1
     # listen to check if dataset flag is true or false
-    url = f'{logicon_url}/job/get_job_status'
+    operation = 'get_job_status'
 
     try_count = 0
     while True:
         try:
 
-            manifest = get(url, {'job_name': job_name,
-                           'cluster_id': cluster_id}, timeout=15)['payload']
+            manifest = rpc.call(operation, {'job_name': job_name,
+                                      'cluster_id': cluster_id}, timeout=15)['payload']
 
             node_stage = manifest[f'{node_type}_stage']
             abort_flag = manifest['abort']
@@ -259,6 +258,45 @@ def wait_for_node_stage(job_name: str, cluster_id: str, node_type: str, stage: i
         sleep(DELAY*5)
 
 
+def wait_for_worker_shards(job_name: str, cluster_id: str, node_type: str, count: int) -> dict:
+    '''
+    Method to wait for the aggregated slices of all the workers (sharded mode),
+    returns their keys by worker_id
+    '''
+    prev_flag = -1
+
+    try_count = 0
+    while True:
+        try:
+            # the abort flag and the slices, in a single round trip
+            job_status, exec_params = [reply['payload'] for reply in rpc.call_many(
+                [('get_job_status', {'job_name': job_name, 'cluster_id': cluster_id}),
+                 ('get_exec_params', {'job_name': job_name, 'cluster_id': cluster_id})], timeout=15)]
+
+            listen_abort(job_name, cluster_id, node_type, job_status['abort'])
+
+            shard_params = exec_params['worker_shard_params']
+
+            if prev_flag != len(shard_params):
+                logger.info(
+                    f"[{node_type}] Got [{len(shard_params)}] aggregated slices, expecting [{count}] for [{job_name}] at cluster {cluster_id}")
+                prev_flag = len(shard_params)
+
+            # if all the slices are in, break and exit
+            if len(shard_params) == count:
+                return shard_params
+
+        except Exception:
+            logger.error(
+                f'[{node_type}] Failed to fetch the aggregated slices. Aborting.\n{traceback.format_exc()}')
+            try_count += 1
+
+        if try_count >= 10:
+            _fail_exit(job_name, cluster_id, node_type)
+
+        sleep(DELAY)
+
+
 def listen_abort(job_name: str, cluster_id: str, node_type: str, abort_flag: bool):
     '''
     Exit job process if abort signal is received
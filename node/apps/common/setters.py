@@ -5,10 +5,9 @@ from time import sleep
 import traceback
 from env import env
 from helpers.argsparse import args
-from helpers.http import post
+from helpers import rpc
 from helpers.logging import logger
 
-logicon_url = env['LOGICON_URL']
 DELAY = env['DELAY']
 node_id = args['node_id']
 
@@ -19,16 +18,16 @@ def update_node_status(job_name: str, cluster_id: str, node_type: str, status: i
     node_type: str = [client, worker]
     '''
     if node_type == 'client':
-        url = f'{logicon_url}/job/update_client_status'
+        operation = 'update_client_status'
     elif node_type == 'worker':
-        url = f'{logicon_url}/job/update_worker_status'
+        operation = 'update_worker_status'
     else:
         _fail_exit(job_name, cluster_id, node_type)
 
     while True:
         try:
-            res = post(url, {'job_name': job_name, 'cluster_id': cluster_id, f'{node_type}_id': node_id,
-                             'status': status, 'extra_data': extra_data})
+            res = rpc.call(operation, {'job_name': job_name, 'cluster_id': cluster_id, f'{node_type}_id': node_id,
+                                       'status': status, 'extra_data': extra_data})
 
             if not res['status']:
                 logger.error(
@@ -55,15 +54,15 @@ def append_node_params(job_name: str, cluster_id: str, node_type: str, param: in
     node_type: str = [client, worker]
     '''
     if node_type == 'client':
-        url = f'{logicon_url}/job/append_client_params'
+        operation = 'append_client_params'
     elif node_type == 'worker':
-        url = f'{logicon_url}/job/append_worker_params'
+        operation = 'append_worker_params'
     else:
         _fail_exit(job_name, cluster_id, node_type)
 
     try:
-        res = post(url, {'job_name': job_name, 'cluster_id': cluster_id, f'{node_type}_id': node_id,
-                         'param': param, 'extra_data': extra_data})
+        res = rpc.call(operation, {'job_name': job_name, 'cluster_id': cluster_id, f'{node_type}_id': node_id,
+                                   'param': param, 'extra_data': extra_data})
 
         logger.info(
             f'[{node_type}] {res["message"]} job [{job_name}] cluster [{cluster_id}] node [{node_id}]')
@@ -73,6 +72,27 @@ def append_node_params(job_name: str, cluster_id: str, node_type: str, param: in
         _fail_exit(job_name, cluster_id, node_type)
 
 
+def append_worker_shard(job_name: str, cluster_id: str, node_type: str, param: str) -> None:
+    '''
+    Upload the Aggregated Slice of this worker for a given job at a given cluster (sharded mode)
+    '''
+    operation = 'append_worker_shard'
+
+    try:
+        res = rpc.call(operation, {'job_name': job_name, 'cluster_id': cluster_id,
+                                   'worker_id': node_id, 'param': param})
+
+        if not res['status']:
+            raise AssertionError(res['message'])
+
+        logger.info(
+            f'[{node_type}] {res["message"]} job [{job_name}] cluster [{cluster_id}] node [{node_id}]')
+    except Exception:
+        logger.error(
+            f'[{node_type}] Failed to upload {node_type} aggregated slice.\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+
 def _fail_exit(job_name: str, cluster_id: str, node_type: str):
     '''
     If Getter Method fails, terminate the client/worker process
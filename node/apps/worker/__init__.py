@@ -6,6 +6,7 @@ from env import env
 from helpers.argsparse import args
 from helpers.logging import logger
 from helpers import p2p_store, perflog
+from helpers.delta_chain import DeltaChain
 from apps.worker import handlers
 from apps.common import getters, setters, listeners
 
@@ -17,6 +18,8 @@ def worker_process(job_name: str, cluster_id: str) -> None:
     1. Download Job Configuration
     2. ACK of Job Sheet Download (Worker Status to 1)
         1. Initialize the Model and Obtain Intial Parameters
+        2. Get the Slice of the Parameters to Aggregate (sharded mode)
+        3. Get the Role of the Worker in the Digest Consensus (digest consensus mode)
     3. Wait for DatasetDownload Flag
     4. Download the Dataset
         0. Download Dataset Metadata
@@ -29,10 +32,12 @@ def worker_process(job_name: str, cluster_id: str) -> None:
     7. Donwload All Trained Client Parameter(s) 
         1. Apply Parameter Mixing
     8. Update Worker Status to 3
+        1. Get the Sample of the Proposed Model to Verify (digest verifier)
     9. Start Aggregation Process
+        0. Exchange the Aggregated Slices and Stitch the Global Model (sharded mode)
         1. Test Aggregated Model
         2. Add Test Performance Metrics to PerfLog
-    10. Upload Aggregated Model Parameter
+    10. Upload Aggregated Model Parameter (or the Digest of the Sample, for a digest verifier)
     11. Update Worker Status to 4
     12. Wait for worker_stage to be 4 and update to 2
     13. Wait for process_stage to be 1 or 3
@@ -61,16 +66,55 @@ def worker_process(job_name: str, cluster_id: str) -> None:
     # 1. Download Job Configuration
     manifest = getters.get_job_config(job_name, cluster_id, node_type)
 
+    # per-job compression {codec, level} of the uploaded payloads
+    compression = manifest['model_params']['compression'] if 'compression' in manifest['model_params'] else None
+
+    # per-job transport precision {precision, error_feedback} of the payloads
+    transport = manifest['model_params']['transport'] if 'transport' in manifest['model_params'] else None
+
+    # per-job deterministic aggregation, every worker gets the same bits (and key) for the same clients
+    deterministic = manifest['aggregator_params']['deterministic'] if 'deterministic' in manifest['aggregator_params'] else False
+
+    # in the digest consensus mode, the workers aggregate in the deterministic mode too,
+    # so the sampled coordinates of the verifiers are the same bits as the ones of the proposer
+    digest_consensus = getters.get_digest_consensus(
+        job_name, cluster_id, node_type)
+    deterministic = deterministic or digest_consensus is not None
+
+    # per-job delta-chain broadcast {max_depth} of the global payloads
+    delta_broadcast = manifest['model_params']['delta_broadcast'] if 'delta_broadcast' in manifest['model_params'] else None
+    global_chain = None
+    if delta_broadcast is not None:
+        global_chain = DeltaChain(
+            delta_broadcast['max_depth'] if 'max_depth' in delta_broadcast else 5, compression)
+
     # 2. ACK of Job Sheet Download (Client Status to 1)
     setters.update_node_status(job_name, cluster_id, node_type, 1)
     listeners.wait_for_node_stage(job_name, cluster_id, node_type, 1)
 
     # 2.1 Initialize the Model and Obtain Intial Parameters
     strategy = handlers.init_strategy(
-        job_name, cluster_id, node_type, manifest)
+        job_name, cluster_id, node_type, manifest, deterministic)
 
     # obtain initial global state of the model
-    initial_global_state = strategy.get_base64_global_payload()
+    initial_global_state = strategy.get_bytes_global_payload()
+
+    # 2.2 Get the Slice of the Parameters to Aggregate (in the sharded aggregation mode)
+    shard = getters.get_aggregation_shard(job_name, cluster_id, node_type)
+    if shard is not None and not strategy.supports_sharding:
+        logger.warning(
+            f'[{node_type}] Strategy does not support sharded aggregation, aggregating all the parameters.')
+        shard = None
+
+    # 2.3 Get the Role of this Worker in the Digest Consensus (in the digest consensus mode)
+    is_proposer, is_verifier = False, False
+    if digest_consensus is not None:
+        if strategy.supports_digest:
+            is_proposer = digest_consensus['proposer'] == node_id
+            is_verifier = not is_proposer
+        else:
+            logger.warning(
+                f'[{node_type}] Strategy does not support digests, submitting the full model for the consensus.')
 
     # 3. Wait for DatasetDownload Flag
     listeners.wait_for_dataset_flag(job_name, cluster_id, node_type)
@@ -93,7 +137,8 @@ def worker_process(job_name: str, cluster_id: str) -> None:
 
     # 5. ACK of Dataset Download (Client Status to 2) & Send Back Initial Model (Global) Parameters
     # 5.1 Upload Initial Model (Global) Parameters to P2P Store
-    init_global_state_key = p2p_store.setv(initial_global_state)
+    init_global_state_key = p2p_store.setv(
+        initial_global_state, (job_name, cluster_id, 0), compression)
     # 5.2 ACK of Dataset Download (Client Status to 2)
     setters.update_node_status(
         job_name, cluster_id, node_type, 2, {'initial_param': init_global_state_key})
@@ -107,7 +152,7 @@ def worker_process(job_name: str, cluster_id: str) -> None:
         # 6. Wait for process_stage to be 2
         listeners.wait_for_aggregation_phase(job_name, cluster_id, node_type)
 
-        # 7. Donwload All Trained Client Parameter(s)
+        # 7. Get the Keys of All Trained Client Parameter(s), streamed into the aggregation at 9.
         client_params = handlers.get_client_params(
             job_name, cluster_id, node_type)
 
@@ -116,32 +161,71 @@ def worker_process(job_name: str, cluster_id: str) -> None:
         listeners.wait_for_node_stage(job_name, cluster_id, node_type, 3)
         listeners.wait_for_scheduled_execution(job_name, cluster_id, node_type)
 
-        # 9. Start Aggregation Process
-        handlers.run_aggregator(job_name, cluster_id, node_type,
-                                strategy, client_params)
-
-        # 9.1. Test Aggregated Model
-        metrics = handlers.test_model(job_name, cluster_id, node_type,
-                                      strategy)
-
-        # calculate round time
-        end_time = time()
-        time_delta = (end_time - start_time)
-        logger.info(f'[{node_type}] Total Round Time: {time_delta} s')
+        # 8.1. Get the Sample of the Proposed Model to Verify (digest verifier)
+        sample = None
+        if is_verifier:
+            proposed_param = getters.get_proposed_param(
+                job_name, cluster_id, node_type, digest_consensus['proposer'])
+            sample = handlers.get_digest_sample(
+                proposed_param, digest_consensus['samples'])
 
-        # 9.2. Add Test Performance Metrics to PerfLog
-        perflog.add_record(job_name, cluster_id, node_id, node_type,
-                           global_round, cluster_epoch, metrics, time_delta)
-
-        # SLEEP FOR A WHILE FOR THE CLIENTS TO GET THEIR SIGNALLING UPDATED
-        logger.info('Sleeping for 60 seconds.')
-        sleep(30)
-
-        # 10. Upload Aggregated Model Parameter
-        aggregated_global_state = strategy.get_base64_global_payload()
-        agg_global_state_key = p2p_store.setv(aggregated_global_state)
-        setters.append_node_params(
-            job_name, cluster_id, node_type, agg_global_state_key)
+        # 9. Start Aggregation Process, folding in the client params as they are downloaded
+        handlers.run_aggregator(job_name, cluster_id, node_type,
+                                strategy, client_params, shard, sample, deterministic)
+
+        if is_verifier:
+            # 10. Submit the Digest of the Sampled Coordinates, in place of the Aggregated Model
+            setters.append_node_params(
+                job_name, cluster_id, node_type, None, {'digest': strategy.get_digest(sample)})
+        else:
+            # 9.0. Exchange the Aggregated Slices of the Workers and Stitch the Global Model
+            if shard is not None:
+                handlers.stitch_shards(job_name, cluster_id, node_type, strategy,
+                                       shard, (job_name, cluster_id, global_round), compression)
+
+            # 9.1. Test Aggregated Model
+            metrics = handlers.test_model(job_name, cluster_id, node_type,
+                                          strategy)
+
+            # calculate round time
+            end_time = time()
+            time_delta = (end_time - start_time)
+            logger.info(f'[{node_type}] Total Round Time: {time_delta} s')
+
+            # 9.2. Add Test Performance Metrics to PerfLog
+            perflog.add_record(job_name, cluster_id, node_id, node_type,
+                               global_round, cluster_epoch, metrics, time_delta)
+
+            # SLEEP FOR A WHILE FOR THE CLIENTS TO GET THEIR SIGNALLING UPDATED
+            logger.info('Sleeping for 60 seconds.')
+            sleep(30)
+
+            # 10. Upload Aggregated Model Parameter
+            #     (not as a shared memory descriptor, whose key depends on the host,
+            #      so the workers agreeing on the model also agree on its key in the consensus)
+            aggregated_global_state = strategy.get_bytes_global_payload()
+            agg_global_state_key = p2p_store.setv(
+                aggregated_global_state, (job_name, cluster_id, global_round), compression, shared=False)
+
+            # 10.1. Publish the Delta against the Previous Global Payload
+            delta_extra_data = None
+            if global_chain is not None:
+                delta_extra_data = global_chain.publish(
+                    aggregated_global_state, agg_global_state_key, (job_name, cluster_id, global_round))
+
+            # 10.2. Add the Digest of the Proposed Model (digest proposer)
+            if is_proposer:
+                delta_extra_data = dict(delta_extra_data) if delta_extra_data is not None else dict()
+                delta_extra_data['digest'] = strategy.get_digest(handlers.get_digest_sample(
+                    agg_global_state_key, digest_consensus['samples']))
+
+            setters.append_node_params(
+                job_name, cluster_id, node_type, agg_global_state_key, delta_extra_data)
+
+            # 10.3. Add the Bytes Saved by the Transport Precision to PerfLog
+            if transport is not None:
+                perflog.add_transport_record(job_name, cluster_id, node_id, node_type,
+                                             global_round, strategy.get_transport_stats())
 
         # 11. Update Worker Status to 4
         setters.update_node_status(job_name, cluster_id, node_type, 4)
@@ -175,4 +259,5 @@ def worker_process(job_name: str, cluster_id: str) -> None:
                 f"[{node_type}] Job [{job_name}] terminated. Exiting Process.")
             setters.update_node_status(job_name, cluster_id, node_type, 5)
             perflog.terminate(job_name)
+            p2p_store.release_shared(job_name)
             break
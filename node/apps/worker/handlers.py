@@ -4,6 +4,7 @@ Logic Handlers
 import dill
 import base64
 import traceback
+from hashlib import md5
 import numpy
 from env import env
 from base.learn_strategy import LearnStrategyBase
@@ -14,7 +15,7 @@ from helpers import p2p_store
 from helpers.torch import get_device
 from helpers.converters import tensor_to_data_loader
 from apps.common.setters import _fail_exit
-from apps.common import getters
+from apps.common import getters, setters, listeners
 
 datadist_url = env['DATADIST_URL']
 node_id = args['node_id']
@@ -98,15 +99,18 @@ def create_data_loaders(test_set, manifest: dict):
     return global_test_loader
 
 
-def init_strategy(job_name: str, cluster_id: str, node_type: str, manifest: dict) -> LearnStrategyBase:
+def init_strategy(job_name: str, cluster_id: str, node_type: str, manifest: dict, deterministic=False) -> LearnStrategyBase:
     '''
-    Initialize the strategy as defined in the job manifest and return the instance
+    Initialize the strategy as defined in the job manifest and return the instance,
+    aggregating in the deterministic mode if set
     '''
 
     try:
         hyperparams = {
             'test_batch_size': manifest['aggregator_params']['batch_size'],
-            'worker_extra_params': manifest['aggregator_params']['extra_params']
+            'worker_extra_params': manifest['aggregator_params']['extra_params'],
+            'transport_params': manifest['model_params']['transport'] if 'transport' in manifest['model_params'] else None,
+            'deterministic': deterministic
         }
 
         dataset_params = manifest['dataset_params']['distribution']
@@ -126,9 +130,10 @@ def init_strategy(job_name: str, cluster_id: str, node_type: str, manifest: dict
         _fail_exit(job_name, cluster_id, node_type)
 
 
-def get_client_params(job_name: str, cluster_id: str, node_type: str) -> list:
+def get_client_params(job_name: str, cluster_id: str, node_type: str) -> dict:
     '''
-    Download the trained client params, load them as state_dict(s) and return
+    Get the keys of the trained client params along with their dataset weights,
+    the params themselves are streamed into the aggregation by run_aggregator
     '''
 
     client_params = getters.get_client_params(
@@ -138,32 +143,80 @@ def get_client_params(job_name: str, cluster_id: str, node_type: str) -> list:
         job_name, cluster_id, node_type)
 
     for client_id, payload in client_params.items():
-        # fetch the params from the p2p store
-        payload['param'] = p2p_store.getv(payload['param'])
-
         # also add the client's dataset weight
         payload['weight'] = dataset_metadata['weights'][client_id]
 
     return client_params
 
 
-def run_aggregator(job_name: str, cluster_id: str, node_type: str,
-                   strategy: LearnStrategyBase, client_params: dict):
+def run_aggregator(job_name: str, cluster_id: str, node_type: str, strategy: LearnStrategyBase,
+                   client_params: dict, shard: dict = None, sample: dict = None, deterministic=False):
     '''
-    Method to execute the aggregator
+    Method to execute the aggregator, every client param is folded into the
+    aggregation as soon as it is downloaded, and freed right after.
+    With a shard, only its slice of the parameters is aggregated,
+    and with a sample, only the sampled coordinates (digest verifier).
+    In the deterministic mode, the client params are folded in the (canonical) order of the client ids.
     '''
     try:
-        for _, client_payload in client_params.items():
-            strategy.append_client_object(client_payload['param'],
-                                          client_payload['weight'])
+        client_ids = sorted(client_params.keys())
+        keys = [client_params[client_id]['param'] for client_id in client_ids]
+
+        # an empty round aggregates to zeros, as the strategies did before the streaming aggregation
+        if len(keys) == 0:
+            logger.warning(
+                f'No client params to aggregate for [{job_name}] at cluster [{cluster_id}], the aggregated params are zeros.')
+
+        strategy.begin_round(shard, sample)
 
-        strategy.aggregate()
+        for index, param in p2p_store.getv_stream(keys, ordered=deterministic):
+            strategy.fold(param, client_params[client_ids[index]]['weight'])
+            del param
+
+        strategy.finalize()
     except Exception:
         logger.error(
             f'Failed to aggregate params. Aborting Process for [{job_name}] at cluster [{cluster_id}]!\n{traceback.format_exc()}')
         _fail_exit(job_name, cluster_id, node_type)
 
 
+def stitch_shards(job_name: str, cluster_id: str, node_type: str, strategy: LearnStrategyBase,
+                  shard: dict, namespace: tuple, compression: dict = None):
+    '''
+    Upload the aggregated slice of this worker, wait for the slices of all the workers,
+    and stitch them into the global model (sharded aggregation)
+    '''
+    try:
+        partial_key = p2p_store.setv(
+            strategy.get_bytes_partial_payload(), namespace, compression)
+    except Exception:
+        logger.error(
+            f'Failed to upload the aggregated slice. Aborting Process for [{job_name}] at cluster [{cluster_id}]!\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+    setters.append_worker_shard(job_name, cluster_id, node_type, partial_key)
+
+    shard_params = listeners.wait_for_worker_shards(
+        job_name, cluster_id, node_type, shard['count'])
+
+    try:
+        strategy.load_partial_payloads(
+            p2p_store.getv_many(list(shard_params.values())))
+    except Exception:
+        logger.error(
+            f'Failed to stitch the aggregated slices. Aborting Process for [{job_name}] at cluster [{cluster_id}]!\n{traceback.format_exc()}')
+        _fail_exit(job_name, cluster_id, node_type)
+
+
+def get_digest_sample(proposed_param: str, samples: int) -> dict:
+    '''
+    Get the sample {seed, count} of the digest consensus, seeded by the key of the proposed param,
+    so the sampled coordinates are only known once the proposer has committed its model
+    '''
+
+    return {'seed': int(md5(proposed_param.encode('utf8')).hexdigest()[:15], 16), 'count': samples}
+
+
 def test_model(job_name: str, cluster_id: str, node_type: str,
                strategy: LearnStrategyBase):
     '''
@@ -8,6 +8,7 @@ env = dict()
 
 # load variables into object
 env['LOGICON_URL'] = os.getenv('LOGICON_URL')
+env['LOGICON_RPC_URL'] = os.getenv('LOGICON_RPC_URL', '')
 env['P2PSTORE_URL'] = os.getenv('P2PSTORE_URL')
 env['PERFLOG_URL'] = os.getenv('PERFLOG_URL')
 env['DATADIST_URL'] = os.getenv('DATADIST_URL')
@@ -16,3 +17,12 @@ env['USE_CUDA'] = int(os.getenv('USE_CUDA'))
 env['CLIENT_USE_CUDA'] = int(os.getenv('CLIENT_USE_CUDA'))
 env['WORKER_USE_CUDA'] = int(os.getenv('WORKER_USE_CUDA'))
 env['DISCOVERY_INTERVAL'] = int(os.getenv('DISCOVERY_INTERVAL'))
+env['P2P_CHUNK_SIZE'] = int(os.getenv('P2P_CHUNK_SIZE', str(8 * 1024 * 1024)))
+env['P2P_PARALLEL_DOWNLOADS'] = int(os.getenv('P2P_PARALLEL_DOWNLOADS', '4'))
+env['P2P_STREAM_WINDOW'] = int(os.getenv('P2P_STREAM_WINDOW', '2'))
+env['P2P_SHM'] = os.getenv('P2P_SHM', 'off')
+env['P2P_CACHE_SIZE'] = int(os.getenv('P2P_CACHE_SIZE', str(512 * 1024 * 1024)))
+env['HTTP_POOL_SIZE'] = int(os.getenv('HTTP_POOL_SIZE', '16'))
+env['HTTP_MAX_RETRIES'] = int(os.getenv('HTTP_MAX_RETRIES', '6'))
+env['HTTP_BACKOFF_BASE'] = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+env['HTTP_BACKOFF_MAX'] = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
@@ -0,0 +1,108 @@
+'''
+Compression Codecs for KVStore Values
+
+A compressed value is prefixed with a header recording its codec,
+so that any reader can decode it, whichever codec the writer chose.
+Values without the header are passed through as they are.
+'''
+import zlib
+import struct
+from typing import Union
+from helpers.logging import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# object header: magic, codec id, compression level, uncompressed length
+HEADER_FORMAT = '!4sBbQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_MAGIC = b'FLZ1'
+
+CODEC_IDS = {'none': 0, 'zlib': 1, 'zstd': 2, 'lz4': 3}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+DEFAULT_LEVELS = {'none': 0, 'zlib': 6, 'zstd': 3, 'lz4': 0}
+
+# codecs already warned about as not installed
+_missing_codecs = set()
+
+
+def available(codec: str) -> bool:
+    '''
+    Check if the library of a codec is installed
+    '''
+    if codec == 'zstd':
+        return zstandard is not None
+    if codec == 'lz4':
+        return lz4_frame is not None
+
+    return codec in CODEC_IDS
+
+
+def compress(value: bytes, codec='none', level: Union[int, None] = None) -> bytes:
+    '''
+    Compress a value with a codec, and prefix the header.
+    Falls back to zlib if the codec's library is not installed.
+    '''
+    if codec is None or codec == 'none':
+        return value
+
+    if codec not in CODEC_IDS:
+        raise ValueError(f'Unknown compression codec [{codec}]')
+
+    if not available(codec):
+        if codec not in _missing_codecs:
+            _missing_codecs.add(codec)
+            logger.warning(
+                f'Compression codec [{codec}] is not installed, falling back to zlib.')
+        codec, level = 'zlib', None
+
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+
+    if codec == 'zlib':
+        compressed = zlib.compress(value, level)
+    elif codec == 'zstd':
+        compressed = zstandard.ZstdCompressor(level=level).compress(value)
+    else:
+        compressed = lz4_frame.compress(value, compression_level=level)
+
+    header = struct.pack(HEADER_FORMAT, HEADER_MAGIC,
+                         CODEC_IDS[codec], level, len(value))
+
+    return header + compressed
+
+
+def decompress(value: Union[bytes, bytearray, None]) -> Union[bytes, bytearray, None]:
+    '''
+    Decompress a value according to its header,
+    values without the header are returned as they are
+    '''
+    if value is None or len(value) < HEADER_SIZE or bytes(value[:4]) != HEADER_MAGIC:
+        return value
+
+    _, codec_id, _, length = struct.unpack(
+        HEADER_FORMAT, bytes(value[:HEADER_SIZE]))
+
+    codec = CODEC_NAMES.get(codec_id)
+    if codec is None or not available(codec):
+        raise ValueError(
+            f'Cannot decompress value, codec [{codec or codec_id}] is not installed')
+
+    body = memoryview(value)[HEADER_SIZE:]
+
+    if codec == 'zlib':
+        return zlib.decompress(body)
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=length)
+    if codec == 'lz4':
+        return lz4_frame.decompress(body)
+
+    return bytes(body)
@@ -0,0 +1,177 @@
+'''
+Delta-chain Broadcast of the Global Payloads
+
+Every round the worker publishes the full global payload, and (if it holds the previous
+round's payload) a compressed XOR delta against it, along with a manifest linking the round
+to its base. The delta bytes are split into 4 byte planes before compression, so the mostly
+unchanged sign and exponent bytes of the float32 tensors end up in long zero runs. A client holding the base fetches and applies only the delta, walking back
+at most max_depth manifests, otherwise it falls back to the full payload.
+'''
+import json
+from hashlib import md5
+from typing import Tuple, Union
+import numpy
+from helpers import p2p_store
+from helpers.logging import logger
+
+
+class DeltaChain(object):
+    '''
+    Delta Chain Class, keeps the last global payload (the base of the next delta),
+    its key, and the depth of the chain since the last full snapshot
+    '''
+
+    def __init__(self, max_depth: int, compression: Union[dict, None] = None):
+        self.max_depth = max_depth
+        self.compression = compression
+
+        self.base = None
+        self.base_key = None
+        self.depth = 0
+        self.manifest_key = None
+
+    def publish(self, payload: bytes, payload_key: str, namespace: Tuple[str, str, int]) -> dict:
+        '''
+        Publish the delta of a new (already uploaded) global payload against the last one,
+        returns the extra_data {delta_manifest, delta} to be sent along the payload key.
+        After max_depth chained deltas, a full snapshot (manifest without delta) is published.
+        '''
+        delta_key = None
+
+        if self.base is not None and len(self.base) == len(payload) and self.depth < self.max_depth:
+            delta_key = p2p_store.setv(
+                shuffle_planes(xor_bytes(self.base, payload)), namespace, self.__delta_compression())
+            self.depth += 1
+        else:
+            self.depth = 0
+
+        manifest = {
+            'round': namespace[2],
+            'full': payload_key,
+            'md5': md5(payload).hexdigest(),
+            'base': self.base_key if delta_key is not None else None,
+            'delta': delta_key,
+            'depth': self.depth,
+            'prev': self.manifest_key if delta_key is not None else None
+        }
+
+        self.manifest_key = p2p_store.setv(
+            json.dumps(manifest).encode('utf8'), namespace)
+        self.base, self.base_key = bytes(payload), payload_key
+
+        return {'delta_manifest': self.manifest_key, 'delta': delta_key}
+
+    def fetch(self, payload_key: str, extra_data: Union[dict, None]) -> bytes:
+        '''
+        Get the global payload of a key, by applying the chain of deltas from the held base
+        if the manifest in the extra_data links back to it, else by downloading it in full
+        '''
+        manifest_key = extra_data['delta_manifest'] if isinstance(
+            extra_data, dict) and 'delta_manifest' in extra_data else None
+
+        if payload_key == self.base_key:
+            return self.base
+
+        payload = None
+        if manifest_key is not None and self.base is not None:
+            payload = self.__apply_chain(payload_key, manifest_key)
+
+        if payload is None:
+            payload = p2p_store.getv(payload_key)
+
+        # keep an immutable base, the strategy may train in place on a writable buffer
+        self.base = payload if memoryview(payload).readonly else bytes(payload)
+        self.base_key = payload_key
+
+        return payload
+
+    def __apply_chain(self, payload_key: str, manifest_key: str) -> Union[bytes, None]:
+        '''
+        Walk the manifests back to the held base and apply their deltas,
+        returns None if the base is not reachable within max_depth deltas
+        '''
+        deltas, target_md5 = [], None
+
+        for _ in range(self.max_depth):
+            value = p2p_store.getv(manifest_key)
+            if value is None:
+                return None
+
+            manifest = json.loads(bytes(value))
+
+            # the manifest must describe the payload selected as the global one
+            if target_md5 is None:
+                if manifest['full'] != payload_key:
+                    return None
+                target_md5 = manifest['md5']
+
+            if manifest['delta'] is None:
+                return None
+
+            deltas.append(manifest['delta'])
+
+            if manifest['base'] == self.base_key:
+                break
+
+            manifest_key = manifest['prev']
+            if manifest_key is None:
+                return None
+        else:
+            return None
+
+        payload = self.base
+        for delta_key in reversed(deltas):
+            delta = p2p_store.getv(delta_key)
+            if delta is None or len(delta) != len(payload):
+                return None
+
+            payload = xor_bytes(payload, unshuffle_planes(delta))
+
+        if md5(payload).hexdigest() != target_md5:
+            logger.warning(
+                'Global payload rebuilt from deltas does not match its digest, downloading in full.')
+            return None
+
+        logger.info(
+            f'Rebuilt global payload from {len(deltas)} delta(s) instead of a full download.')
+
+        return payload
+
+    def __delta_compression(self) -> dict:
+        '''
+        Get the compression config of the deltas, the XOR delta is mostly zeros,
+        so it is always compressed (with zlib if the job sets no codec)
+        '''
+        if self.compression is not None and 'codec' in self.compression and self.compression['codec'] != 'none':
+            return self.compression
+
+        return {'codec': 'zlib'}
+
+
+def xor_bytes(first: Union[bytes, bytearray], second: Union[bytes, bytearray]) -> bytes:
+    '''
+    XOR two byte strings of equal length
+    '''
+    return numpy.bitwise_xor(numpy.frombuffer(first, dtype=numpy.uint8),
+                             numpy.frombuffer(second, dtype=numpy.uint8)).tobytes()
+
+
+def shuffle_planes(value: bytes, width=4) -> bytes:
+    '''
+    Split a byte string into width byte planes (every width-th byte together),
+    the tail that does not fill a whole element is left as it is
+    '''
+    array = numpy.frombuffer(value, dtype=numpy.uint8)
+    body = len(array) // width * width
+
+    return array[:body].reshape(-1, width).T.tobytes() + array[body:].tobytes()
+
+
+def unshuffle_planes(value: bytes, width=4) -> bytes:
+    '''
+    Interleave the byte planes of shuffle_planes back into a byte string
+    '''
+    array = numpy.frombuffer(value, dtype=numpy.uint8)
+    body = len(array) // width * width
+
+    return array[:body].reshape(width, -1).T.tobytes() + array[body:].tobytes()
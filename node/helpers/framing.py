@@ -0,0 +1,68 @@
+'''
+Framing of Multiple Values in a Single Request or Response Body
+'''
+import struct
+from typing import Iterator, Tuple, Union
+
+# mget response frame header: raw md5 digest of the key, found flag, value length
+GET_FRAME_FORMAT = '!16sBQ'
+GET_FRAME_SIZE = struct.calcsize(GET_FRAME_FORMAT)
+
+# mput request frame header: value length
+PUT_FRAME_FORMAT = '!Q'
+PUT_FRAME_SIZE = struct.calcsize(PUT_FRAME_FORMAT)
+
+
+def pack_put_frames(values: list) -> bytes:
+    '''
+    Pack a list of values into an mput request body
+    '''
+    frames = []
+    for value in values:
+        frames.append(struct.pack(PUT_FRAME_FORMAT, len(value)))
+        frames.append(value)
+
+    return b''.join(frames)
+
+
+def iter_get_frames(stream) -> Iterator[Tuple[str, Union[bytearray, None]]]:
+    '''
+    Iterate over the (key, value) pairs of an mget response body stream,
+    the value is None if the key was not found
+    '''
+    while True:
+        header = read_exact(stream, GET_FRAME_SIZE)
+        if header is None:
+            return
+
+        digest, found, length = struct.unpack(GET_FRAME_FORMAT, header)
+
+        value = read_exact(stream, length) if found else None
+        if found and value is None:
+            raise ValueError('Truncated mget frame')
+
+        yield digest.hex(), value
+
+
+def read_exact(stream, size: int) -> Union[bytearray, None]:
+    '''
+    Read exactly size bytes from a stream into a preallocated buffer,
+    returns None at the end of the stream
+    '''
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+
+    position = 0
+    while position < size:
+        read = stream.readinto(view[position:])
+        if not read:
+            break
+        position += read
+
+    if position == 0 and size > 0:
+        return None
+
+    if position < size:
+        raise ValueError('Truncated frame')
+
+    return buffer
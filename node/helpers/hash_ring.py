@@ -0,0 +1,45 @@
+'''
+Consistent Hashing Ring, for routing keys to kvstore shards
+'''
+from bisect import bisect
+from hashlib import md5
+
+
+class HashRing:
+    '''
+    Hash Ring Class, every shard is placed on the ring at a number of
+    virtual points, and a key belongs to the shard at the first point
+    clockwise from the key's position. Adding or removing a shard only
+    moves the keys falling between its points and their predecessors.
+    '''
+
+    def __init__(self, shards: list, replicas=64):
+        self.shards = list(shards)
+
+        points = []
+        for shard in self.shards:
+            for i in range(replicas):
+                points.append((ring_position(f'{shard}#{i}'), shard))
+
+        points.sort()
+
+        self.positions = [position for position, _ in points]
+        self.owners = [shard for _, shard in points]
+
+    def get_shard(self, key: str) -> str:
+        '''
+        Get the shard owning a key
+        '''
+        if len(self.shards) == 1:
+            return self.shards[0]
+
+        index = bisect(self.positions, ring_position(key)) % len(self.positions)
+
+        return self.owners[index]
+
+
+def ring_position(value: str) -> int:
+    '''
+    Position of a string on the 64 bit ring
+    '''
+    return int(md5(value.encode()).hexdigest()[:16], 16)
@@ -1,38 +1,128 @@
 '''
-HTTP comms module, with simplified syntax to avoid code repetition
+HTTP comms module, with simplified syntax to avoid code repetition.
+All requests go through the pooled, retrying transport.
 '''
+from typing import Tuple, Union
 import requests
-from urllib.request import urlretrieve
+from helpers import transport
 
 
-def get(url: str, params={}, timeout=3600) -> dict:
+def get(url: str, params={}, timeout=3600, retries=None) -> dict:
     '''
     GET request method
     '''
-    req = requests.get(url, params, timeout=timeout)
+    req = transport.request('GET', url, params=params,
+                            timeout=timeout, retries=retries)
     data = req.json()
 
     return data
 
 
-def post(url: str, params: dict, timeout=3600) -> dict:
+def post(url: str, params: dict, timeout=3600, idempotent=False, gzip_json=False) -> dict:
     '''
-    POST request method
+    POST request method, retried after it may have reached the server only if idempotent.
+    gzip_json compresses large bodies, for the servers accepting gzip bodies.
     '''
-    req = requests.post(url, json=params, timeout=timeout)
+    req = transport.request('POST', url, json=params, timeout=timeout,
+                            idempotent=idempotent, gzip_json=gzip_json)
     data = req.json()
 
     return data
 
 
-def download_file(url: str, filename: str):
+def get_bytes(url: str, params={}, timeout=3600) -> Union[bytes, None]:
+    '''
+    GET request method for raw octet-stream replies,
+    returns None if the resource is not found
+    '''
+    req = transport.request('GET', url, params=params, timeout=timeout)
+
+    if req.status_code == 404:
+        return None
+
+    req.raise_for_status()
+
+    return req.content
+
+
+def post_bytes(url: str, data: bytes, params={}, timeout=3600, idempotent=False) -> dict:
+    '''
+    POST request method with a raw octet-stream body
+    '''
+    req = transport.request('POST', url, data=data, params=params, timeout=timeout, idempotent=idempotent,
+                            headers={'Content-Type': 'application/octet-stream'})
+    data = req.json()
+
+    return data
+
+
+def put_bytes(url: str, data: bytes, params={}, timeout=3600) -> dict:
+    '''
+    PUT request method with a raw octet-stream body
+    '''
+    req = transport.request('PUT', url, data=data, params=params, timeout=timeout,
+                            headers={'Content-Type': 'application/octet-stream'})
+    data = req.json()
+
+    return data
+
+
+def get_range(url: str, start: int, end: int, timeout=3600, retries=None) -> Union[Tuple[bytes, int], None]:
+    '''
+    GET request method for the inclusive byte range [start, end] of a raw octet-stream,
+    returns the bytes and the total size of the resource, or None if it is not found
+    '''
+    req = transport.request('GET', url, timeout=timeout, retries=retries,
+                            headers={'Range': f'bytes={start}-{end}'})
+
+    if req.status_code == 404:
+        return None
+
+    req.raise_for_status()
+
+    # the whole resource is sent if the range is not supported
+    if req.status_code != 206:
+        return req.content, len(req.content)
+
+    total = int(req.headers['Content-Range'].rsplit('/', 1)[1])
+
+    return req.content, total
+
+
+def post_stream(url: str, params: dict, timeout=3600, idempotent=False) -> requests.Response:
+    '''
+    POST request method for streamed octet-stream replies,
+    the reply body is read from the returned response's raw stream
+    '''
+    req = transport.request('POST', url, json=params, timeout=timeout,
+                            idempotent=idempotent, stream=True)
+    req.raise_for_status()
+
+    req.raw.decode_content = True
+
+    return req
+
+
+def download_file(url: str, filename: str, timeout=3600):
     '''
     Method to download a file
     '''
-    urlretrieve(url, filename, __show_progress)
+    with transport.request('GET', url, timeout=timeout, stream=True) as req:
+        req.raise_for_status()
+
+        total_size = int(req.headers.get('Content-Length', 0))
+        received = 0
+
+        with open(filename, 'wb') as file:
+            for block in req.iter_content(chunk_size=1024 * 1024):
+                file.write(block)
+                received += len(block)
+                __show_progress(received, total_size)
+
     print('\n')
 
 
-def __show_progress(block_num, block_size, total_size):
-    print(
-        f'Downloading File: {int(100*(block_num*block_size)/total_size)}%', end='\r')
+def __show_progress(received: int, total_size: int):
+    if total_size > 0:
+        print(
+            f'Downloading File: {int(100*received/total_size)}%', end='\r')
@@ -3,54 +3,512 @@ Key Value Store Module
 '''
 import json
 import traceback
-from typing import Any
+from hashlib import md5
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterator, List, Tuple, Union
 from time import sleep
 from env import env
-from helpers import http
+from helpers import http, codec, transport, shm_store
+from helpers.framing import pack_put_frames, iter_get_frames
+from helpers.hash_ring import HashRing
+from helpers.payload_cache import PayloadCache
 from helpers.logging import logger
 
 
-DELAY = env['DELAY']
-KVS_URL = env['P2PSTORE_URL']
+CHUNK_SIZE = env['P2P_CHUNK_SIZE']
+PARALLEL_DOWNLOADS = env['P2P_PARALLEL_DOWNLOADS']
+STREAM_WINDOW = env['P2P_STREAM_WINDOW']
+
+# comma separated list of kvstore shards, keys are routed to them by consistent hashing
+KVS_URLS = [url.strip() for url in env['P2PSTORE_URL'].split(',') if url.strip()]
+KVS_RING = HashRing(KVS_URLS)
+
+# raw and decoded values of the keys this node has set or got
+CACHE = PayloadCache(env['P2P_CACHE_SIZE'])
+
+# same-host shared memory hand-off of the values: 'off', 'hybrid' (the value is
+# also uploaded for the readers on other hosts) or 'local' (all the nodes are on this host)
+SHM_MODE = env['P2P_SHM'] if shm_store.available() else 'off'
 
 #########################
 # Wrapper KVStore API
 #########################
 
 
-def getv(key: str) -> Any:
+def getv(key: str) -> bytes:
     '''
-    Get Value from Key
+    Get Value (raw bytes) from Key,
+    compressed values are decompressed according to their header
     '''
     print('P2P GET:', key)
 
-    value = kv_get_legacy(key)
+    value = CACHE.get(key)
+    if value is not None:
+        return value
+
+    value = CACHE.put(key, _resolve(codec.decompress(kv_get_blob(key))))
 
     return value
 
 
-def setv(value: Any) -> str:
+def getv_decoded(key: str, decoder: Callable[[bytes], Any]) -> Any:
     '''
-    Set Value and get Key
+    Get the decoded Value of a Key, decoding it with the decoder only on a cache miss.
+    The decoded value is shared with later callers, and must not be modified in place.
     '''
-    key = kv_set_legacy(value)
+    payload = CACHE.get_decoded(key)
+    if payload is not None:
+        return payload
+
+    value = getv(key)
+    if value is None:
+        return None
+
+    payload = decoder(value)
+    CACHE.put_decoded(key, payload, len(value))
+
+    return payload
+
+
+def setv(value: bytes, namespace: Union[Tuple[str, str, int], None] = None,
+         compression: Union[dict, None] = None, shared: bool = True) -> str:
+    '''
+    Set Value (raw bytes) and get Key.
+    The optional (job_name, cluster_id, round) namespace lets the
+    kvstore garbage collect the value once the round is retired.
+    The optional compression {codec, level} config compresses the value,
+    which is then kept compressed at rest in the kvstore.
+    With the shared memory hand-off on, only a descriptor of the value is set,
+    unless shared is off (the key of a descriptor depends on the host of the node).
+    '''
+    raw_value = value
+
+    key = None
+    if SHM_MODE != 'off' and shared:
+        key = _set_shared(raw_value, namespace, compression)
+
+    if key is None:
+        key = kv_set_blob(_compress(value, compression), namespace)
+
+    # the node that set a value is likely to get it back (like the worker for the perflog)
+    if key is not None:
+        CACHE.put(key, raw_value)
 
     print('P2P SET:', key)
 
     return key
 
 
-def delete(key: str) -> Any:
+def getv_many(keys: List[str]) -> List[bytes]:
+    '''
+    Get Values (raw bytes) of many Keys in a single request,
+    returned in the order of the keys
+    '''
+    print('P2P MGET:', len(keys), 'keys')
+
+    values = [CACHE.get(key) for key in keys]
+
+    # fetch only the keys missing from the cache
+    missing = [key for key, value in zip(keys, values) if value is None]
+    if len(missing) > 0:
+        fetched = dict(zip(missing, kv_get_many_blob(missing)))
+        values = [value if value is not None else CACHE.put(key, _resolve(codec.decompress(fetched[key])))
+                  for key, value in zip(keys, values)]
+
+    return values
+
+
+def getv_stream(keys: List[str], window: int = STREAM_WINDOW,
+                ordered: bool = False) -> Iterator[Tuple[int, bytes]]:
+    '''
+    Get Values (raw bytes) of many Keys as they arrive, yielding (index, value) in the
+    order of arrival, or in the order of the keys if ordered. At most window values are
+    downloading (or downloaded and not yet consumed) at a time, and they are not cached,
+    so each value can be freed after use.
+    '''
+    print('P2P STREAM:', len(keys), 'keys')
+
+    def fetch(key: str) -> bytes:
+        value = CACHE.get(key)
+        if value is not None:
+            return value
+
+        return _resolve(codec.decompress(kv_get_blob(key)))
+
+    with ThreadPoolExecutor(max_workers=max(window, 1)) as executor:
+        pending = dict()
+        next_index = 0
+
+        while next_index < len(keys) or len(pending) > 0:
+            # keep the window full
+            while next_index < len(keys) and len(pending) < max(window, 1):
+                pending[executor.submit(fetch, keys[next_index])] = next_index
+                next_index += 1
+
+            if ordered:
+                # the oldest download is the next value in the order of the keys
+                future = min(pending, key=pending.get)
+                index = pending.pop(future)
+                yield index, future.result()
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                yield index, future.result()
+
+
+def setv_many(values: List[bytes], namespace: Union[Tuple[str, str, int], None] = None,
+              compression: Union[dict, None] = None) -> List[str]:
+    '''
+    Set many Values (raw bytes) in a single request,
+    and get their Keys in the order of the values
+    '''
+    # every value is handed off through its own segment and descriptor
+    if SHM_MODE != 'off':
+        return [setv(value, namespace, compression) for value in values]
+
+    raw_values = values
+    values = [_compress(value, compression) for value in values]
+
+    keys = kv_set_many_blob(values, namespace)
+
+    if keys is not None:
+        for key, raw_value in zip(keys, raw_values):
+            CACHE.put(key, raw_value)
+
+    print('P2P MSET:', len(values), 'values')
+
+    return keys
+
+
+def release_shared(job_name: Union[str, None] = None) -> None:
+    '''
+    Release the shared memory segments this node process holds (for a job),
+    e.g., when the job is terminated
+    '''
+    shm_store.release_all(job_name)
+
+
+def delete(key: str) -> bool:
     '''
     Delete Value with Key
     '''
     print('P2P DEL:', key)
 
-    value = kv_delete_legacy(key)
+    CACHE.discard(key)
+    status = kv_delete_blob(key)
+
+    return status
+
+
+#############################
+# HTTP-based Blob KVStore API
+#############################
+
+def kv_get_blob(key: str) -> Union[bytes, bytearray]:
+    '''
+    Get raw bytes Value from Key. Values larger than a chunk are downloaded
+    as parallel Range requests into a single preallocated buffer,
+    and a failed range is retried on its own.
+    Returns None if the key is not found, also if it is deleted (or retired) mid-download.
+    '''
+    url = f'{shard_of_key(key)}/blob/get/{key}'
+
+    first = _kv_get_range(url, 0, CHUNK_SIZE - 1)
+    if first is None:
+        return None
+
+    chunk, total = first
+    if len(chunk) >= total:
+        return chunk
+
+    value = bytearray(total)
+    value[:len(chunk)] = chunk
+
+    def fetch(start: int) -> bool:
+        end = min(start + CHUNK_SIZE, total) - 1
+        reply = _kv_get_range(url, start, end)
+        if reply is None:
+            return False
+
+        value[start:end + 1] = reply[0]
+        return True
+
+    with ThreadPoolExecutor(max_workers=PARALLEL_DOWNLOADS) as executor:
+        fetched = list(executor.map(fetch, range(len(chunk), total, CHUNK_SIZE)))
+
+    if not all(fetched):
+        logger.warning(f'Key [{key}] was removed from the KVStore mid-download.')
+        return None
 
     return value
 
 
+def _kv_get_range(url: str, start: int, end: int) -> Union[Tuple[bytes, int], None]:
+    '''
+    Get a byte range of a Value, the transport retries a failed range on its own
+    '''
+    try:
+        return http.get_range(url, start, end)
+    except Exception:
+        logger.error(
+            f'KVStore Database Connection Error! Failed to get range [{start}-{end}].\n{traceback.format_exc()}')
+        raise
+
+
+def kv_set_blob(value: bytes, namespace: Union[Tuple[str, str, int], None] = None) -> str:
+    '''
+    Set raw bytes Value with Key,
+    values larger than a chunk are uploaded in resumable chunks
+    '''
+    params = dict()
+    if namespace is not None:
+        params = {'job_name': namespace[0],
+                  'cluster_id': namespace[1], 'round': namespace[2]}
+
+    if len(value) > CHUNK_SIZE:
+        return _kv_set_blob_chunked(value, params)
+
+    # the key is the hash of the value, so a repeated put is harmless
+    try:
+        reply = http.post_bytes(
+            f'{shard_of_value(value)}/blob/put', value, params, idempotent=True)
+    except Exception:
+        logger.error(
+            f'KVStore Database Connection Error! Failed to set value.\n{traceback.format_exc()}')
+        raise
+
+    if not reply['status']:
+        return None
+
+    return reply['key']
+
+
+def _kv_set_blob_chunked(value: bytes, params: dict) -> str:
+    '''
+    Upload a Value chunk by chunk into an upload session, an interrupted
+    upload resumes from the offset received by the kvstore
+    '''
+    url = f'{shard_of_value(value)}/blob/upload'
+    view = memoryview(value)
+
+    upload_id, offset, attempt = None, 0, 0
+    while True:
+        try:
+            if upload_id is None:
+                upload_id = http.post(f'{url}?{urlencode({**params, "size": len(value)})}',
+                                      {})['upload_id']
+                offset = 0
+            elif offset is None:
+                # resume from the offset received by the kvstore
+                offset = http.get(f'{url}/{upload_id}')['offset']
+
+            while offset is not None and offset < len(value):
+                reply = http.put_bytes(f'{url}/{upload_id}',
+                                       bytes(view[offset:offset + CHUNK_SIZE]), {'offset': offset})
+
+                # the kvstore replies with its own offset if ours is out of sync
+                offset = reply['offset']
+
+            # the session is gone (e.g., expired), restart the upload
+            if offset is None:
+                upload_id = None
+                continue
+
+            reply = http.post(f'{url}/{upload_id}/commit', {})
+            break
+        except Exception:
+            if attempt >= transport.MAX_RETRIES:
+                logger.error(
+                    f'KVStore Upload Error at offset [{offset}]! Giving up.\n{traceback.format_exc()}')
+                raise
+
+            delay = transport.backoff(attempt)
+            attempt += 1
+
+            logger.error(
+                f'KVStore Upload Error at offset [{offset}]! Resuming in {delay:.2f}s.\n{traceback.format_exc()}')
+            sleep(delay)
+
+            offset = None
+
+    if not reply['status']:
+        return None
+
+    return reply['key']
+
+
+def kv_get_many_blob(keys: List[str]) -> List[bytes]:
+    '''
+    Get raw bytes Values of many Keys, with one framed request per shard
+    '''
+    shard_keys = dict()
+    for key in keys:
+        shard_keys.setdefault(shard_of_key(key), []).append(key)
+
+    found = dict()
+    with ThreadPoolExecutor(max_workers=len(shard_keys) or 1) as executor:
+        for values in executor.map(lambda item: _kv_get_shard_blobs(*item), shard_keys.items()):
+            found.update(values)
+
+    return [found.get(key) for key in keys]
+
+
+def _kv_get_shard_blobs(shard_url: str, keys: List[str]) -> dict:
+    '''
+    Get raw bytes Values of many Keys from one framed response of a shard
+    '''
+    attempt = 0
+    while True:
+        try:
+            # a read only request, safe to retry
+            reply = http.post_stream(
+                f'{shard_url}/mget', {'keys': keys}, idempotent=True)
+
+            with reply:
+                return dict(iter_get_frames(reply.raw))
+        except Exception:
+            # the transport retries the request, the stream is retried here
+            if attempt >= transport.MAX_RETRIES:
+                logger.error(
+                    f'KVStore Database Connection Error! Giving up.\n{traceback.format_exc()}')
+                raise
+
+            delay = transport.backoff(attempt)
+            attempt += 1
+
+            logger.error(
+                f'KVStore Database Connection Error! Retrying in {delay:.2f}s.\n{traceback.format_exc()}')
+            sleep(delay)
+
+
+def kv_set_many_blob(values: List[bytes], namespace: Union[Tuple[str, str, int], None] = None) -> List[str]:
+    '''
+    Set many raw bytes Values with one framed request
+    '''
+    params = dict()
+    if namespace is not None:
+        params = {'job_name': namespace[0],
+                  'cluster_id': namespace[1], 'round': namespace[2]}
+
+    # group the values by shard, remembering their position
+    shard_values = dict()
+    for index, value in enumerate(values):
+        shard_values.setdefault(shard_of_value(value), []).append(index)
+
+    keys = [None] * len(values)
+    for shard_url, indices in shard_values.items():
+        body = pack_put_frames([values[index] for index in indices])
+
+        try:
+            reply = http.post_bytes(
+                f'{shard_url}/mput', body, params, idempotent=True)
+        except Exception:
+            logger.error(
+                f'KVStore Database Connection Error! Failed to set values.\n{traceback.format_exc()}')
+            raise
+
+        if not reply['status']:
+            return None
+
+        for index, key in zip(indices, reply['keys']):
+            keys[index] = key
+
+    return keys
+
+
+def kv_delete_blob(key: str) -> bool:
+    '''
+    Delete Value with Key, without decoding the deleted value
+    '''
+    try:
+        reply = http.get(f'{shard_of_key(key)}/delete', {'key': key})
+    except Exception:
+        logger.error(
+            f'KVStore Database Connection Error! Failed to delete key.\n{traceback.format_exc()}')
+        raise
+
+    return reply['status']
+
+
+def _set_shared(value: bytes, namespace: Union[Tuple[str, str, int], None],
+                compression: Union[dict, None]) -> Union[str, None]:
+    '''
+    Hand off a Value through shared memory, and set its descriptor.
+    Returns the key of the descriptor, or None if the segment could not be written.
+    '''
+    # the segments of the rounds retired by the kvstore are not read anymore
+    if namespace is not None:
+        shm_store.release_before(namespace)
+
+    descriptor = shm_store.publish(value, namespace)
+    if descriptor is None:
+        return None
+
+    # readers on other hosts fall back to the uploaded value
+    descriptor['fallback'] = kv_set_blob(_compress(value, compression), namespace) \
+        if SHM_MODE == 'hybrid' else None
+
+    return kv_set_blob(shm_store.encode_descriptor(descriptor), namespace)
+
+
+def _resolve(value: Union[bytes, bytearray, None]) -> Union[bytes, bytearray, None]:
+    '''
+    Get the Value behind a shared memory descriptor,
+    other values are returned as they are
+    '''
+    descriptor = shm_store.decode_descriptor(value)
+    if descriptor is None:
+        return value
+
+    shared = shm_store.read(descriptor)
+    if shared is not None:
+        return shared
+
+    if descriptor['fallback'] is not None:
+        return codec.decompress(kv_get_blob(descriptor['fallback']))
+
+    logger.error(
+        f'Shared memory segment [{descriptor["name"]}] of host [{descriptor["host"]}] is not readable here, and has no fallback.')
+
+    return None
+
+
+def _compress(value: bytes, compression: Union[dict, None]) -> bytes:
+    '''
+    Compress a value as per the job's compression {codec, level} config
+    '''
+    if compression is None:
+        return value
+
+    return codec.compress(value, compression['codec'] if 'codec' in compression else 'none',
+                          compression['level'] if 'level' in compression else None)
+
+
+#############################
+# Shard Routing
+#############################
+
+def shard_of_key(key: str) -> str:
+    '''
+    Get the url of the kvstore shard owning a key
+    '''
+    return KVS_RING.get_shard(key)
+
+
+def shard_of_value(value: bytes) -> str:
+    '''
+    Get the url of the kvstore shard owning a value,
+    keys are the md5 hash of the value, as computed by the kvstore
+    '''
+    if len(KVS_URLS) == 1:
+        return KVS_URLS[0]
+
+    return shard_of_key(md5(value).hexdigest())
+
+
 ###############################
 # HTTP-based Legacy KVStore API
 ###############################
@@ -61,14 +519,15 @@ def kv_get_legacy(key: str) -> Any:
     '''
 
     try:
-        reply = http.get(f'{KVS_URL}/get',
+        reply = http.get(f'{shard_of_key(key)}/get',
                          {'key': key})
     except Exception:
         logger.error(
-            f'KVStore Database Connection Error! Retrying in 30s.\n{traceback.format_exc()}')
-        sleep(DELAY*60)
+            f'KVStore Database Connection Error! Failed to get key.\n{traceback.format_exc()}')
+        raise
 
-    if reply['status'] == 404:
+    # the kvstore replies with status False (and 404) if the key is not found
+    if not reply['status']:
         return None
 
     return json.loads(reply['value'])
@@ -78,15 +537,17 @@ def kv_set_legacy(value: Any) -> str:
     '''
     Set Value with Key
     '''
-    try:
-        reply = http.post(f'{KVS_URL}/set', {'value': json.dumps(value)})
+    value = json.dumps(value)
 
+    try:
+        reply = http.post(f'{shard_of_value(value.encode())}/set',
+                          {'value': value}, idempotent=True)
     except Exception:
         logger.error(
-            f'KVStore Database Connection Error! Retrying in 30s.\n{traceback.format_exc()}')
-        sleep(DELAY*60)
+            f'KVStore Database Connection Error! Failed to set value.\n{traceback.format_exc()}')
+        raise
 
-    if reply['status'] == 500:
+    if not reply['status']:
         return None
 
     return reply['key']
@@ -96,16 +557,14 @@ def kv_delete_legacy(key: str) -> Any:
     '''
     Delete Value with Key
     '''
-    while True:
-        try:
-            reply = http.get(f'{KVS_URL}/delete', {'key': key})
-            break
-        except Exception:
-            logger.error(
-                f'KVStore Database Connection Error! Retrying in 30s.\n{traceback.format_exc()}')
-            sleep(DELAY*6)
+    try:
+        reply = http.get(f'{shard_of_key(key)}/delete', {'key': key})
+    except Exception:
+        logger.error(
+            f'KVStore Database Connection Error! Failed to delete key.\n{traceback.format_exc()}')
+        raise
 
-    if reply['res'] == 404:
+    if not reply['status']:
         return None
 
     return json.loads(reply['value'])
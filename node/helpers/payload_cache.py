@@ -0,0 +1,105 @@
+'''
+Per-node Payload Cache
+
+The kvstore keys are md5 hashes of the values, so a cached value never goes stale.
+Raw values and decoded payloads are kept in one LRU, bounded by bytes
+(a decoded payload is charged the size of its raw value).
+'''
+import threading
+from collections import OrderedDict
+from typing import Any, Union
+
+
+class PayloadCache(object):
+    '''
+    Payload Cache Class, a byte-bounded LRU of raw and decoded values keyed by kvstore key.
+    Cached values are shared between callers, so they must not be modified in place.
+    '''
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.table = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Union[bytes, memoryview, None]:
+        '''
+        Get the raw value of a key, None on a miss
+        '''
+        return self.__get(('raw', key))
+
+    def put(self, key: str, value: Union[bytes, bytearray, memoryview]) -> Union[bytes, memoryview]:
+        '''
+        Cache the raw value of a key, returns the cached value,
+        writable buffers are cached (without a copy) as read-only views
+        '''
+        if value is None:
+            return None
+
+        # the decoded tensors are views over the value, a read-only one is copied before training on it
+        if not isinstance(value, bytes):
+            value = memoryview(value).cast('B').toreadonly()
+
+        self.__put(('raw', key), value, len(value))
+
+        return value
+
+    def discard(self, key: str) -> None:
+        '''
+        Drop the raw and decoded values of a key
+        '''
+        with self.lock:
+            for entry_key in [('raw', key), ('decoded', key)]:
+                if entry_key in self.table:
+                    self.size -= self.table.pop(entry_key)[1]
+
+    def get_decoded(self, key: str) -> Any:
+        '''
+        Get the decoded payload of a key, None on a miss
+        '''
+        return self.__get(('decoded', key))
+
+    def put_decoded(self, key: str, payload: Any, size: int) -> None:
+        '''
+        Cache the decoded payload of a key, charged size bytes
+        '''
+        self.__put(('decoded', key), payload, size)
+
+    def stats(self) -> dict:
+        '''
+        Get the size, entry count, hits and misses of the cache
+        '''
+        with self.lock:
+            return {'size': self.size, 'entries': len(self.table),
+                    'hits': self.hits, 'misses': self.misses}
+
+    def __get(self, entry_key: tuple) -> Any:
+        with self.lock:
+            if entry_key not in self.table:
+                self.misses += 1
+                return None
+
+            self.table.move_to_end(entry_key)
+            self.hits += 1
+
+            return self.table[entry_key][0]
+
+    def __put(self, entry_key: tuple, value: Any, size: int) -> None:
+        # values larger than the whole budget are not cached
+        if size > self.budget:
+            return
+
+        with self.lock:
+            if entry_key in self.table:
+                self.size -= self.table[entry_key][1]
+
+            self.table[entry_key] = (value, size)
+            self.table.move_to_end(entry_key)
+            self.size += size
+
+            # evict the least recently used entries
+            while self.size > self.budget:
+                _, (_, evicted_size) = self.table.popitem(last=False)
+                self.size -= evicted_size
@@ -2,6 +2,8 @@
 The Performance Logging Module
 '''
 import os
+import base64
+from typing import Union
 from dotenv import load_dotenv
 from helpers.http import post
 from helpers.logging import logger
@@ -16,7 +18,7 @@ def init_project(job_name: str, config: dict):
     Initialize the project at PerfLog Server
     '''
     post(f'{PERFLOG_URL}/init_project',
-         {'job_name': job_name, 'config': config})
+         {'job_name': job_name, 'config': config}, gzip_json=True)
     logger.info(f'PerfLog initialized for Job [{job_name}]')
 
 
@@ -27,17 +29,33 @@ def add_record(job_name: str, cluster_id: str, node_id: str, node_type: str,
     '''
     post(f'{PERFLOG_URL}/add_record',
          {'job_name': job_name, 'cluster_id': cluster_id, 'node_id': node_id, 'node_type': node_type,
-          'round_num': round_num, 'epoch_num': epoch_num, 'metrics': metrics, 'time_delta': time_delta})
+          'round_num': round_num, 'epoch_num': epoch_num, 'metrics': metrics, 'time_delta': time_delta}, gzip_json=True)
     logger.info(
         f'Adding PerfLog Metrics for Job [{job_name}] at Round {round_num}')
 
 
-def add_params(job_name: str, round_num: int, params: dict):
+def add_transport_record(job_name: str, cluster_id: str, node_id: str, node_type: str,
+                         round_num: int, stats: dict):
+    '''
+    Add the raw and encoded payload byte counts of a round
+    '''
+    post(f'{PERFLOG_URL}/add_transport_record',
+         {'job_name': job_name, 'cluster_id': cluster_id, 'node_id': node_id, 'node_type': node_type,
+          'round_num': round_num, 'stats': stats})
+    logger.info(
+        f'Adding PerfLog Transport Record for Job [{job_name}] at Round {round_num}')
+
+
+def add_params(job_name: str, round_num: int, params: Union[dict, bytes]):
     '''
     Save the Global Parameters
     '''
+    # raw bytes payloads are not JSON serializable, send them as base64
+    if isinstance(params, (bytes, bytearray)):
+        params = base64.b64encode(params).decode('utf8')
+
     post(f'{PERFLOG_URL}/add_params',
-         {'job_name': job_name, 'round_num': round_num, 'params': params})
+         {'job_name': job_name, 'round_num': round_num, 'params': params}, gzip_json=True)
     logger.info(
         f'Adding PerfLog Params for Job [{job_name}] at Round {round_num}')
 
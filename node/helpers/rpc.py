@@ -0,0 +1,179 @@
+'''
+Logicon Job Operations Client
+
+The job operations (get_job_status, update_client_status, etc.) are called over the
+binary RPC connection of logicon if LOGICON_RPC_URL is set (e.g., tcp://localhost:5556),
+else over the HTTP routes. Either way, the reply body is the same as the HTTP route's.
+Over RPC, a connection is kept per process, and call_many pipelines its requests.
+If the RPC server cannot be reached, the calls fall back to the HTTP routes.
+'''
+import os
+import socket
+import threading
+from time import sleep
+from typing import Any, List, Tuple
+from urllib.parse import urlsplit
+from env import env
+from helpers import http, transport
+from helpers.logging import logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+LOGICON_URL = env['LOGICON_URL']
+RPC_URL = env['LOGICON_RPC_URL']
+
+RECV_SIZE = 256 * 1024
+
+# operations served by GET routes, which can be safely repeated
+READ_OPERATIONS = {'list_jobs', 'get_templates', 'get_config', 'get_participants',
+                   'get_job_status', 'get_exec_params'}
+
+# connections keyed by pid, as the node forks a process per job
+_connections = dict()
+_connections_lock = threading.Lock()
+
+
+class RPCUnavailable(ConnectionError):
+    '''
+    The connection to the RPC server could not be established, so no request was sent
+    '''
+
+
+class RPCConnection(object):
+    '''
+    RPC Connection Class, a persistent connection to the logicon RPC server
+    '''
+
+    def __init__(self, url: str):
+        target = urlsplit(url)
+        self.address = (target.hostname, target.port)
+
+        self.sock = None
+        self.unpacker = None
+        self.packer = msgpack.Packer(use_bin_type=True)
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def call_many(self, calls: List[Tuple[str, dict]], timeout=3600) -> List[Tuple[int, Any]]:
+        '''
+        Send all the requests before reading their replies,
+        returns the (status_code, body) of each call, in order
+        '''
+        idempotent = all(operation in READ_OPERATIONS for operation, _ in calls)
+
+        with self.lock:
+            attempt = 0
+            while True:
+                sent = False
+                try:
+                    if self.sock is None:
+                        try:
+                            self.__connect()
+                        except OSError as error:
+                            raise RPCUnavailable(
+                                f'Failed to connect to {self.address[0]}:{self.address[1]}: {error}') from error
+                    self.sock.settimeout(timeout)
+
+                    msg_ids = list(range(self.next_id, self.next_id + len(calls)))
+                    self.next_id += len(calls)
+
+                    frames = b''.join(self.packer.pack([msg_id, operation, params])
+                                      for msg_id, (operation, params) in zip(msg_ids, calls))
+                    sent = True
+                    self.sock.sendall(frames)
+
+                    return self.__receive(msg_ids)
+                except RPCUnavailable:
+                    self.close()
+                    raise
+                except OSError as error:
+                    self.close()
+
+                    # the requests may have been served, only repeat them if harmless
+                    if attempt >= transport.MAX_RETRIES or (sent and not idempotent):
+                        raise
+
+                    delay = transport.backoff(attempt)
+                    attempt += 1
+
+                    logger.warning(
+                        f'Logicon RPC failed ({type(error).__name__}), retry {attempt}/{transport.MAX_RETRIES} in {delay:.2f}s.')
+                    sleep(delay)
+
+    def close(self) -> None:
+        '''
+        Close the connection, it is reopened by the next call
+        '''
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.unpacker = None
+
+    def __connect(self) -> None:
+        self.sock = socket.create_connection(self.address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.unpacker = msgpack.Unpacker(raw=False)
+
+    def __receive(self, msg_ids: List[int]) -> List[Tuple[int, Any]]:
+        '''
+        Read the replies of the pipelined requests
+        '''
+        replies = dict()
+        while len(replies) < len(msg_ids):
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionResetError('Logicon RPC connection closed')
+
+            self.unpacker.feed(data)
+            for msg_id, code, body in self.unpacker:
+                replies[msg_id] = (code, body)
+
+        return [replies[msg_id] for msg_id in msg_ids]
+
+
+def call(operation: str, params: dict, timeout=3600) -> Any:
+    '''
+    Call a job operation of logicon, and get its reply body
+    '''
+    return call_many([(operation, params)], timeout)[0]
+
+
+def call_many(calls: List[Tuple[str, dict]], timeout=3600) -> List[Any]:
+    '''
+    Call many job operations of logicon, pipelined over RPC,
+    and get their reply bodies in order
+    '''
+    if RPC_URL:
+        try:
+            return [body for _, body in get_connection().call_many(calls, timeout)]
+        except RPCUnavailable as error:
+            logger.warning(
+                f'Logicon RPC is not reachable ({error}), calling the HTTP routes.')
+
+    return [http.get(f'{LOGICON_URL}/job/{operation}', params, timeout)
+            if operation in READ_OPERATIONS else
+            http.post(f'{LOGICON_URL}/job/{operation}', params, timeout)
+            for operation, params in calls]
+
+
+def get_connection() -> RPCConnection:
+    '''
+    Get the RPC connection of this process, creating it if needed
+    '''
+    if msgpack is None:
+        raise ImportError(
+            'LOGICON_RPC_URL is set, but msgpack is not installed.')
+
+    pid = os.getpid()
+
+    with _connections_lock:
+        if pid not in _connections:
+            _connections[pid] = RPCConnection(RPC_URL)
+
+        return _connections[pid]
@@ -0,0 +1,222 @@
+'''
+Same-host Shared Memory Hand-off of KVStore Values
+
+Nodes on the same host (same host id) exchange payloads through POSIX shared memory
+segments, which on Linux are the files under /dev/shm, and only a small descriptor goes
+through the kvstore. A segment is named after the md5 of its payload, and starts with a
+header [refcount, size] updated under an flock. The writer holds a reference until the
+round of the payload is retired, and a reader holds one while it copies the payload,
+so the segment is unlinked when the last of them is done.
+'''
+import os
+import json
+import fcntl
+import struct
+import threading
+from hashlib import md5
+from typing import Tuple, Union
+from procmon.system_level import get_unique_id
+from helpers.logging import logger
+
+SHM_DIR = '/dev/shm'
+NAME_PREFIX = 'flsim-'
+
+DESCRIPTOR_MAGIC = b'FSHM1\n'
+
+# segment header: reference count, payload size
+HEADER_FORMAT = '!QQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+HOST_ID = f'{get_unique_id():012x}'
+
+# segments referenced by this process, as (job_name, cluster_id, round, name)
+_held = list()
+_held_lock = threading.Lock()
+
+
+def available() -> bool:
+    '''
+    Check if the POSIX shared memory directory is there
+    '''
+    return os.path.isdir(SHM_DIR)
+
+
+def publish(value: bytes, namespace: Union[Tuple[str, str, int], None] = None) -> Union[dict, None]:
+    '''
+    Put a value in the shared memory segment of its md5, or take another reference
+    of the segment if it is already there. Returns the descriptor of the segment,
+    or None if it could not be written (e.g., /dev/shm is full).
+    '''
+    digest = md5(value).hexdigest()
+    name = f'{NAME_PREFIX}{digest}'
+    path = os.path.join(SHM_DIR, name)
+
+    try:
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+                # unlinked by its last reader in the meantime, create it again
+                if os.fstat(fd).st_nlink == 0:
+                    continue
+
+                if os.fstat(fd).st_size == 0:
+                    # allocate the pages up front, a full tmpfs then fails here and not on write
+                    os.posix_fallocate(fd, 0, HEADER_SIZE + len(value))
+                    os.pwrite(fd, value, HEADER_SIZE)
+                    os.pwrite(fd, struct.pack(HEADER_FORMAT, 1, len(value)), 0)
+                else:
+                    refcount, _ = struct.unpack(
+                        HEADER_FORMAT, os.pread(fd, HEADER_SIZE, 0))
+                    os.pwrite(fd, struct.pack(HEADER_FORMAT, refcount + 1, len(value)), 0)
+                break
+            finally:
+                os.close(fd)
+    except OSError as error:
+        logger.warning(
+            f'Failed to write shared memory segment [{name}] ({error}), using the kvstore.')
+        __remove_empty(path)
+        return None
+
+    with _held_lock:
+        _held.append((namespace[0], namespace[1], namespace[2], name)
+                     if namespace is not None else (None, None, None, name))
+
+    return {'host': HOST_ID, 'name': name, 'size': len(value), 'md5': digest}
+
+
+def read(descriptor: dict) -> Union[bytes, None]:
+    '''
+    Copy the payload of a segment, returns None if the segment is not on this host,
+    or is already gone
+    '''
+    if descriptor['host'] != HOST_ID:
+        return None
+
+    path = os.path.join(SHM_DIR, descriptor['name'])
+
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        return None
+
+    try:
+        if not __acquire(fd):
+            return None
+
+        try:
+            value = os.pread(fd, descriptor['size'], HEADER_SIZE)
+        finally:
+            __release(fd, path)
+    finally:
+        os.close(fd)
+
+    if len(value) != descriptor['size']:
+        return None
+
+    return value
+
+
+def release_before(namespace: Tuple[str, str, int]) -> None:
+    '''
+    Release the segments this process holds for the rounds of a job's cluster
+    retired by the kvstore, i.e., before the previous round of the namespace
+    '''
+    job_name, cluster_id, round_num = namespace
+
+    __release_held(lambda held: held[0] == job_name and held[1] == cluster_id
+                   and held[2] is not None and held[2] < round_num - 1)
+
+
+def release_all(job_name: Union[str, None] = None) -> None:
+    '''
+    Release the segments this process holds (for a job, or all of them)
+    '''
+    __release_held(lambda held: job_name is None or held[0] == job_name)
+
+
+def encode_descriptor(descriptor: dict) -> bytes:
+    '''
+    Serialize a descriptor, to be stored in the kvstore
+    '''
+    return DESCRIPTOR_MAGIC + json.dumps(descriptor).encode('utf8')
+
+
+def decode_descriptor(value: Union[bytes, bytearray]) -> Union[dict, None]:
+    '''
+    Deserialize a descriptor, returns None if the value is not one
+    '''
+    if value is None or bytes(value[:len(DESCRIPTOR_MAGIC)]) != DESCRIPTOR_MAGIC:
+        return None
+
+    return json.loads(bytes(value[len(DESCRIPTOR_MAGIC):]))
+
+
+def __release_held(predicate) -> None:
+    with _held_lock:
+        released = [held for held in _held if predicate(held)]
+        _held[:] = [held for held in _held if not predicate(held)]
+
+    for _, _, _, name in released:
+        path = os.path.join(SHM_DIR, name)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            continue
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            __release(fd, path, locked=True)
+        finally:
+            os.close(fd)
+
+
+def __acquire(fd: int) -> bool:
+    '''
+    Take a reference of a segment, unless it is already unlinked
+    '''
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        if os.fstat(fd).st_nlink == 0:
+            return False
+
+        refcount, size = struct.unpack(
+            HEADER_FORMAT, os.pread(fd, HEADER_SIZE, 0))
+        os.pwrite(fd, struct.pack(HEADER_FORMAT, refcount + 1, size), 0)
+
+        return True
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def __release(fd: int, path: str, locked=False) -> None:
+    '''
+    Drop a reference of a segment, and unlink it if it was the last one
+    '''
+    if not locked:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        if os.fstat(fd).st_nlink == 0:
+            return
+
+        refcount, size = struct.unpack(
+            HEADER_FORMAT, os.pread(fd, HEADER_SIZE, 0))
+
+        if refcount <= 1:
+            os.unlink(path)
+        else:
+            os.pwrite(fd, struct.pack(HEADER_FORMAT, refcount - 1, size), 0)
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def __remove_empty(path: str) -> None:
+    '''
+    Remove a segment left empty by a failed write
+    '''
+    try:
+        if os.path.getsize(path) == 0:
+            os.unlink(path)
+    except OSError:
+        pass
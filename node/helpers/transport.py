@@ -0,0 +1,226 @@
+'''
+Shared HTTP Transport for all the node traffic
+
+Requests go through one keep-alive session per host (created lazily in each process,
+as the node forks a process per job), so the status polls reuse their connections.
+Failed requests are retried with bounded exponential backoff and full jitter.
+Only idempotent requests are retried once they may have reached the server,
+other requests are retried only if the connection was never established.
+Services on the same host can be reached on their unix socket with unix:// urls,
+e.g., unix:///tmp/flsim/logicon.sock/job/get_config (the socket path ends with .sock).
+'''
+import os
+import gzip
+import json
+import random
+import socket
+import threading
+from time import sleep
+from urllib.parse import urlsplit, quote, unquote
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.exceptions import NewConnectionError
+from env import env
+from helpers.logging import logger
+
+POOL_SIZE = env['HTTP_POOL_SIZE']
+MAX_RETRIES = env['HTTP_MAX_RETRIES']
+BACKOFF_BASE = env['HTTP_BACKOFF_BASE']
+BACKOFF_MAX = env['HTTP_BACKOFF_MAX']
+
+# JSON bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+# gateway errors, the request did not reach (or was not served by) the app
+RETRY_STATUSES = {502, 503, 504}
+
+UNIX_SCHEME = 'unix://'
+UNIX_SOCKET_SUFFIX = '.sock'
+
+# sessions keyed by (pid, scheme://host:port)
+_sessions = dict()
+_sessions_lock = threading.Lock()
+
+
+def request(method: str, url: str, idempotent=None, retries=None, gzip_json=False,
+            **kwargs) -> requests.Response:
+    '''
+    Send a request through the pooled session of the url's host, retrying on failure.
+    idempotent overrides the idempotency of the method (e.g., for content-addressed POSTs),
+    gzip_json compresses the json body (only for servers that accept gzip bodies).
+    '''
+    method = method.upper()
+    url = unix_url(url) if url.startswith(UNIX_SCHEME) else url
+    idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+    retries = MAX_RETRIES if retries is None else retries
+
+    if gzip_json and 'json' in kwargs:
+        __gzip_body(kwargs)
+
+    session = get_session(url)
+
+    attempt = 0
+    while True:
+        try:
+            reply = session.request(method, url, **kwargs)
+
+            if reply.status_code not in RETRY_STATUSES or not idempotent or attempt >= retries:
+                return reply
+
+            reply.close()
+            reason = f'status {reply.status_code}'
+        except (requests.ConnectionError, requests.Timeout) as error:
+            if attempt >= retries or (not idempotent and _was_sent(error)):
+                raise
+            reason = type(error).__name__
+
+        delay = backoff(attempt)
+        attempt += 1
+
+        logger.warning(
+            f'HTTP {method} {urlsplit(url).path} failed ({reason}), retry {attempt}/{retries} in {delay:.2f}s.')
+        sleep(delay)
+
+
+def backoff(attempt: int) -> float:
+    '''
+    Get the delay before a retry, drawn uniformly from the exponential backoff window
+    '''
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def get_session(url: str) -> requests.Session:
+    '''
+    Get the keep-alive session of a url's host, creating it in this process if needed
+    '''
+    parts = urlsplit(url)
+    session_key = (os.getpid(), f'{parts.scheme}://{parts.netloc}')
+
+    session = _sessions.get(session_key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        if session_key not in _sessions:
+            session = requests.Session()
+            adapter = UnixSocketAdapter(pool_maxsize=POOL_SIZE) if parts.scheme == 'http+unix' \
+                else HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount(f'{parts.scheme}://', adapter)
+
+            _sessions[session_key] = session
+
+        return _sessions[session_key]
+
+
+def unix_url(url: str) -> str:
+    '''
+    Convert a unix:///path/to/service.sock/route url into the http+unix://<quoted path>/route
+    form, which requests parses like an http url (query params and all)
+    '''
+    path = url[len(UNIX_SCHEME):]
+    split = path.find(UNIX_SOCKET_SUFFIX)
+    if split < 0:
+        raise ValueError(
+            f'The socket path of [{url}] must end with {UNIX_SOCKET_SUFFIX}')
+
+    split += len(UNIX_SOCKET_SUFFIX)
+
+    return f'http+unix://{quote(path[:split], safe="")}{path[split:]}'
+
+
+class UnixSocketConnection(HTTPConnection):
+    '''
+    HTTP Connection over a unix domain socket
+    '''
+
+    def __init__(self, *args, socket_path: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+
+        try:
+            sock.connect(self.socket_path)
+        except OSError as error:
+            sock.close()
+            raise NewConnectionError(
+                self, f'Failed to connect to {self.socket_path}: {error}') from error
+
+        return sock
+
+
+class UnixSocketConnectionPool(HTTPConnectionPool):
+    '''
+    Keep-alive connection pool of a unix domain socket
+    '''
+    ConnectionCls = UnixSocketConnection
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    '''
+    Requests Adapter for http+unix:// urls, with a connection pool per socket
+    '''
+
+    def __init__(self, pool_maxsize: int):
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.unix_pools = dict()
+        self.unix_pools_lock = threading.Lock()
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self.__get_pool(request.url)
+
+    def get_connection(self, url, proxies=None):
+        return self.__get_pool(url)
+
+    def close(self):
+        super().close()
+        with self.unix_pools_lock:
+            for pool in self.unix_pools.values():
+                pool.close()
+            self.unix_pools.clear()
+
+    def __get_pool(self, url: str) -> UnixSocketConnectionPool:
+        socket_path = unquote(urlsplit(url).netloc)
+
+        with self.unix_pools_lock:
+            if socket_path not in self.unix_pools:
+                self.unix_pools[socket_path] = UnixSocketConnectionPool(
+                    'localhost', maxsize=self._pool_maxsize, block=False, socket_path=socket_path)
+
+            return self.unix_pools[socket_path]
+
+
+def _was_sent(error: Exception) -> bool:
+    '''
+    Check if a failed request may have reached the server,
+    which is not the case if the connection could not be established
+    '''
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+
+    reason = getattr(error.args[0], 'reason', None) if len(error.args) > 0 else None
+
+    return not isinstance(reason, NewConnectionError)
+
+
+def __gzip_body(kwargs: dict) -> None:
+    '''
+    Replace the json argument of a request by a gzip compressed body, if it is large enough
+    '''
+    body = json.dumps(kwargs['json']).encode('utf8')
+    headers = dict(kwargs['headers']) if 'headers' in kwargs and kwargs['headers'] else dict()
+    headers['Content-Type'] = 'application/json'
+
+    if len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, 5)
+        headers['Content-Encoding'] = 'gzip'
+
+    del kwargs['json']
+    kwargs['data'] = body
+    kwargs['headers'] = headers
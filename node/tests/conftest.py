@@ -0,0 +1,9 @@
+'''
+Test Setup, the node modules are imported from the node directory,
+and parse the command line of a node (not the one of pytest)
+'''
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.argv = [sys.argv[0], '-n', 'test-node', '-cn', '0']
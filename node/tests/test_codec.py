@@ -0,0 +1,91 @@
+'''
+Tests of the per-object compression of the kvstore values
+'''
+import struct
+import numpy
+import pytest
+from helpers import codec, p2p_store
+from helpers.payload_cache import PayloadCache
+
+# float32 weights with structured zeros, like a pruned model payload
+PAYLOAD = numpy.where(numpy.arange(4096) % 4 == 0, numpy.linspace(-1, 1, 4096), 0).astype(numpy.float32).tobytes()
+
+
+def header_of(value: bytes) -> tuple:
+    return struct.unpack(codec.HEADER_FORMAT, value[:codec.HEADER_SIZE])
+
+
+@pytest.mark.parametrize('name', ['zlib', 'zstd', 'lz4'])
+def test_round_trip(name):
+    if not codec.available(name):
+        pytest.skip(f'{name} is not installed')
+
+    compressed = codec.compress(PAYLOAD, name, None)
+
+    assert len(compressed) < len(PAYLOAD) // 2
+    assert header_of(compressed) == (codec.HEADER_MAGIC, codec.CODEC_IDS[name],
+                                     codec.DEFAULT_LEVELS[name], len(PAYLOAD))
+    assert bytes(codec.decompress(compressed)) == PAYLOAD
+
+
+def test_level_is_recorded():
+    fast, small = codec.compress(PAYLOAD, 'zlib', 1), codec.compress(PAYLOAD, 'zlib', 9)
+
+    assert header_of(fast)[2] == 1 and header_of(small)[2] == 9
+    assert codec.decompress(fast) == codec.decompress(small) == PAYLOAD
+
+
+def test_uncompressed_values_pass_through():
+    assert codec.compress(PAYLOAD, 'none') is PAYLOAD
+    assert codec.compress(PAYLOAD, None) is PAYLOAD
+
+    assert codec.decompress(PAYLOAD) is PAYLOAD
+    assert codec.decompress(b'FLZ') == b'FLZ'
+    assert codec.decompress(None) is None
+
+
+def test_missing_codec_falls_back_to_zlib(monkeypatch):
+    monkeypatch.setattr(codec, 'zstandard', None)
+
+    compressed = codec.compress(PAYLOAD, 'zstd', 19)
+
+    # the level of zstd does not apply to zlib
+    assert header_of(compressed)[1:3] == (codec.CODEC_IDS['zlib'], codec.DEFAULT_LEVELS['zlib'])
+    assert codec.decompress(compressed) == PAYLOAD
+
+
+def test_reader_without_the_codec(monkeypatch):
+    monkeypatch.setattr(codec, 'lz4_frame', None)
+    header = struct.pack(codec.HEADER_FORMAT, codec.HEADER_MAGIC, codec.CODEC_IDS['lz4'], 0, 10)
+
+    with pytest.raises(ValueError):
+        codec.decompress(header + b'body')
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        codec.compress(PAYLOAD, 'brotli')
+
+
+def test_values_are_compressed_at_rest(monkeypatch):
+    stored = dict()
+
+    def kv_set_blob(value, namespace=None):
+        key = f'key-{len(stored)}'
+        stored[key] = bytes(value)
+        return key
+
+    monkeypatch.setattr(p2p_store, 'SHM_MODE', 'off')
+    monkeypatch.setattr(p2p_store, 'CACHE', PayloadCache(0))
+    monkeypatch.setattr(p2p_store, 'kv_set_blob', kv_set_blob)
+    monkeypatch.setattr(p2p_store, 'kv_get_blob', lambda key: stored.get(key))
+
+    compressed_key = p2p_store.setv(PAYLOAD, None, {'codec': 'zlib', 'level': 3})
+    raw_key = p2p_store.setv(PAYLOAD)
+
+    # the kvstore holds the compressed value, and the reader gets the raw one back
+    assert header_of(stored[compressed_key])[1:3] == (codec.CODEC_IDS['zlib'], 3)
+    assert stored[raw_key] == PAYLOAD
+
+    assert bytes(p2p_store.getv(compressed_key)) == PAYLOAD
+    assert bytes(p2p_store.getv(raw_key)) == PAYLOAD
@@ -0,0 +1,123 @@
+'''
+Tests of the delta-chain broadcast of the global payloads, against an in-memory kvstore
+'''
+import json
+from hashlib import md5
+import numpy
+import pytest
+from helpers import p2p_store
+from helpers.delta_chain import DeltaChain, shuffle_planes, unshuffle_planes
+
+
+@pytest.fixture
+def store(monkeypatch):
+    '''
+    Serve setv and getv from a dict, counting the downloads of every key
+    '''
+    state = {'values': dict(), 'downloads': dict()}
+
+    def setv(value: bytes, namespace=None, compression=None, shared=True):
+        key = md5(value).hexdigest()
+        state['values'][key] = bytes(value)
+        return key
+
+    def getv(key: str):
+        state['downloads'][key] = state['downloads'].get(key, 0) + 1
+        return state['values'].get(key)
+
+    monkeypatch.setattr(p2p_store, 'setv', setv)
+    monkeypatch.setattr(p2p_store, 'getv', getv)
+
+    return state
+
+
+def make_payloads(rounds: int, size=4096) -> list:
+    '''
+    Get the float32 payloads of consecutive rounds, each a small step from the previous one
+    '''
+    generator = numpy.random.default_rng(0)
+    params = generator.standard_normal(size // 4).astype(numpy.float32)
+
+    payloads = list()
+    for _ in range(rounds):
+        payloads.append(params.tobytes())
+        params = params + generator.standard_normal(params.shape).astype(numpy.float32) * 1e-3
+
+    return payloads
+
+
+def publish_all(worker: DeltaChain, store: dict, payloads: list) -> list:
+    '''
+    Upload and publish the payloads of every round, returns their (key, extra_data)
+    '''
+    published = list()
+    for round_num, payload in enumerate(payloads):
+        key = p2p_store.setv(payload)
+        published.append((key, worker.publish(payload, key, ('job', 'cluster', round_num))))
+
+    return published
+
+
+def json_manifest(store: dict, extra_data: dict) -> dict:
+    return json.loads(store['values'][extra_data['delta_manifest']])
+
+
+def test_planes_round_trip():
+    value = bytes(range(256)) * 3 + b'tail'
+
+    assert unshuffle_planes(shuffle_planes(value)) == value
+
+
+def test_rounds_are_fetched_from_deltas(store):
+    payloads = make_payloads(4)
+    published = publish_all(DeltaChain(5), store, payloads)
+
+    client = DeltaChain(5)
+    for (key, extra_data), payload in zip(published, payloads):
+        assert bytes(client.fetch(key, extra_data)) == payload
+
+    # only the first round is downloaded in full
+    full_downloads = [store['downloads'].get(key, 0) for key, _ in published]
+    assert full_downloads == [1, 0, 0, 0]
+    assert all(extra_data['delta'] is not None for _, extra_data in published[1:])
+
+
+def test_skipped_rounds_walk_the_chain(store):
+    payloads = make_payloads(4)
+    published = publish_all(DeltaChain(5), store, payloads)
+
+    client = DeltaChain(5)
+    client.fetch(*published[0])
+
+    # from the first round straight to the last one, through the three deltas
+    assert bytes(client.fetch(*published[3])) == payloads[3]
+    assert store['downloads'].get(published[3][0], 0) == 0
+
+
+def test_chain_is_reset_after_max_depth(store):
+    payloads = make_payloads(6)
+    published = publish_all(DeltaChain(2), store, payloads)
+
+    depths = [json_manifest(store, extra_data)['depth'] for _, extra_data in published]
+    assert depths == [0, 1, 2, 0, 1, 2]
+    assert published[3][1]['delta'] is None
+
+    # a client which missed the snapshot cannot reach it from its old base
+    client = DeltaChain(2)
+    client.fetch(*published[1])
+    assert bytes(client.fetch(*published[4])) == payloads[4]
+    assert store['downloads'][published[4][0]] == 1
+
+
+def test_corrupted_delta_falls_back_to_the_full_payload(store):
+    payloads = make_payloads(2)
+    published = publish_all(DeltaChain(5), store, payloads)
+
+    delta_key = published[1][1]['delta']
+    store['values'][delta_key] = bytes(len(store['values'][delta_key]))
+
+    client = DeltaChain(5)
+    client.fetch(*published[0])
+
+    assert bytes(client.fetch(*published[1])) == payloads[1]
+    assert store['downloads'][published[1][0]] == 1
@@ -0,0 +1,28 @@
+'''
+Tests of the framing of the batch kvstore requests
+'''
+import io
+import struct
+import pytest
+from helpers.framing import GET_FRAME_FORMAT, PUT_FRAME_FORMAT, pack_put_frames, iter_get_frames
+
+
+def test_pack_put_frames():
+    body = pack_put_frames([b'first', b''])
+
+    assert body == struct.pack(PUT_FRAME_FORMAT, 5) + b'first' + struct.pack(PUT_FRAME_FORMAT, 0)
+
+
+def test_iter_get_frames():
+    found, missing = 'a' * 32, 'b' * 32
+    body = struct.pack(GET_FRAME_FORMAT, bytes.fromhex(found), 1, 5) + b'value' + \
+        struct.pack(GET_FRAME_FORMAT, bytes.fromhex(missing), 0, 0)
+
+    assert list(iter_get_frames(io.BytesIO(body))) == [(found, b'value'), (missing, None)]
+
+
+def test_truncated_get_frame():
+    body = struct.pack(GET_FRAME_FORMAT, bytes(16), 1, 5) + b'val'
+
+    with pytest.raises(ValueError):
+        list(iter_get_frames(io.BytesIO(body)))
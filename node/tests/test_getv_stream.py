@@ -0,0 +1,42 @@
+'''
+Tests of the streamed download of many kvstore values
+'''
+import random
+from time import sleep
+import pytest
+from helpers import p2p_store
+
+VALUES = {f'{i:032x}': f'value-{i}'.encode() for i in range(12)}
+
+
+@pytest.fixture(autouse=True)
+def kvstore(monkeypatch):
+    '''
+    Serve the values from memory, each download taking a random time
+    '''
+    generator = random.Random(0)
+    delays = {key: generator.uniform(0, 0.02) for key in VALUES}
+
+    def kv_get_blob(key: str):
+        sleep(delays[key])
+        return VALUES[key]
+
+    monkeypatch.setattr(p2p_store, 'kv_get_blob', kv_get_blob)
+
+
+def test_every_value_is_yielded_once():
+    keys = list(VALUES.keys())
+
+    received = dict(p2p_store.getv_stream(keys, window=4))
+
+    assert sorted(received.keys()) == list(range(len(keys)))
+    assert all(received[index] == VALUES[key] for index, key in enumerate(keys))
+
+
+def test_ordered_values_are_yielded_in_the_order_of_the_keys():
+    keys = list(VALUES.keys())
+
+    received = list(p2p_store.getv_stream(keys, window=4, ordered=True))
+
+    assert [index for index, _ in received] == list(range(len(keys)))
+    assert [value for _, value in received] == [VALUES[key] for key in keys]
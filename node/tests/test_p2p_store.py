@@ -0,0 +1,47 @@
+'''
+Tests of the kvstore client of the nodes, against an in-memory kvstore
+'''
+import pytest
+from helpers import p2p_store
+
+VALUE = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def ranges(monkeypatch):
+    '''
+    Serve the Range requests of the value from memory, in chunks of 1000 bytes,
+    the keys in ranges['deleted_after'] disappear after that many requests
+    '''
+    state = {'requests': 0, 'deleted_after': None}
+
+    def get_range(url: str, start: int, end: int, **_):
+        state['requests'] += 1
+        if state['deleted_after'] is not None and state['requests'] > state['deleted_after']:
+            return None
+
+        return VALUE[start:end + 1], len(VALUE)
+
+    monkeypatch.setattr(p2p_store, 'CHUNK_SIZE', 1000)
+    monkeypatch.setattr(p2p_store.http, 'get_range', get_range)
+
+    return state
+
+
+def test_large_values_are_downloaded_in_ranges(ranges):
+    value = p2p_store.kv_get_blob('0' * 32)
+
+    assert bytes(value) == VALUE
+    assert ranges['requests'] == 11
+
+
+def test_key_deleted_mid_download(ranges):
+    ranges['deleted_after'] = 3
+
+    assert p2p_store.kv_get_blob('0' * 32) is None
+
+
+def test_missing_key(ranges):
+    ranges['deleted_after'] = 0
+
+    assert p2p_store.kv_get_blob('0' * 32) is None
@@ -0,0 +1,52 @@
+'''
+Tests of the per-node payload cache
+'''
+import numpy as np
+from helpers.payload_cache import PayloadCache
+
+
+def test_writable_values_are_cached_without_a_copy():
+    cache = PayloadCache(1024)
+    value = bytearray(b'payload')
+
+    cached = cache.put('key', value)
+
+    assert cached.readonly
+    assert bytes(cache.get('key')) == b'payload'
+    assert np.frombuffer(cached, dtype=np.uint8).ctypes.data == np.frombuffer(value, dtype=np.uint8).ctypes.data
+
+
+def test_bytes_are_cached_as_they_are():
+    cache = PayloadCache(1024)
+    value = b'payload'
+
+    assert cache.put('key', value) is value
+    assert cache.get('key') is value
+
+
+def test_least_recently_used_values_are_evicted():
+    cache = PayloadCache(10)
+
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    cache.get('a')
+    cache.put('c', b'1234')
+
+    # b was the least recently used
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234' and cache.get('c') == b'1234'
+    assert cache.stats()['size'] == 8
+
+
+def test_decoded_payloads_share_the_budget():
+    cache = PayloadCache(10)
+
+    cache.put('a', b'12345678')
+    cache.put_decoded('b', {'decoded': True}, 8)
+
+    assert cache.get('a') is None
+    assert cache.get_decoded('b') == {'decoded': True}
+
+    cache.discard('b')
+    assert cache.get_decoded('b') is None
+    assert cache.stats()['size'] == 0
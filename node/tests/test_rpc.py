@@ -0,0 +1,84 @@
+'''
+Tests of the pipelined RPC client of the logicon job operations
+'''
+import socket
+import threading
+import socketserver
+import msgpack
+import pytest
+from helpers import rpc, http
+
+
+class ReversingHandler(socketserver.BaseRequestHandler):
+    '''
+    Replies to every batch of requests in reverse order, echoing the operation and params
+    '''
+
+    def handle(self):
+        unpacker = msgpack.Unpacker(raw=False)
+        packer = msgpack.Packer(use_bin_type=True)
+
+        while True:
+            data = self.request.recv(rpc.RECV_SIZE)
+            if not data:
+                return
+
+            unpacker.feed(data)
+            replies = [packer.pack([msg_id, 200, {'operation': operation, 'params': params}])
+                       for msg_id, operation, params in unpacker]
+
+            self.request.sendall(b''.join(reversed(replies)))
+
+
+@pytest.fixture
+def server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), ReversingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f'tcp://127.0.0.1:{server.server_address[1]}'
+
+    server.shutdown()
+    server.server_close()
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_replies_are_matched_by_message_id(server):
+    connection = rpc.RPCConnection(server)
+    calls = [('get_job_status', {'job_name': f'job-{i}'}) for i in range(5)]
+
+    # the batch is sent at once, so it is read (and reversed) by the server at once
+    replies = connection.call_many(calls)
+
+    assert [body['params']['job_name'] for _, body in replies] == [f'job-{i}' for i in range(5)]
+
+    # the message ids go on across the calls of the connection
+    assert connection.call_many([('list_jobs', {})]) == [(200, {'operation': 'list_jobs', 'params': {}})]
+    assert connection.next_id == 6
+
+    connection.close()
+
+
+def test_call_over_rpc(server, monkeypatch):
+    monkeypatch.setattr(rpc, 'RPC_URL', server)
+    monkeypatch.setattr(rpc, '_connections', dict())
+
+    assert rpc.call('get_config', {'job_name': 'job'}) == {'operation': 'get_config', 'params': {'job_name': 'job'}}
+
+
+def test_call_falls_back_to_http(monkeypatch):
+    monkeypatch.setattr(rpc, 'RPC_URL', f'tcp://127.0.0.1:{closed_port()}')
+    monkeypatch.setattr(rpc, 'LOGICON_URL', 'http://logicon')
+    monkeypatch.setattr(rpc, '_connections', dict())
+
+    sent = list()
+    monkeypatch.setattr(http, 'get', lambda url, params, timeout: sent.append(('GET', url)) or {'status': True})
+    monkeypatch.setattr(http, 'post', lambda url, params, timeout: sent.append(('POST', url)) or {'status': True})
+
+    assert rpc.call_many([('get_job_status', {}), ('update_client_status', {})]) == [{'status': True}] * 2
+    assert sent == [('GET', 'http://logicon/job/get_job_status'), ('POST', 'http://logicon/job/update_client_status')]
@@ -0,0 +1,110 @@
+'''
+Tests of the same-host shared memory hand-off, in a temporary directory in place of /dev/shm
+'''
+import os
+import struct
+import pytest
+from helpers import shm_store, p2p_store
+
+VALUE = bytes(range(256)) * 16
+
+
+@pytest.fixture
+def shm_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shm_store, 'SHM_DIR', str(tmp_path))
+    monkeypatch.setattr(shm_store, '_held', list())
+
+    return tmp_path
+
+
+def refcount(shm_dir, descriptor: dict) -> int:
+    with open(shm_dir / descriptor['name'], 'rb') as f:
+        return struct.unpack(shm_store.HEADER_FORMAT, f.read(shm_store.HEADER_SIZE))[0]
+
+
+def test_same_host_resolve(shm_dir):
+    descriptor = shm_store.publish(VALUE, ('job', 'cluster', 0))
+
+    assert descriptor['host'] == shm_store.HOST_ID
+    assert shm_store.read(descriptor) == VALUE
+
+    # the descriptor in the kvstore resolves to the payload, and the reader drops its reference
+    assert p2p_store._resolve(shm_store.encode_descriptor(descriptor)) == VALUE
+    assert refcount(shm_dir, descriptor) == 1
+
+
+def test_same_payload_shares_a_segment(shm_dir):
+    first = shm_store.publish(VALUE, ('job', 'cluster', 0))
+    second = shm_store.publish(VALUE, ('job', 'cluster', 0))
+
+    assert first == second
+    assert os.listdir(shm_dir) == [first['name']]
+    assert refcount(shm_dir, first) == 2
+
+
+def test_other_values_are_not_descriptors():
+    assert shm_store.decode_descriptor(VALUE) is None
+    assert p2p_store._resolve(VALUE) == VALUE
+
+
+def test_foreign_host_goes_to_the_fallback(shm_dir, monkeypatch):
+    descriptor = shm_store.publish(VALUE, ('job', 'cluster', 0))
+    descriptor = dict(descriptor, host='0' * 12, fallback='fallback-key')
+
+    fetched = list()
+    monkeypatch.setattr(p2p_store, 'kv_get_blob', lambda key: fetched.append(key) or VALUE)
+
+    # the segment is not read from another host, even with the same name here
+    assert shm_store.read(descriptor) is None
+    assert p2p_store._resolve(shm_store.encode_descriptor(descriptor)) == VALUE
+    assert fetched == ['fallback-key']
+
+    # without an uploaded fallback (local mode), the value is not readable
+    descriptor['fallback'] = None
+    assert p2p_store._resolve(shm_store.encode_descriptor(descriptor)) is None
+
+
+def test_hybrid_mode_uploads_the_fallback(shm_dir, monkeypatch):
+    uploaded = dict()
+
+    def kv_set_blob(value, namespace=None):
+        key = f'key-{len(uploaded)}'
+        uploaded[key] = bytes(value)
+        return key
+
+    monkeypatch.setattr(p2p_store, 'SHM_MODE', 'hybrid')
+    monkeypatch.setattr(p2p_store, 'kv_set_blob', kv_set_blob)
+
+    key = p2p_store._set_shared(VALUE, ('job', 'cluster', 0), None)
+
+    descriptor = shm_store.decode_descriptor(uploaded[key])
+    assert uploaded[descriptor['fallback']] == VALUE
+    assert shm_store.read(descriptor) == VALUE
+
+
+def test_segments_are_released_with_their_rounds(shm_dir):
+    descriptors = [shm_store.publish(bytes([round_num]) * 100, ('job', 'cluster', round_num))
+                   for round_num in range(3)]
+    other_job = shm_store.publish(b'other' * 20, ('other', 'cluster', 0))
+
+    # the kvstore keeps the previous round of round 3, so rounds 0 and 1 are released
+    shm_store.release_before(('job', 'cluster', 3))
+
+    assert [os.path.exists(shm_dir / descriptor['name']) for descriptor in descriptors] == [False, False, True]
+    assert shm_store.read(descriptors[0]) is None
+    assert shm_store.read(other_job) == b'other' * 20
+
+    shm_store.release_all('job')
+    assert not os.path.exists(shm_dir / descriptors[2]['name'])
+    assert os.path.exists(shm_dir / other_job['name'])
+
+
+def test_shared_segment_outlives_one_release(shm_dir):
+    # published by two nodes of the same host, for different rounds
+    descriptor = shm_store.publish(VALUE, ('job', 'cluster', 0))
+    shm_store.publish(VALUE, ('job', 'cluster', 2))
+
+    shm_store.release_before(('job', 'cluster', 2))
+
+    assert refcount(shm_dir, descriptor) == 1
+    assert shm_store.read(descriptor) == VALUE
@@ -0,0 +1,95 @@
+'''
+Tests of the flat tensor container of the strategy payloads
+'''
+import numpy as np
+import pytest
+import torch
+from base import tensor_container
+
+
+def make_payload() -> dict:
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(8, 4), torch.nn.BatchNorm1d(4))
+
+    return {'local_model': model, 'coefs': [np.arange(6, dtype=np.float64).reshape(2, 3)],
+            'counts': torch.arange(5), 'round': 3, 'name': 'client-0'}
+
+
+def test_round_trip():
+    payload = make_payload()
+
+    decoded = tensor_container.decode(tensor_container.encode(payload))
+
+    assert decoded['round'] == 3 and decoded['name'] == 'client-0'
+    assert torch.equal(decoded['counts'], payload['counts'])
+    np.testing.assert_array_equal(decoded['coefs'][0], payload['coefs'][0])
+
+    for name, value in payload['local_model'].state_dict().items():
+        assert torch.equal(decoded['local_model'].state_dict()[name], value)
+        assert decoded['local_model'].state_dict()[name].dtype == value.dtype
+
+
+def test_shared_tensors_are_stored_once():
+    tensor = torch.ones(16)
+
+    decoded = tensor_container.decode(tensor_container.encode({'a': tensor, 'b': tensor}))
+
+    assert decoded['a'] is decoded['b']
+
+
+@pytest.mark.parametrize('precision, tolerance', [('fp16', 1e-3), ('bf16', 1e-2), ('int8', 2e-2)])
+def test_transport_precision(precision, tolerance):
+    weights = torch.linspace(-1, 1, 1000)
+    stats = dict()
+
+    encoded = tensor_container.encode({'weights': weights, 'steps': torch.arange(3)}, precision, stats=stats)
+    decoded = tensor_container.decode(encoded)
+
+    # restored to their dtype, within the precision of the transport dtype
+    assert decoded['weights'].dtype == torch.float32
+    assert torch.allclose(decoded['weights'], weights, atol=tolerance)
+    assert stats['encoded_bytes'] < stats['raw_bytes']
+
+    # integer tensors are not reduced
+    assert torch.equal(decoded['steps'], torch.arange(3))
+
+
+def test_error_feedback_carries_the_residual():
+    weights = torch.full((100,), 0.1234567)
+    residuals = dict()
+
+    first = tensor_container.decode(tensor_container.encode({'w': weights}, 'int8', residuals))
+    second = tensor_container.decode(tensor_container.encode({'w': weights}, 'int8', residuals))
+
+    # the error of the first encode is fed into the second one
+    assert torch.allclose((first['w'] + second['w']) / 2, weights, atol=1e-3)
+
+
+def test_read_only_decode_does_not_copy():
+    buffer = tensor_container.encode({'weights': torch.arange(16, dtype=torch.float32)})
+
+    decoded = tensor_container.decode(buffer, writable=False)
+    address = np.frombuffer(buffer, dtype=np.uint8).ctypes.data
+
+    assert address <= decoded['weights'].data_ptr() < address + len(buffer)
+
+
+def test_writable_decode_copies_read_only_buffers():
+    buffer = tensor_container.encode({'weights': torch.zeros(16), 'array': np.zeros(4)})
+
+    decoded = tensor_container.decode(buffer)
+    decoded['weights'].add_(1)
+    decoded['array'] += 1
+
+    # the buffer is left as it was
+    again = tensor_container.decode(buffer, writable=False)
+    assert torch.equal(again['weights'], torch.zeros(16))
+    np.testing.assert_array_equal(again['array'], np.zeros(4))
+
+
+def test_writable_buffers_are_decoded_in_place():
+    buffer = bytearray(tensor_container.encode({'weights': torch.zeros(16)}))
+
+    tensor_container.decode(buffer)['weights'].add_(1)
+
+    assert torch.equal(tensor_container.decode(buffer)['weights'], torch.ones(16))
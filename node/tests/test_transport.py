@@ -0,0 +1,169 @@
+'''
+Tests of the shared HTTP transport, with a stubbed adapter in place of the network
+'''
+import os
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from urllib3.exceptions import NewConnectionError
+from helpers import transport
+
+
+class StubAdapter(BaseAdapter):
+    '''
+    Adapter replaying a script of outcomes, a status code or an exception to raise
+    '''
+
+    def __init__(self, outcomes: list):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.sent = list()
+
+    def send(self, request, **kwargs):
+        self.sent.append(request.method)
+        outcome = self.outcomes.pop(0)
+
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        reply = requests.Response()
+        reply.status_code = outcome
+        reply.request = request
+        return reply
+
+    def close(self):
+        pass
+
+
+class Refused(object):
+    # the reason of a connection which was never established
+    reason = NewConnectionError(None, 'Connection refused')
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    '''
+    Route the requests through a StubAdapter, without sleeping between the retries
+    '''
+    def make(outcomes: list) -> StubAdapter:
+        adapter = StubAdapter(outcomes)
+        session = requests.Session()
+        session.mount('http://', adapter)
+
+        monkeypatch.setattr(transport, 'get_session', lambda url: session)
+        return adapter
+
+    monkeypatch.setattr(transport, 'sleep', lambda delay: None)
+    monkeypatch.setattr(transport, 'MAX_RETRIES', 3)
+
+    return make
+
+
+def test_get_is_retried_on_connection_errors(stub):
+    adapter = stub([requests.ConnectionError('reset'), requests.Timeout('timeout'), 200])
+
+    assert transport.request('GET', 'http://host/route').status_code == 200
+    assert adapter.sent == ['GET'] * 3
+
+
+def test_get_is_retried_on_gateway_errors(stub):
+    adapter = stub([503, 502, 200])
+
+    assert transport.request('GET', 'http://host/route').status_code == 200
+    assert len(adapter.sent) == 3
+
+
+def test_retries_are_bounded(stub):
+    adapter = stub([requests.ConnectionError('reset')] * 4)
+
+    with pytest.raises(requests.ConnectionError):
+        transport.request('GET', 'http://host/route')
+
+    assert len(adapter.sent) == 4
+
+
+def test_post_is_not_retried_once_sent(stub):
+    adapter = stub([requests.ConnectionError('reset'), 200])
+
+    with pytest.raises(requests.ConnectionError):
+        transport.request('POST', 'http://host/route', json={})
+
+    assert adapter.sent == ['POST']
+
+    # nor on a gateway error, the app may have served it
+    adapter = stub([503, 200])
+    assert transport.request('POST', 'http://host/route', json={}).status_code == 503
+
+
+def test_post_is_retried_if_never_sent(stub):
+    adapter = stub([requests.ConnectionError(Refused()), 200])
+
+    assert transport.request('POST', 'http://host/route', json={}).status_code == 200
+    assert adapter.sent == ['POST', 'POST']
+
+
+def test_idempotent_post_is_retried(stub):
+    adapter = stub([requests.ConnectionError('reset'), 503, 200])
+
+    assert transport.request('POST', 'http://host/route', idempotent=True, data=b'').status_code == 200
+    assert len(adapter.sent) == 3
+
+
+def test_backoff_is_bounded(monkeypatch):
+    monkeypatch.setattr(transport, 'BACKOFF_BASE', 0.1)
+    monkeypatch.setattr(transport, 'BACKOFF_MAX', 1.0)
+
+    assert all(0 <= transport.backoff(attempt) <= min(1.0, 0.1 * 2 ** attempt) for attempt in range(10))
+
+
+def test_unix_url_mapping():
+    assert transport.unix_url('unix:///tmp/flsim/logicon.sock/job/get_config?job_name=a') == \
+        'http+unix://%2Ftmp%2Fflsim%2Flogicon.sock/job/get_config?job_name=a'
+
+    with pytest.raises(ValueError):
+        transport.unix_url('unix:///tmp/flsim/logicon/job/get_config')
+
+
+def test_sessions_are_per_process(monkeypatch):
+    session = transport.get_session('http://host:1234/route')
+
+    assert transport.get_session('http://host:1234/other') is session
+    assert transport.get_session('http://host:4321/route') is not session
+
+    # a forked job process gets its own session
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert transport.get_session('http://host:1234/route') is not session
+
+
+def test_request_over_unix_socket(tmp_path):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = self.path.encode('utf8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    socket_path = str(tmp_path / 'service.sock')
+    server = Server(socket_path, Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        reply = transport.request('GET', f'unix://{socket_path}/route', params={'key': 'a'})
+
+        assert reply.status_code == 200
+        assert reply.text == '/route?key=a'
+    finally:
+        server.shutdown()
+        server.server_close()
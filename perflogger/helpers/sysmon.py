@@ -58,10 +58,11 @@ def get_network_usage():
     Make an HTTP Request to get network usage from kvstore
     '''
 
-    url = f'{P2PSTORE_URL}/size'
-
+    # sum up the sizes of all the kvstore shards
     try:
-        size = get(url, {})['size']
+        size = 0
+        for url in P2PSTORE_URL.split(','):
+            size += get(f'{url.strip()}/size', {})['size']
     except:
         size = -1
 
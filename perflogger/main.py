@@ -7,14 +7,20 @@ from dotenv import load_dotenv
 from waitress import serve
 from flask import Flask, jsonify, request
 from perflog import PerformanceLog
+from helpers.compression import GzipRequestMiddleware
+from helpers.unix_socket import serve_unix_socket
 
 # import environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+# accept gzip request bodies (e.g., the global params)
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app)
+
 WRITE_LOCK = threading.Lock()
 LISTEN_PORT = int(os.getenv('LISTEN_PORT'))
+UNIX_SOCKET = os.getenv('UNIX_SOCKET', '')
 
 PROJECTS = {}
 
@@ -72,6 +78,29 @@ def add_record():
     return jsonify({'res': 200})
 
 
+@app.route('/add_transport_record', methods=['POST'])
+def add_transport_record():
+    '''
+    Add a payload transport (bytes saved) record.
+    '''
+    payload = request.get_json()
+
+    job_name = payload['job_name']
+    cluster_id = payload['cluster_id']
+    node_id = payload['node_id']
+    node_type = payload['node_type']
+    round_num = payload['round_num']
+    stats = payload['stats']
+
+    WRITE_LOCK.acquire()
+
+    PROJECTS[job_name].add_transport_log(
+        cluster_id, node_id, node_type, round_num, stats)
+
+    WRITE_LOCK.release()
+    return jsonify({'res': 200})
+
+
 @app.route('/add_params', methods=['POST'])
 def add_params():
     '''
@@ -126,5 +155,9 @@ def terminate():
 
 
 if __name__ == '__main__':
+    # also listen on a unix socket, for the nodes on this host
+    if UNIX_SOCKET:
+        serve_unix_socket(app, UNIX_SOCKET)
+
     app.run(port=LISTEN_PORT, debug=False, host='0.0.0.0')
     # serve(app, host="0.0.0.0", port=LISTEN_PORT)
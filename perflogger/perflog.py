@@ -17,6 +17,7 @@ class PerformanceLog(object):
     def __init__(self, project_name: str, config: str) -> None:
         self.project_name = project_name
         self.perflogs = []
+        self.transport_logs = []
         self.config = config
 
         self.metric_names = None
@@ -63,6 +64,16 @@ class PerformanceLog(object):
         self.perflogs.append(self._metrics_to_csvline(
             cluster_id, node_id, node_type, round_num, epoch_num, metrics, time_delta))
 
+    def add_transport_log(self, cluster_id: str, node_id: str, node_type: str, round_num: int, stats: dict) -> None:
+        '''
+        Add a Transport Log Row (payload bytes before and after the transport precision)
+        '''
+        raw_bytes = stats['raw_bytes'] if 'raw_bytes' in stats else 0
+        encoded_bytes = stats['encoded_bytes'] if 'encoded_bytes' in stats else 0
+
+        self.transport_logs.append(
+            f'{cluster_id},{node_id},{node_type},{round_num},{raw_bytes},{encoded_bytes},{raw_bytes - encoded_bytes}\n')
+
     def save(self):
         '''
         Save the Performance Log
@@ -70,6 +81,9 @@ class PerformanceLog(object):
 
         self._save_perflog()
 
+        if len(self.transport_logs) > 0:
+            self._save_transport_log()
+
     def save_params(self, round_num: int, params: dict):
         '''
         Save the Global Model Parameters
@@ -136,6 +150,18 @@ class PerformanceLog(object):
         write_file('perflog.csv', self.project_path,
                    csv_string)
 
+    def _save_transport_log(self) -> None:
+        '''
+        Save the Transport Log as a CSV file
+        '''
+
+        csv_string = 'cluster_id,node_id,node_type,global_round,raw_bytes,encoded_bytes,bytes_saved\n'
+        for line in self.transport_logs:
+            csv_string += line
+
+        write_file('transport.csv', self.project_path,
+                   csv_string)
+
     def _save_config(self) -> None:
         '''
         Save the configuration and execution states of the job
@@ -1,8 +1,8 @@
 '''
 Implementation of FedAvg Aggregator for Server Aggregation.
 '''
-import copy
 import torch
+from templates.modules.aggregator.flat_buffer import flatten, weighted_sum_flat, unflatten
 
 
 def aggregator(model, client_params: list, client_weights: list, extra_data: dict, device='cpu', kwargs=None):
@@ -18,60 +18,27 @@ def aggregator(model, client_params: list, client_weights: list, extra_data: dic
 
     with torch.no_grad():
 
-        # get the current global parameters
+        # get the current global parameters, as a flat buffer
         global_params = model.state_dict()
+        global_flat = flatten(global_params, device)
 
-        # define the next global parameters
-        new_global_params = copy.deepcopy(global_params)  # Create a deep copy
-
-        # also create the gradient
-        gradient = copy.deepcopy(global_params)
-
-        # Initialize global parameters to zeros
-        for param_name, param in new_global_params.items():
-            param = param.to(device)
-            param.zero_()
-
-        # Initialize v_momentum to zero if not already in extradata
-        if 'fedavgm_vmom' not in extra_data:
-            v_momenutm = copy.deepcopy(global_params)
-            for param_name, param in v_momenutm.items():
-                param = param.to(device)
-                param.zero_()
-        else:
-            v_momenutm = extra_data[EXTRADATA_V]
-
-        # Aggregate client updates (basically FedAvg)
-        for client_state_dict, weight in zip(client_params, client_weights):
-            for param_name, param in client_state_dict.items():
-                # move client param to gpu
-                param = param.to(device)
-
-                new_global_params[param_name] += (weight * param).type(
-                    new_global_params[param_name].dtype)
+        # Aggregate client updates (basically FedAvg), as a single stacked reduction
+        new_global_flat = weighted_sum_flat(client_params, client_weights, device)
 
         # compute the gradient (dw = w_old - w_new)
-        for param_name, param in new_global_params.items():
-            global_params[param_name] = global_params[param_name].to(device)
-
-            gradient[param_name] = torch.sub(
-                global_params[param_name], new_global_params[param_name])
+        gradient = global_flat - new_global_flat
 
-        # compute new v_momentum (v = beta.v + dw)
-        for param_name, param in v_momenutm.items():
-            v_momenutm[param_name] = torch.add((beta * param).type(
-                new_global_params[param_name].dtype), gradient[param_name])
+        # compute new v_momentum (v = beta.v + dw), v is zero if not already in extra_data
+        if EXTRADATA_V not in extra_data:
+            v_flat = gradient
+        else:
+            v_flat = beta * flatten(extra_data[EXTRADATA_V], device) + gradient
 
         # update v_momentum in extra_data
-        extra_data[EXTRADATA_V] = v_momenutm
-
-        # compute new global parameters (w_new = w_old - v)
-        for param_name, param in new_global_params.items():
-            new_global_params[param_name] = torch.sub(
-                global_params[param_name], v_momenutm[param_name])
+        extra_data[EXTRADATA_V] = unflatten(v_flat, global_params)
 
-        # finally set new aggregated global parameters
-        model.load_state_dict(new_global_params)
+        # finally set new aggregated global parameters (w_new = w_old - v)
+        model.load_state_dict(unflatten(global_flat - v_flat, global_params))
 
     return model
 
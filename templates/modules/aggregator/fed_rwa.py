@@ -1,13 +1,18 @@
 '''
-Implementation of FedAvg Aggregator for Server Aggregation.
+Implementation of FedRWA Aggregator for Server Aggregation.
 '''
-import copy
 import torch
+from templates.modules.aggregator.flat_buffer import weighted_sum
+
+# eps of the norms in the cosine similarity, as in torch.nn.CosineSimilarity
+COSINE_EPS = 1e-8
 
 
 def aggregator(model, client_params: list, client_weights: list, extra_data: dict, device='cpu', kwargs=None):
     """
-    Performs weighted sum of the client parameters, and returns the new model. 
+    Re-weights the clients by the similarity of their parameters with each other (local)
+    and with the global parameters (global), then performs weighted sum of the client
+    parameters, and returns the new model.
     """
 
     # if any extra_data and keyword arguments are passed
@@ -19,75 +24,69 @@ def aggregator(model, client_params: list, client_weights: list, extra_data: dic
         # get the model parameters
         global_params = model.state_dict()
 
-        cos = torch.nn.CosineSimilarity(dim=0)
-        cos.to(device)
-
-        # compute the local similarities of client parameters
-        sim_l = [0.0 for _ in client_params]
-        for m, theta_m in enumerate(client_params):
-            for i, theta_i in enumerate(client_params):
-                # skip if m and i client are same
-                if m == i:
-                    continue
-
-                # compute the similarity of theta_m with theta_i
-                sim, layers = 0.0, 0
-                for param_name, param in theta_m.items():
-                    param = param.to(device)
-                    theta_i[param_name] = theta_i[param_name].to(device)
-
-                    if torch.is_floating_point(param):
-                        simt = cos(torch.unsqueeze(torch.flatten(param), dim=-1),
-                                   torch.unsqueeze(torch.flatten(theta_i[param_name]), dim=-1))
-                        sim += simt.item()
-                        layers += 1
-
-                sim /= float(layers)
-                sim_l[m] += sim
-            sim_l[m] /= float(len(client_params)-1)
+        sim_pairs, sim_global = layer_similarities(
+            client_params, global_params, device)
+
+        n_clients = len(client_params)
+
+        # compute the local similarities of client parameters (excluding self-similarity)
+        sim_l = (sim_pairs.sum(dim=1) - sim_pairs.diagonal()) / \
+            float(max(n_clients - 1, 1))
 
         # compute the global similarity of the client parameters
-        sim_g = [0.0 for _ in client_params]
-        for m, theta_m in enumerate(client_params):
-            # compute the similarity of theta_m with theta_i
-            sim, layers = 0.0, 0
-            for param_name, param in theta_m.items():
-                global_params[param_name] = global_params[param_name].to(
-                    device)
-
-                if torch.is_floating_point(param):
-                    simt = cos(torch.unsqueeze(torch.flatten(param), dim=-1),
-                               torch.unsqueeze(torch.flatten(global_params[param_name]), dim=-1))
-                    sim += simt.item()
-                    layers += 1
-
-            sim /= float(layers)
-            sim_g[m] += sim
+        sim_g = sim_global
 
         # merge similarity vectors
-        sim_t = [(lambda_l*sl)+(lambda_g*sg) for sl, sg in zip(sim_l, sim_g)]
+        sim_t = [(lambda_l*sl)+(lambda_g*sg)
+                 for sl, sg in zip(sim_l.tolist(), sim_g.tolist())]
         new_weights = [sim*w for sim, w in zip(sim_t, client_weights)]
         nw_sum = sum(new_weights)
         new_weights = [float(w)/nw_sum for w in new_weights]
 
         print(client_weights, new_weights)
 
-        new_global_params = copy.deepcopy(global_params)  # Create a deep copy
+        # Aggregate client updates, as a single stacked weighted sum
+        new_global_params = weighted_sum(client_params, new_weights, device)
 
-        # Initialize global parameters to zeros
-        for param_name, param in new_global_params.items():
-            param = param.to(device)
-            param.zero_()
+        model.load_state_dict(new_global_params)
 
-        # Aggregate client updates
-        for client_state_dict, weight in zip(client_params, new_weights):
-            for param_name, param in client_state_dict.items():
-                # move client param to gpu
-                param = param.to(device)
+    return model
 
-                new_global_params[param_name] += (weight * param).type(
-                    new_global_params[param_name].dtype)
 
-        model.load_state_dict(new_global_params)
+def layer_similarities(client_params: list, global_params: dict, device='cpu'):
+    '''
+    Compute the layer-averaged cosine similarities of the client parameters,
+    with each other (a [clients, clients] matrix) and with the global parameters
+    (a [clients] vector). The flattened client tensors of each floating point layer
+    are stacked once, and all the cosines of the layer come out of a normalized
+    Gram matrix, and of a matrix-vector product with the global layer.
+    The client and global parameters are left untouched.
+    '''
+    n_clients = len(client_params)
 
-    return model
+    sim_pairs = torch.zeros((n_clients, n_clients),
+                            dtype=torch.float64, device=device)
+    sim_global = torch.zeros(n_clients, dtype=torch.float64, device=device)
+
+    layers = 0
+    for param_name, param in client_params[0].items():
+        if not torch.is_floating_point(param):
+            continue
+
+        # [clients, layer size] stack of the flattened client tensors
+        stacked = torch.stack([theta[param_name].to(device).reshape(-1)
+                               for theta in client_params])
+        global_vector = global_params[param_name].to(
+            device, stacked.dtype).reshape(-1)
+
+        norms = stacked.norm(dim=1).clamp_min(COSINE_EPS)
+        global_norm = global_vector.norm().clamp_min(COSINE_EPS)
+
+        gram = stacked @ stacked.T
+        sim_pairs += (gram / (norms[:, None] * norms[None, :])).double()
+        sim_global += ((stacked @ global_vector) /
+                       (norms * global_norm)).double()
+
+        layers += 1
+
+    return sim_pairs / float(layers), sim_global / float(layers)
@@ -0,0 +1,480 @@
+'''
+Flat-buffer Aggregation Engine, shared by the FedAvg style aggregators.
+
+Each client state_dict is copied into one row of a contiguous [clients, numel] buffer,
+laid out as per a layout cached by the names, shapes and dtypes of the entries.
+The weighted sum is then a single (weights @ buffer) reduction, and the result is
+split back into the state_dict once. Integer entries (e.g., num_batches_tracked)
+are summed in the floating point accumulation dtype and truncated back.
+
+For streaming aggregation, the accumulators fold the clients one at a time into a
+running flat sum, so only one client state is held at a time. For sharded aggregation,
+a [start, end) range of the flat layout is summed instead of all of it, and for the digest
+consensus only a seeded random sample of its coordinates.
+
+In the deterministic mode, the weighted clients are summed pairwise in a fixed tree, which
+only depends on the number of clients (folded in a canonical order), so every worker gets
+the same bits for the same clients.
+'''
+import numpy
+import torch
+
+# bytes of the [clients, numel] buffer, beyond which the clients are reduced in blocks
+WORKSPACE_BYTES = 256 * 1024 * 1024
+
+# layouts keyed by the (name, shape, dtype) signature of the state_dicts
+_layouts = dict()
+
+
+class FlatLayout(object):
+    '''
+    Flat Layout Class, the offset of every state_dict entry in the flat buffer,
+    and the reusable workspace buffer of the reductions
+    '''
+
+    def __init__(self, signature: tuple):
+        self.names = [name for name, _, _ in signature]
+        self.shapes = [shape for _, shape, _ in signature]
+        self.dtypes = [dtype for _, _, dtype in signature]
+
+        self.sizes = [int(numpy.prod(shape, dtype=numpy.int64)) for shape in self.shapes]
+
+        self.offsets, self.numel = [], 0
+        for size in self.sizes:
+            self.offsets.append(self.numel)
+            self.numel += size
+
+        # float64 entries are accumulated in float64, everything else in float32
+        self.acc_dtype = torch.float64 if torch.float64 in self.dtypes else torch.float32
+
+        self.workspace = None
+
+    def get_workspace(self, rows: int, device) -> torch.Tensor:
+        '''
+        Get a [rows, numel] buffer, reusing the one of the previous rounds if it fits
+        '''
+        workspace = self.workspace
+        if workspace is None or workspace.shape[0] < rows or workspace.device != torch.device(device):
+            workspace = torch.empty(
+                (rows, self.numel), dtype=self.acc_dtype, device=device)
+            self.workspace = workspace
+
+        return workspace[:rows]
+
+    def flatten(self, state_dict: dict, out: torch.Tensor) -> torch.Tensor:
+        '''
+        Copy the entries of a state_dict into a flat buffer
+        '''
+        for name, offset, size in zip(self.names, self.offsets, self.sizes):
+            out[offset:offset + size].copy_(state_dict[name].reshape(-1))
+
+        return out
+
+    def spans(self, start: int, end: int) -> list:
+        '''
+        Get the (name, offset, size) of the entries overlapping the [start, end) slice
+        '''
+        return [(name, offset, size) for name, offset, size in zip(self.names, self.offsets, self.sizes)
+                if offset < end and offset + size > start]
+
+    def gathers(self, indices: torch.Tensor) -> list:
+        '''
+        Get the (name, positions, local indices) of the entries holding the given (sorted)
+        indices of the flat layout, positions are the places of the indices in the sample
+        '''
+        offsets = torch.as_tensor(self.offsets, dtype=torch.int64)
+        entries = torch.searchsorted(offsets, indices, right=True) - 1
+
+        gathers = list()
+        for entry in torch.unique(entries).tolist():
+            positions = torch.nonzero(entries == entry).reshape(-1)
+            gathers.append((self.names[entry], positions,
+                            indices[positions] - self.offsets[entry]))
+
+        return gathers
+
+    def unflatten(self, flat: torch.Tensor) -> dict:
+        '''
+        Split a flat buffer into a state_dict, with the original dtypes
+        '''
+        state_dict = dict()
+        for name, offset, size, shape, dtype in zip(self.names, self.offsets, self.sizes, self.shapes, self.dtypes):
+            state_dict[name] = flat[offset:offset + size].view(shape).to(dtype)
+
+        return state_dict
+
+
+class PairwiseSum(object):
+    '''
+    Fixed-order pairwise sum of the values pushed in order. As in a binary counter, the sums
+    of two groups of the same size are merged as soon as both are complete, so the summation
+    tree only depends on the number of values, and at most log2(count) + 1 sums are held.
+    '''
+
+    def __init__(self, add):
+        # add(left, right) returns a new sum
+        self.add = add
+        self.partials = list()
+
+    def push(self, value) -> None:
+        '''
+        Add the next value, merging the completed groups
+        '''
+        size = 1
+        while len(self.partials) > 0 and self.partials[-1][0] == size:
+            left_size, left = self.partials.pop()
+            value = self.add(left, value)
+            size += left_size
+
+        self.partials.append((size, value))
+
+    def result(self):
+        '''
+        Get the sum of the values, the groups are added from the last one back to the first
+        '''
+        total = None
+        for _, value in reversed(self.partials):
+            total = value if total is None else self.add(value, total)
+
+        return total
+
+
+class FlatAccumulator(object):
+    '''
+    Running weighted sum of state_dicts (with the same layout), in a flat buffer.
+    With a [start, end) range, only that slice of the flat layout is summed (sharded aggregation),
+    and with pairwise, the weighted state_dicts are summed in a fixed pairwise tree (deterministic mode).
+    '''
+
+    def __init__(self, device='cpu', start=0, end=None, pairwise=False):
+        self.device = device
+        self.start = start
+        self.end = end
+        self.layout = None
+        self.total = None
+        self.count = 0
+
+        self.pairwise = PairwiseSum(torch.add) if pairwise else None
+        self.row = None
+
+    def fold(self, state_dict: dict, weight: float) -> None:
+        '''
+        Add the weighted state_dict (or its slice) to the running sum
+        '''
+        layout = get_layout(state_dict)
+
+        if self.layout is None:
+            self.__set_layout(layout)
+        elif layout is not self.layout:
+            raise ValueError(
+                'Cannot fold a state_dict with a different layout into the running sum')
+
+        if self.start == 0 and self.end == layout.numel:
+            row = layout.get_workspace(1, self.device)[0]
+            layout.flatten(state_dict, row)
+        else:
+            if self.row is None:
+                self.row = torch.empty_like(self.total)
+            row = self.row
+
+            # only the parts of the entries which overlap the slice
+            for name, offset, size in layout.spans(self.start, self.end):
+                lower, upper = max(self.start, offset), min(self.end, offset + size)
+                row[lower - self.start:upper - self.start].copy_(
+                    state_dict[name].reshape(-1)[lower - offset:upper - offset])
+
+        if self.pairwise is not None:
+            # the product is rounded on its own, and not fused into the sum
+            self.pairwise.push(torch.mul(row, float(weight)))
+        else:
+            self.total.add_(row, alpha=float(weight))
+
+        self.count += 1
+
+    def result_flat(self, like: dict = None) -> torch.Tensor:
+        '''
+        Get the running sum (of the slice) as a flat buffer,
+        if no state_dict was folded, zeros in the layout of like
+        '''
+        if self.count == 0:
+            self.__set_empty(like)
+        elif self.pairwise is not None:
+            return self.pairwise.result()
+
+        return self.total
+
+    def result(self, like: dict = None) -> dict:
+        '''
+        Get the running sum as a state_dict,
+        if no state_dict was folded, zeros in the layout of like
+        '''
+        result = self.result_flat(like)
+
+        return self.layout.unflatten(result)
+
+    def __set_layout(self, layout: FlatLayout) -> None:
+        '''
+        Set the layout of the running sum, and allocate its (zero) flat buffer
+        '''
+        self.layout = layout
+        self.end = layout.numel if self.end is None else self.end
+        self.total = torch.zeros(
+            self.end - self.start, dtype=layout.acc_dtype, device=self.device)
+
+    def __set_empty(self, like: dict) -> None:
+        '''
+        Set the layout of an empty running sum (of an empty round) from a reference state_dict
+        '''
+        if self.layout is None:
+            if like is None:
+                raise ValueError(
+                    'No state_dict was folded into the running sum, and no reference state_dict to get its layout from')
+
+            self.__set_layout(get_layout(like))
+
+
+class SampledAccumulator(object):
+    '''
+    Running weighted sum of a sample of the coordinates of state_dicts (with the same layout),
+    given by their (sorted) indices in the flat layout. With pairwise, the weighted samples are
+    summed in the same fixed pairwise tree as a pairwise FlatAccumulator, so the sum is the same
+    bits as the sampled coordinates of the full sum (digest consensus).
+    '''
+
+    def __init__(self, indices: torch.Tensor, device='cpu', pairwise=False):
+        self.device = device
+        self.indices = indices
+        self.layout = None
+        self.gathers = None
+        self.total = None
+        self.count = 0
+
+        self.pairwise = PairwiseSum(torch.add) if pairwise else None
+        self.row = None
+
+    def fold(self, state_dict: dict, weight: float) -> None:
+        '''
+        Add the weighted sampled coordinates of the state_dict to the running sum
+        '''
+        layout = get_layout(state_dict)
+
+        if self.layout is None:
+            self.__set_layout(layout)
+        elif layout is not self.layout:
+            raise ValueError(
+                'Cannot fold a state_dict with a different layout into the running sum')
+
+        if self.pairwise is not None:
+            if self.row is None:
+                self.row = torch.empty_like(self.total)
+
+            for name, positions, local_indices in self.gathers:
+                part = state_dict[name].reshape(-1)[local_indices.to(state_dict[name].device)]
+                self.row[positions.to(self.device)] = part.to(self.device, layout.acc_dtype)
+
+            # the product is rounded on its own, and not fused into the sum
+            self.pairwise.push(torch.mul(self.row, float(weight)))
+        else:
+            for name, positions, local_indices in self.gathers:
+                part = state_dict[name].reshape(-1)[local_indices.to(state_dict[name].device)]
+
+                self.total.index_add_(0, positions.to(self.device),
+                                      part.to(self.device, layout.acc_dtype), alpha=float(weight))
+
+        self.count += 1
+
+    def result_flat(self, like: dict = None) -> torch.Tensor:
+        '''
+        Get the running sum of the sampled coordinates, rounded to the dtypes of their entries
+        (e.g., integer entries truncated back), as they are in the aggregated state_dict.
+        If no state_dict was folded, zeros in the layout of like
+        '''
+        if self.layout is None:
+            if like is None:
+                raise ValueError(
+                    'No state_dict was folded into the running sum, and no reference state_dict to get its layout from')
+
+            self.__set_layout(get_layout(like))
+
+        if self.pairwise is not None and self.count > 0:
+            result = self.pairwise.result()
+        else:
+            result = self.total.clone()
+
+        for name, positions, _ in self.gathers:
+            dtype = self.layout.dtypes[self.layout.names.index(name)]
+            if dtype != result.dtype:
+                positions = positions.to(self.device)
+                result[positions] = result[positions].to(dtype).to(result.dtype)
+
+        return result
+
+    def __set_layout(self, layout: FlatLayout) -> None:
+        '''
+        Set the layout of the running sum, and allocate its (zero) buffer of the sampled coordinates
+        '''
+        self.layout = layout
+        self.gathers = layout.gathers(self.indices)
+        self.total = torch.zeros(
+            len(self.indices), dtype=layout.acc_dtype, device=self.device)
+
+
+class ArrayAccumulator(object):
+    '''
+    Running weighted sum of lists of numpy arrays (with the same shapes),
+    with pairwise, summed in a fixed pairwise tree (deterministic mode)
+    '''
+
+    def __init__(self, pairwise=False):
+        self.total = None
+        self.count = 0
+
+        self.pairwise = PairwiseSum(lambda left, right: [
+            left_array + right_array for left_array, right_array in zip(left, right)]) if pairwise else None
+
+    def fold(self, arrays: list, weight: float) -> None:
+        '''
+        Add the weighted arrays to the running sum
+        '''
+        if self.pairwise is not None:
+            self.pairwise.push([weight * numpy.asarray(array) for array in arrays])
+        elif self.total is None:
+            self.total = [weight * numpy.asarray(array) for array in arrays]
+        else:
+            for total, array in zip(self.total, arrays):
+                total += weight * numpy.asarray(array)
+
+        self.count += 1
+
+    def result(self, like: list = None) -> list:
+        '''
+        Get the running sum of the arrays,
+        if no arrays were folded, zeros in the shapes of like
+        '''
+        if self.count == 0:
+            if like is None:
+                raise ValueError(
+                    'No arrays were folded into the running sum, and no reference arrays to get their shapes from')
+
+            return [numpy.zeros_like(numpy.asarray(array, dtype=float)) for array in like]
+
+        if self.pairwise is not None:
+            return self.pairwise.result()
+
+        return self.total
+
+
+def get_layout(state_dict: dict) -> FlatLayout:
+    '''
+    Get the (cached) layout of a state_dict
+    '''
+    signature = tuple((name, tuple(param.shape), param.dtype)
+                      for name, param in state_dict.items())
+
+    layout = _layouts.get(signature)
+    if layout is None:
+        layout = FlatLayout(signature)
+        _layouts[signature] = layout
+
+    return layout
+
+
+def shard_range(numel: int, index: int, count: int) -> tuple:
+    '''
+    Get the [start, end) slice of the flat layout aggregated by the index-th of count shards
+    '''
+    return index * numel // count, (index + 1) * numel // count
+
+
+def sample_indices(numel: int, seed: int, count: int) -> torch.Tensor:
+    '''
+    Get a seeded random sample of (at most count, sorted and unique) indices of a flat layout,
+    the same on every node for the same seed
+    '''
+    indices = numpy.random.default_rng(seed).integers(0, numel, size=count)
+
+    return torch.from_numpy(numpy.unique(indices).astype(numpy.int64))
+
+
+def gather(state_dict: dict, indices: torch.Tensor, device='cpu') -> torch.Tensor:
+    '''
+    Get the coordinates of a state_dict at the given (sorted) indices of its flat layout,
+    in the accumulation dtype, without flattening all of it
+    '''
+    layout = get_layout(state_dict)
+    out = torch.empty(len(indices), dtype=layout.acc_dtype, device=device)
+
+    for name, positions, local_indices in layout.gathers(indices):
+        part = state_dict[name].reshape(-1)[local_indices.to(state_dict[name].device)]
+        out[positions.to(device)] = part.to(device, layout.acc_dtype)
+
+    return out
+
+
+def flatten(state_dict: dict, device='cpu') -> torch.Tensor:
+    '''
+    Flatten a state_dict into a new buffer, in the accumulation dtype
+    '''
+    layout = get_layout(state_dict)
+    out = torch.empty(layout.numel, dtype=layout.acc_dtype, device=device)
+
+    return layout.flatten(state_dict, out)
+
+
+def weighted_sum_flat(state_dicts: list, weights: list, device='cpu') -> torch.Tensor:
+    '''
+    Get the weighted sum of state_dicts (with the same layout) as a flat buffer
+    '''
+    layout = get_layout(state_dicts[0])
+
+    # bound the buffer, reducing the clients in blocks if needed
+    row_bytes = layout.numel * torch.empty((), dtype=layout.acc_dtype).element_size()
+    block = max(1, min(len(state_dicts), WORKSPACE_BYTES // max(row_bytes, 1)))
+
+    weights = torch.as_tensor(
+        [float(weight) for weight in weights], dtype=layout.acc_dtype, device=device)
+
+    result = None
+    for start in range(0, len(state_dicts), block):
+        chunk = state_dicts[start:start + block]
+        stacked = layout.get_workspace(len(chunk), device)
+
+        for row, state_dict in zip(stacked, chunk):
+            layout.flatten(state_dict, row)
+
+        partial = torch.matmul(weights[start:start + len(chunk)], stacked)
+        result = partial if result is None else result.add_(partial)
+
+    return result
+
+
+def weighted_sum(state_dicts: list, weights: list, device='cpu') -> dict:
+    '''
+    Get the weighted sum of state_dicts (with the same layout) as a state_dict
+    '''
+    layout = get_layout(state_dicts[0])
+
+    return layout.unflatten(weighted_sum_flat(state_dicts, weights, device))
+
+
+def unflatten(flat: torch.Tensor, like: dict) -> dict:
+    '''
+    Split a flat buffer into a state_dict, with the layout of another state_dict
+    '''
+    return get_layout(like).unflatten(flat)
+
+
+def weighted_sum_arrays(arrays_list: list, weights: list) -> list:
+    '''
+    Get the weighted sum of lists of numpy arrays (e.g., the coef_ and intercept_
+    of sklearn models), with one stacked reduction
+    '''
+    shapes = [numpy.shape(array) for array in arrays_list[0]]
+    sizes = [int(numpy.prod(shape, dtype=numpy.int64)) for shape in shapes]
+
+    stacked = numpy.stack([numpy.concatenate([numpy.ravel(array) for array in arrays])
+                           for arrays in arrays_list])
+    flat = numpy.asarray(weights, dtype=stacked.dtype) @ stacked
+
+    return [part.reshape(shape) for part, shape in
+            zip(numpy.split(flat, numpy.cumsum(sizes)[:-1]), shapes)]
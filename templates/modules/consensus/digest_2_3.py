@@ -0,0 +1,78 @@
+'''
+Digest 2/3 Consensus
+Only the proposer worker uploads its aggregated model, along with the digest of its coordinates
+at seeded random indices. The verifier workers aggregate only these coordinates, and send their
+digests instead of a model. The proposed parameter (hash) is selected if the digests of at least
+2/3rd of all the workers agree with it. Workers which cannot compute a digest send their full
+parameter (hash) instead, which agrees if it is the same as the proposed one.
+
+In the digest consensus mode, the workers aggregate in the deterministic mode (the clients folded
+in the canonical order, with fixed-order pairwise sums), so the sampled coordinates of the verifiers
+are the same bits as the ones of the proposed model, and the digests are compared exactly.
+'''
+from collections import Counter
+
+
+def consensus(params: list, extra_datas: list) -> str:
+    '''
+    Digest 2/3 Consensus
+    '''
+
+    # the proposed param is the one sent along with a digest
+    proposed = [i for i, (param, extra_data) in enumerate(zip(params, extra_datas))
+                if param is not None and get_digest(extra_data) is not None]
+
+    if len(proposed) > 0:
+        proposed_param = params[proposed[0]]
+        proposed_digest = get_digest(extra_datas[proposed[0]])
+    else:
+        # without digests (strategies which cannot compute them), the most common param is proposed
+        submitted = [param for param in params if param is not None]
+        if len(submitted) == 0:
+            raise ValueError('No proposed parameter among the worker params')
+
+        proposed_param = Counter(submitted).most_common(1)[0][0]
+        proposed_digest = None
+
+    agreements = 0
+    for param, extra_data in zip(params, extra_datas):
+        digest = get_digest(extra_data)
+
+        if digest is not None and proposed_digest is not None:
+            agreements += 1 if digests_match(digest, proposed_digest) else 0
+        else:
+            agreements += 1 if param == proposed_param else 0
+
+    print("Digest Agreements", f'{agreements}/{len(params)}')
+
+    if 3 * agreements < 2 * len(params):
+        raise ValueError(
+            f'Proposed parameter [{proposed_param}] rejected, only {agreements}/{len(params)} workers agree')
+
+    # the digest is not passed on with the global extra data
+    extra_data = extra_datas[params.index(proposed_param)]
+    if get_digest(extra_data) is not None:
+        extra_data = {key: value for key, value in extra_data.items() if key != 'digest'}
+        extra_data = extra_data if len(extra_data) > 0 else None
+
+    return proposed_param, extra_data
+
+
+def get_digest(extra_data) -> dict:
+    '''
+    Get the digest {seed, count, values} of a worker's extra data, if any
+    '''
+
+    return extra_data['digest'] if isinstance(extra_data, dict) and 'digest' in extra_data else None
+
+
+def digests_match(digest: dict, other: dict) -> bool:
+    '''
+    Check if two digests are of the same sample, and their values are exactly the same
+    '''
+
+    if digest['seed'] != other['seed'] or digest['count'] != other['count'] \
+            or len(digest['values']) != len(other['values']):
+        return False
+
+    return digest['values'] == other['values']
@@ -3,10 +3,10 @@ Base learning strategy module
 '''
 import io
 import base64
-from typing import Any
-from copy import deepcopy
+from typing import Any, Union
 import torch
 from templates.dataset.base.dataset_base import DatasetBase
+from templates.strategy.base import tensor_container
 
 
 class LearnStrategyBase(object):
@@ -14,6 +14,19 @@ class LearnStrategyBase(object):
     Base class for learning strategies for DistLearn Framework
     '''
 
+    # the attributes exported in the payload of each role (local for clients, global for workers),
+    # strategies with extra state to share (like control variates) override this
+    payload_fields = {
+        'local': ['local_model'],
+        'global': ['global_model']
+    }
+
+    # whether the aggregation can be split in disjoint slices of the parameters across the workers
+    supports_sharding = False
+
+    # whether the aggregated model can be summarized by a digest of sampled coordinates
+    supports_digest = False
+
     def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
         # model attributes
         self.global_model = None
@@ -32,6 +45,16 @@ class LearnStrategyBase(object):
         self.client_extra_params = hyperparams['client_extra_params'] if 'client_extra_params' in hyperparams else None
         self.worker_extra_params = hyperparams['worker_extra_params'] if 'worker_extra_params' in hyperparams else None
 
+        # transport precision of the payloads {precision, error_feedback}, set per job
+        self._transport_params = hyperparams['transport_params'] if 'transport_params' in hyperparams else None
+        # quantization residuals of the local uploads, fed back into the next upload
+        self._transport_residuals = dict()
+        # tensor byte counts of the last encoded payload
+        self._transport_stats = dict()
+
+        # deterministic aggregation (canonical client order, fixed-order pairwise sums), set per job
+        self._deterministic = hyperparams['deterministic'] if 'deterministic' in hyperparams else False
+
         # dataset_object =
         self.dataset = DatasetBase(dataset_params)
         self._train_set = None
@@ -41,6 +64,11 @@ class LearnStrategyBase(object):
         self.is_local = is_local
         self.device = device
 
+        # slice {index, count} of the parameters aggregated by this worker, in the sharded mode
+        self._shard = None
+        # sample {seed, count} of the coordinates aggregated by this worker, in the digest consensus
+        self._sample = None
+
         if base64_state is not None:
             self.load_base64_state(base64_state)
 
@@ -90,67 +118,69 @@ class LearnStrategyBase(object):
 
         raise NotImplementedError
 
-    def get_local_payload(self):
+    def begin_round(self, shard: Union[dict, None] = None, sample: Union[dict, None] = None) -> None:
         '''
-        Method to get the local client payload for export
+        Method to start the incremental aggregation of a round.
+        By default the client objects are collected and aggregated on finalize,
+        strategies with a running accumulator override begin_round, fold and finalize.
+        The shard {index, count} is the slice of the parameters to aggregate in the sharded mode,
+        the sample {seed, count} is the set of coordinates to aggregate by a digest verifier.
         '''
 
-        with torch.no_grad():
-            payload = dict()
-            for key, value in self.__dict__.items():
-                # remove private and protected fields
-                if not key.startswith('_'):
-                    payload[key] = deepcopy(value)
+        self._shard = shard
+        self._sample = sample
+        self.client_objects = list()
+        self.client_weights = list()
 
-        # delete the unnecessary fields
-        del payload['global_model']
-        del payload['prev_local_model']
+    def fold(self, client_payload: Any, client_weight: float) -> None:
+        '''
+        Method to fold a client payload (base64 string or raw bytes) into the aggregation
+        '''
 
-        del payload['client_objects']
-        del payload['client_weights']
+        self.append_client_object(client_payload, client_weight)
 
-        del payload['learning_rate']
-        del payload['train_batch_size']
-        del payload['test_batch_size']
-        del payload['train_epochs']
-        del payload['client_extra_params']
-        del payload['worker_extra_params']
+    def finalize(self) -> None:
+        '''
+        Method to finish the aggregation of the round, and set the global model
+        '''
 
-        del payload['is_local']
-        del payload['device']
+        self.aggregate()
 
-        return payload
+    def get_bytes_partial_payload(self) -> bytes:
+        '''
+        Method to get raw bytes of the aggregated slice of the parameters, in the sharded mode
+        '''
+
+        raise NotImplementedError
 
-    def get_global_payload(self):
+    def load_partial_payloads(self, partial_payloads: list) -> None:
         '''
-        Method to get the global worker payload for export
+        Method to stitch the aggregated slices of all the workers into the global model
         '''
 
-        with torch.no_grad():
-            payload = dict()
-            for key, value in self.__dict__.items():
-                # remove private and protected fields
-                if not key.startswith('_'):
-                    payload[key] = deepcopy(value)
+        raise NotImplementedError
 
-        # delete the unnecessary fields
-        del payload['local_model']
-        del payload['prev_local_model']
+    def get_digest(self, sample: dict) -> dict:
+        '''
+        Method to get the digest {seed, count, values} of the aggregated model,
+        its coordinates at the sample {seed, count}, for the digest consensus
+        '''
 
-        del payload['client_objects']
-        del payload['client_weights']
+        raise NotImplementedError
 
-        del payload['learning_rate']
-        del payload['train_batch_size']
-        del payload['test_batch_size']
-        del payload['train_epochs']
-        del payload['client_extra_params']
-        del payload['worker_extra_params']
+    def get_local_payload(self) -> dict:
+        '''
+        Method to get the local client payload for export
+        '''
 
-        del payload['is_local']
-        del payload['device']
+        return self._get_payload('local')
 
-        return payload
+    def get_global_payload(self) -> dict:
+        '''
+        Method to get the global worker payload for export
+        '''
+
+        return self._get_payload('global')
 
     def get_base64_local_payload(self):
         '''
@@ -174,16 +204,86 @@ class LearnStrategyBase(object):
 
         return b64_payload
 
-    def load_base64_state(self, base64_state: str):
+    def get_bytes_local_payload(self) -> bytes:
+        '''
+        Get raw bytes of the local payload for export
+        '''
+
+        payload = self.get_local_payload()
+
+        # error feedback only applies to the client uploads
+        if self._transport_params is not None and 'error_feedback' in self._transport_params \
+                and self._transport_params['error_feedback']:
+            return self.__bytes_encode(payload, self._transport_residuals)
+
+        return self.__bytes_encode(payload)
+
+    def get_bytes_global_payload(self) -> bytes:
+        '''
+        Get raw bytes of the global payload for export
+        '''
+
+        payload = self.get_global_payload()
+
+        return self.__bytes_encode(payload)
+
+    def decode_payload(self, payload: Union[str, bytes], writable=True) -> dict:
         '''
-        Load the Object state from the base64 string of pickled __dict__
+        Decode a payload from its base64 string (or raw bytes), without loading it,
+        payloads decoded with writable off must not be modified in place
         '''
 
-        state_dict = self.__base64_decode(base64_state)
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            return self.__bytes_decode(payload, writable)
+
+        return self.__base64_decode(payload)
+
+    def load_base64_state(self, base64_state: Union[str, bytes, dict]):
+        '''
+        Load the Object state from the base64 string (or raw bytes) of pickled __dict__,
+        or from an already decoded payload
+        '''
+
+        if isinstance(base64_state, dict):
+            state_dict = base64_state
+        else:
+            state_dict = self.decode_payload(base64_state)
 
         for key, value in state_dict.items():
             self.__dict__[key] = value
 
+    def get_transport_stats(self) -> dict:
+        '''
+        Get the raw and encoded tensor byte counts of the last exported payload
+        '''
+
+        return dict(self._transport_stats)
+
+    def _get_payload(self, role: str) -> dict:
+        '''
+        Collect the payload fields of a role, straight from the live attributes (no copies),
+        the serialization reads the tensors from their storage
+        '''
+
+        payload = dict()
+        for field in self.payload_fields[role]:
+            payload[field] = self.__dict__[field] if field in self.__dict__ else None
+
+        return payload
+
+    def _decode_client_state(self, client_payload: Any) -> dict:
+        '''
+        Decode a client payload for folding, without loading it into an object,
+        a missing local model falls back to the global model (as in pre-aggregation)
+        '''
+
+        client_state = self.decode_payload(client_payload, writable=False)
+
+        if 'local_model' not in client_state or client_state['local_model'] is None:
+            client_state['local_model'] = client_state['global_model'] if 'global_model' in client_state else None
+
+        return client_state
+
     def _pre_aggregation(self):
         '''
         Pre-aggregation Checks and Actions
@@ -203,37 +303,56 @@ class LearnStrategyBase(object):
         self.client_weights = list()
 
     # @staticmethod
-    def __base64_encode(self, obj: Any) -> str:
+    def __bytes_encode(self, obj: Any, residuals: Union[dict, None] = None) -> bytes:
+        '''
+        Static function to serialize an object to bytes as a flat tensor container,
+        at the transport precision of the job
+        '''
+
+        precision = None
+        if self._transport_params is not None and 'precision' in self._transport_params:
+            precision = self._transport_params['precision']
+
+        self._transport_stats = dict()
+
+        with torch.no_grad():
+            obj_bytes = tensor_container.encode(
+                obj, precision, residuals, self._transport_stats)
+
+        return obj_bytes
+
+    # @staticmethod
+    def __bytes_decode(self, obj_bytes: bytes, writable=True) -> Any:
         '''
-        Static function to Base 64 encode an object using torch.save pickling
+        Static function to deserialize bytes to object, the tensors are views over the bytes
+        (copied out of read-only bytes only if writable)
         '''
 
-        # create a bytes stream
-        buff = io.BytesIO()
+        # payloads from older nodes are still torch.save pickles
+        if not tensor_container.is_container(obj_bytes):
+            return torch.load(io.BytesIO(obj_bytes), map_location=self.device)
 
-        # save the state dict into the stream
-        torch.save(obj, buff)
+        return tensor_container.decode(obj_bytes, self.device, writable)
 
-        # move the stream seek to intial position
-        buff.seek(0)
+    # @staticmethod
+    def __base64_encode(self, obj: Any) -> str:
+        '''
+        Static function to Base 64 encode an object as a flat tensor container
+        '''
 
-        # convert into a string of base64 representation form thte bytes stream
-        b64_payload = base64.b64encode(buff.read()).decode("utf8")
+        # convert into a string of base64 representation form the serialized bytes
+        b64_payload = base64.b64encode(self.__bytes_encode(obj)).decode("utf8")
 
         return b64_payload
 
     # @staticmethod
     def __base64_decode(self, base64str: str) -> Any:
         '''
-        Static function to decode a Base 64 string to object using torch.load unpickling
+        Static function to decode a Base 64 string to object
         '''
         # encode the string into base64
         obj_data = base64str.encode()
         # apply base64 decode to obtain bytes
         obj_bytes = base64.b64decode(obj_data)
 
-        # converts into bytes stream and load using torch.load
-        obj = torch.load(io.BytesIO(obj_bytes),
-                         map_location=self.device)
-
-        return obj
+        return self.__bytes_decode(obj_bytes)
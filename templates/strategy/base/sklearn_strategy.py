@@ -1,8 +1,10 @@
 '''
 DistLearn Strategy for SKLearn Workflow
 '''
+import numpy
 import torch
 from templates.strategy.base.learn_strategy import LearnStrategyBase
+from templates.modules.aggregator.flat_buffer import sample_indices
 from templates.dataset.base.sklearn_dataset_base import SKLearnDatasetBase
 
 
@@ -11,6 +13,9 @@ class SKLearnStrategyBase(LearnStrategyBase):
     Class for Strategy Base for SKLearn-based training
     '''
 
+    # the global model is summarized by sampled coordinates of its flattened coef_ and intercept_
+    supports_digest = True
+
     def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
         super().__init__(hyperparams, dataset_params, is_local, device, base64_state)
 
@@ -52,6 +57,17 @@ class SKLearnStrategyBase(LearnStrategyBase):
 
         raise NotImplementedError
 
+    def get_digest(self, sample: dict) -> dict:
+        '''
+        Get the digest of the aggregated global model, i.e., its coordinates at the sample
+        '''
+        flat = numpy.concatenate([numpy.ravel(self.global_model.coef_),
+                                  numpy.ravel(self.global_model.intercept_)])
+        indices = sample_indices(flat.size, sample['seed'], sample['count']).numpy()
+
+        return {'seed': sample['seed'], 'count': sample['count'],
+                'values': flat[indices].astype(numpy.float64).tolist()}
+
     @staticmethod
     def __get_metrics(actuals: list, preds: list) -> dict:
         '''
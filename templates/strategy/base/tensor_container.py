@@ -0,0 +1,354 @@
+'''
+Flat Tensor Container for Strategy Payloads
+
+A container is laid out as
+    preamble | header (JSON) | skeleton (pickle) | padding | tensor data
+The header lists the name, dtype, shape, offset and size of every tensor and array,
+the skeleton is the pickled payload with the tensors and arrays replaced by references
+to the header entries, and the raw tensor bytes follow, each aligned to ALIGNMENT bytes.
+
+Readers rebuild the tensors with torch.frombuffer / numpy.frombuffer straight out of
+the received buffer (or an mmap), so no tensor bytes are copied on decode. Only if the
+decoded tensors are to be written to (e.g., trained in place) and the buffer is read-only
+(e.g., cached), each tensor is copied out of it on its own.
+
+Floating point tensors can be shipped at a lower transport precision (fp16, bf16, or
+int8 with a per-tensor scale and zero-point), they are restored to their dtype on decode.
+'''
+import io
+import json
+import pickle
+import struct
+import warnings
+from typing import Any, Union
+import numpy as np
+import torch
+
+# preamble: magic, format version, header length, skeleton length
+PREAMBLE_FORMAT = '!4sBQQ'
+PREAMBLE_SIZE = struct.calcsize(PREAMBLE_FORMAT)
+CONTAINER_MAGIC = b'FTC1'
+CONTAINER_VERSION = 1
+
+# alignment (in bytes) of the data section and of every tensor in it
+ALIGNMENT = 64
+
+# transport precisions and their storage dtypes, fp32 (or None) keeps the tensors as they are
+TRANSPORT_DTYPES = {'fp16': torch.float16, 'bf16': torch.bfloat16, 'int8': torch.int8}
+
+# dtypes which are reduced to the transport precision
+QUANTIZABLE_DTYPES = (torch.float32, torch.float64)
+
+
+class _ContainerPickler(pickle.Pickler):
+    '''
+    Pickler which moves tensors and arrays out of the pickle stream into the container
+    '''
+
+    def __init__(self, file, names: dict, precision: Union[str, None], residuals: Union[dict, None]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.names = names
+        self.precision = precision
+        self.residuals = residuals
+        self.raw_size = 0
+        self.entries = list()
+        self.blobs = list()
+        self.indices = dict()
+        self.data_size = 0
+
+    def persistent_id(self, obj):
+        if isinstance(obj, torch.Tensor):
+            if obj.layout != torch.strided or obj.is_quantized:
+                return None
+            kind = 'parameter' if isinstance(obj, torch.nn.Parameter) else 'tensor'
+            dtype = str(obj.dtype).split('.')[-1]
+        elif type(obj) is np.ndarray:
+            if obj.dtype.hasobject or obj.dtype.names is not None:
+                return None
+            kind = 'ndarray'
+            dtype = obj.dtype.str
+        else:
+            return None
+
+        # the same object referenced twice is stored once
+        if id(obj) in self.indices:
+            return ('tensor_container', self.indices[id(obj)])
+
+        name = self.names[id(obj)] if id(obj) in self.names else f'tensor_{len(self.entries)}'
+
+        entry = {
+            'name': name,
+            'kind': kind,
+            'dtype': dtype,
+            'shape': list(obj.shape),
+            'offset': self.data_size
+        }
+        if kind == 'parameter':
+            entry['requires_grad'] = obj.requires_grad
+
+        if kind == 'ndarray':
+            array = np.ascontiguousarray(obj)
+            self.raw_size += array.nbytes
+
+            if self.precision in TRANSPORT_DTYPES and array.dtype in (np.float32, np.float64):
+                blob = self.__quantize(name, torch.from_numpy(array), entry)
+                blob = blob.reshape(-1).view(torch.uint8).numpy()
+            else:
+                blob = array.reshape(-1).view(np.uint8)
+        else:
+            tensor = obj.detach().cpu().contiguous()
+            self.raw_size += tensor.numel() * tensor.element_size()
+
+            if self.precision in TRANSPORT_DTYPES and tensor.dtype in QUANTIZABLE_DTYPES:
+                tensor = self.__quantize(name, tensor, entry)
+
+            blob = tensor.reshape(-1).view(torch.uint8).numpy()
+
+        entry['nbytes'] = int(blob.nbytes)
+
+        self.indices[id(obj)] = len(self.entries)
+        self.entries.append(entry)
+        self.blobs.append(blob)
+        self.data_size += _align(entry['nbytes'])
+
+        return ('tensor_container', self.indices[id(obj)])
+
+    def __quantize(self, name: str, tensor: torch.Tensor, entry: dict) -> torch.Tensor:
+        '''
+        Reduce a tensor to the transport precision, recording the encoding in its entry.
+        With error feedback, the residual of the previous encode is added back first,
+        and the new quantization error is kept for the next one.
+        '''
+        if self.residuals is not None and name in self.residuals and self.residuals[name].shape == tensor.shape:
+            tensor = tensor + self.residuals[name]
+
+        entry['encoding'] = self.precision
+
+        if self.precision == 'int8':
+            low = min(tensor.min().item(), 0.0) if tensor.numel() > 0 else 0.0
+            high = max(tensor.max().item(), 0.0) if tensor.numel() > 0 else 0.0
+
+            scale = (high - low) / 255.0
+            if scale == 0.0:
+                scale = 1.0
+            zero_point = int(-128 - round(low / scale))
+
+            encoded = torch.clamp(torch.round(tensor / scale) + zero_point,
+                                  -128, 127).to(torch.int8)
+
+            entry['scale'] = scale
+            entry['zero_point'] = zero_point
+        else:
+            encoded = tensor.to(TRANSPORT_DTYPES[self.precision])
+
+        if self.residuals is not None:
+            self.residuals[name] = tensor - _dequantize(encoded, entry, tensor.dtype)
+
+        return encoded
+
+
+class _ContainerUnpickler(pickle.Unpickler):
+    '''
+    Unpickler which rebuilds the tensors and arrays as views over the container buffer
+    '''
+
+    def __init__(self, file, buffer, data_offset: int, entries: list, device: str, copy: bool):
+        super().__init__(file)
+        self.buffer = buffer
+        self.data_offset = data_offset
+        self.entries = entries
+        self.device = device
+        self.copy = copy
+        self.objects = dict()
+
+    def persistent_load(self, pid):
+        tag, index = pid
+        if tag != 'tensor_container':
+            raise pickle.UnpicklingError(f'Unknown persistent id [{tag}]')
+
+        if index not in self.objects:
+            self.objects[index] = self.__rebuild(self.entries[index])
+
+        return self.objects[index]
+
+    def __rebuild(self, entry: dict):
+        offset = self.data_offset + entry['offset']
+
+        if entry['kind'] == 'ndarray' and 'encoding' not in entry:
+            dtype = np.dtype(entry['dtype'])
+            if entry['nbytes'] == 0:
+                return np.empty(entry['shape'], dtype=dtype)
+            array = np.frombuffer(self.buffer, dtype=dtype, count=entry['nbytes'] // dtype.itemsize,
+                                  offset=offset).reshape(entry['shape'])
+            return array.copy() if self.copy else array
+
+        # quantized entries are stored in their transport dtype
+        if 'encoding' in entry:
+            dtype = TRANSPORT_DTYPES[entry['encoding']]
+        else:
+            dtype = getattr(torch, entry['dtype'])
+
+        if entry['nbytes'] == 0:
+            tensor = torch.empty(entry['shape'], dtype=dtype)
+        else:
+            with warnings.catch_warnings():
+                # read-only buffers are only written to through the copies below
+                warnings.filterwarnings('ignore', message='The given buffer is not writable')
+                tensor = torch.frombuffer(self.buffer, dtype=dtype,
+                                          count=entry['nbytes'] // torch.empty((), dtype=dtype).element_size(),
+                                          offset=offset).reshape(entry['shape'])
+
+        if 'encoding' in entry:
+            if entry['kind'] == 'ndarray':
+                return _dequantize(tensor, entry, torch.float64).numpy().astype(np.dtype(entry['dtype']), copy=False)
+            tensor = _dequantize(tensor, entry, getattr(torch, entry['dtype']))
+        elif self.copy and self.device == 'cpu':
+            tensor = tensor.clone()
+
+        if self.device != 'cpu':
+            tensor = tensor.to(self.device)
+
+        if entry['kind'] == 'parameter':
+            return torch.nn.Parameter(tensor, requires_grad=entry['requires_grad'])
+
+        return tensor
+
+
+def is_container(buffer: Union[bytes, bytearray, memoryview]) -> bool:
+    '''
+    Check if a buffer holds a tensor container
+    '''
+    return len(buffer) >= PREAMBLE_SIZE and bytes(buffer[:4]) == CONTAINER_MAGIC
+
+
+def encode(obj: Any, precision: Union[str, None] = None, residuals: Union[dict, None] = None,
+           stats: Union[dict, None] = None) -> bytes:
+    '''
+    Serialize an object into a tensor container, optionally reducing the floating point
+    tensors to a transport precision (fp16, bf16 or int8). If a residuals dict is given,
+    the quantization error is fed back into the next encode (error feedback), and
+    the stats dict (if given) is filled with the raw and encoded tensor byte counts.
+    '''
+    if precision not in (None, 'fp32') and precision not in TRANSPORT_DTYPES:
+        raise ValueError(f'Unknown transport precision [{precision}]')
+
+    names = dict()
+    _collect_names(obj, '', names, set())
+
+    stream = io.BytesIO()
+    pickler = _ContainerPickler(stream, names, precision, residuals)
+    pickler.dump(obj)
+    skeleton = stream.getvalue()
+
+    header = json.dumps({'entries': pickler.entries}).encode('utf8')
+    data_offset = _align(PREAMBLE_SIZE + len(header) + len(skeleton))
+
+    parts = [struct.pack(PREAMBLE_FORMAT, CONTAINER_MAGIC, CONTAINER_VERSION, len(header), len(skeleton)),
+             header, skeleton, bytes(data_offset - PREAMBLE_SIZE - len(header) - len(skeleton))]
+
+    for entry, blob in zip(pickler.entries, pickler.blobs):
+        parts.append(memoryview(blob).cast('B'))
+        parts.append(bytes(_align(entry['nbytes']) - entry['nbytes']))
+
+    if stats is not None:
+        stats['raw_bytes'] = pickler.raw_size
+        stats['encoded_bytes'] = sum(entry['nbytes'] for entry in pickler.entries)
+        stats['bytes_saved'] = stats['raw_bytes'] - stats['encoded_bytes']
+
+    return b''.join(parts)
+
+
+def decode(buffer: Union[bytes, bytearray, memoryview], device='cpu', writable=True) -> Any:
+    '''
+    Deserialize an object from a tensor container, the tensors and arrays are views
+    over the buffer. If they are to be written to (the models train in place on them)
+    and the buffer is read-only (like bytes, or a cached value), they are copied out of
+    the buffer one by one. Decoded with writable off, e.g., for aggregation, they must
+    not be modified in place.
+    '''
+    magic, version, header_size, skeleton_size = struct.unpack_from(
+        PREAMBLE_FORMAT, buffer)
+
+    if magic != CONTAINER_MAGIC or version != CONTAINER_VERSION:
+        raise ValueError(
+            f'Not a tensor container (magic {magic}, version {version})')
+
+    view = memoryview(buffer)
+    header = json.loads(
+        bytes(view[PREAMBLE_SIZE:PREAMBLE_SIZE + header_size]))
+    skeleton = view[PREAMBLE_SIZE + header_size:
+                    PREAMBLE_SIZE + header_size + skeleton_size]
+    data_offset = _align(PREAMBLE_SIZE + header_size + skeleton_size)
+
+    unpickler = _ContainerUnpickler(io.BytesIO(skeleton), buffer, data_offset,
+                                    header['entries'], device, writable and view.readonly)
+
+    return unpickler.load()
+
+
+def read_header(buffer: Union[bytes, bytearray, memoryview]) -> list:
+    '''
+    Read the tensor entries (name, kind, dtype, shape, offset, nbytes) of a container,
+    with the offsets made absolute to the start of the buffer
+    '''
+    _, _, header_size, skeleton_size = struct.unpack_from(
+        PREAMBLE_FORMAT, buffer)
+
+    header = json.loads(
+        bytes(buffer[PREAMBLE_SIZE:PREAMBLE_SIZE + header_size]))
+    data_offset = _align(PREAMBLE_SIZE + header_size + skeleton_size)
+
+    for entry in header['entries']:
+        entry['offset'] += data_offset
+
+    return header['entries']
+
+
+def _dequantize(encoded: torch.Tensor, entry: dict, dtype: torch.dtype) -> torch.Tensor:
+    '''
+    Restore a tensor from its transport precision to a dtype
+    '''
+    if entry['encoding'] == 'int8':
+        return ((encoded.to(dtype) - entry['zero_point']) * entry['scale']).to(dtype)
+
+    return encoded.to(dtype)
+
+
+def _collect_names(obj: Any, prefix: str, names: dict, visited: set) -> None:
+    '''
+    Name the tensors and arrays of a payload after their path in it,
+    like local_model.conv1.weight or local_control.fc1.bias
+    '''
+    if id(obj) in visited:
+        return
+
+    if isinstance(obj, (torch.Tensor, np.ndarray)):
+        names[id(obj)] = prefix
+        return
+
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return
+
+    visited.add(id(obj))
+
+    if isinstance(obj, torch.nn.Module):
+        items = obj.state_dict(keep_vars=True).items()
+    elif isinstance(obj, dict):
+        items = obj.items()
+    elif isinstance(obj, (list, tuple)):
+        items = enumerate(obj)
+    elif hasattr(obj, '__dict__'):
+        items = vars(obj).items()
+    else:
+        return
+
+    for key, value in items:
+        _collect_names(value, f'{prefix}.{key}' if prefix else str(key),
+                       names, visited)
+
+
+def _align(size: int) -> int:
+    '''
+    Round a size up to the container alignment
+    '''
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -1,9 +1,13 @@
 '''
 DistLearn Strategy for PyTorch Workflow
 '''
+from typing import Tuple, Union
 import torch
 from templates.strategy.base.learn_strategy import LearnStrategyBase
+from templates.strategy.base import tensor_container
 from templates.dataset.base.torch_dataset_base import TorchDatasetBase
+from templates.modules.aggregator.flat_buffer import get_layout, flatten, unflatten, shard_range, gather, \
+    sample_indices, FlatAccumulator, SampledAccumulator
 
 
 class TorchStrategyBase(LearnStrategyBase):
@@ -11,11 +15,19 @@ class TorchStrategyBase(LearnStrategyBase):
     Class for Strategy Base for PyTorch-based training
     '''
 
+    # the global model can be aggregated in slices of its flat state_dict, and summarized by
+    # its coordinates at sampled indices, strategies which fold into self._new_accumulator() turn these on
+    supports_sharding = False
+    supports_digest = False
+
     def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
         super().__init__(hyperparams, dataset_params, is_local, device, base64_state)
 
         self.dataset = TorchDatasetBase(dataset_params)
 
+        # aggregated slice (or sampled coordinates) of the global model, if not aggregated in full
+        self._partial = None
+
     def load_dataset(self, train_set, test_set):
         '''
         Load the training and testing datasets
@@ -65,6 +77,98 @@ class TorchStrategyBase(LearnStrategyBase):
 
         raise NotImplementedError
 
+    def begin_round(self, shard: Union[dict, None] = None, sample: Union[dict, None] = None) -> None:
+        '''
+        Start the incremental aggregation of a round, for the slice of the shard (if any),
+        or for the sampled coordinates (if any)
+        '''
+        super().begin_round(shard, sample)
+
+        self._partial = None
+
+    def get_bytes_partial_payload(self) -> bytes:
+        '''
+        Get raw bytes of the aggregated slice of the flat global model, strategies which
+        aggregate only their slice set it in self._partial, else it is cut from the global model
+        '''
+        start, end = self._get_shard_range()
+
+        values = self._partial
+        if values is None:
+            values = flatten(self.global_model.state_dict(), self.device)[start:end]
+
+        return tensor_container.encode({'start': start, 'end': end, 'values': values})
+
+    def load_partial_payloads(self, partial_payloads: list) -> None:
+        '''
+        Stitch the aggregated slices of all the workers into the global model
+        '''
+        partials = sorted([self.decode_payload(partial_payload, writable=False) for partial_payload in partial_payloads],
+                          key=lambda partial: partial['start'])
+
+        global_params = self.global_model.state_dict()
+        numel = get_layout(global_params).numel
+
+        # the slices must cover the whole flat global model, without overlaps
+        position = 0
+        for partial in partials:
+            if partial['start'] != position:
+                raise ValueError(
+                    f'Missing or overlapping slices at [{position}] of the global model')
+            position = partial['end']
+
+        if position != numel:
+            raise ValueError(
+                f'The slices cover [{position}] of the [{numel}] global model parameters')
+
+        with torch.no_grad():
+            flat = torch.cat([partial['values'].to(self.device)
+                              for partial in partials])
+            self.global_model.load_state_dict(unflatten(flat, global_params))
+
+        self._partial = None
+
+    def get_digest(self, sample: dict) -> dict:
+        '''
+        Get the digest of the aggregated global model, i.e., its coordinates at the sample,
+        verifiers which aggregated only the sampled coordinates have them in self._partial
+        '''
+        values = self._partial if self._sample == sample else None
+        if values is None:
+            values = gather(self.global_model.state_dict(),
+                            self._get_sample_indices(sample), self.device)
+
+        return {'seed': sample['seed'], 'count': sample['count'], 'values': values.double().tolist()}
+
+    def _new_accumulator(self) -> Union[FlatAccumulator, SampledAccumulator]:
+        '''
+        Get the running weighted sum of a round, over the sampled coordinates for a digest
+        verifier, else over the slice of the shard (all of the parameters, if not sharded)
+        '''
+        if self._sample is not None:
+            return SampledAccumulator(self._get_sample_indices(self._sample), self.device, pairwise=self._deterministic)
+
+        return FlatAccumulator(self.device, *self._get_shard_range(), pairwise=self._deterministic)
+
+    def _get_sample_indices(self, sample: dict) -> torch.Tensor:
+        '''
+        Get the indices of the flat global model sampled by the sample {seed, count}
+        '''
+        numel = get_layout(self.global_model.state_dict()).numel
+
+        return sample_indices(numel, sample['seed'], sample['count'])
+
+    def _get_shard_range(self) -> Tuple[int, int]:
+        '''
+        Get the [start, end) slice of the flat global model aggregated by this worker
+        '''
+        numel = get_layout(self.global_model.state_dict()).numel
+
+        if self._shard is None:
+            return 0, numel
+
+        return shard_range(numel, self._shard['index'], self._shard['count'])
+
     @staticmethod
     def __get_metrics(actuals: list, preds: list) -> dict:
         '''
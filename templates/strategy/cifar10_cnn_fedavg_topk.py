@@ -0,0 +1,264 @@
+'''
+DistLearn Strategy for training CIFAR-10 on a simple CNN,
+using FedAvg Aggregation of Top-k Sparsified Client Updates
+'''
+import math
+import torch
+from sklearn import metrics
+from templates.strategy.base.torch_strategy import TorchStrategyBase
+from templates.dataset.cifar10_torch import CIFAR10Dataset
+from templates.modules.models.tiny_cnn_cifar import CIFAR10SimpleCNN
+
+
+class CIFAR10Strategy(TorchStrategyBase):
+    '''
+    Class for CIFAR-10 using CNN and FedAvg, where the clients upload only the top-k entries
+    (by magnitude) of every tensor of their update (local - global), as index/value pairs.
+    The dropped entries are accumulated into a residual, added to the next round's update.
+
+    The kept fraction of every tensor is set in the client extra_params as
+        top_k:
+          fraction: 0.1
+    '''
+
+    # clients upload their sparse update instead of the local model
+    payload_fields = {
+        'local': ['sparse_update'],
+        'global': ['global_model']
+    }
+
+    # the sparse updates are aggregated in full, with neither the slice of a shard
+    # nor the sampled coordinates of a digest verifier
+    supports_sharding = False
+    supports_digest = False
+
+    def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
+        super().__init__(hyperparams, dataset_params, is_local, device, base64_state)
+
+        self.dataset = CIFAR10Dataset(dataset_params)
+
+        # fraction of every tensor's entries uploaded by the clients
+        self._top_k_fraction = 0.1
+        if self.client_extra_params is not None and 'top_k' in self.client_extra_params:
+            self._top_k_fraction = self.client_extra_params['top_k']['fraction']
+
+        # dropped update entries, carried over to the next round
+        self._residuals = dict()
+
+        if base64_state is None:
+            # init the global model
+            self.global_model = CIFAR10SimpleCNN()
+
+            self.local_model = CIFAR10SimpleCNN()
+            # self.prev_local_model = CIFAR10SimpleCNN()
+
+            # {param_name: {indices, values}} of the flattened update
+            self.sparse_update = dict()
+
+    def parameter_mixing(self) -> None:
+        '''
+        An empty parameter mixing,
+        Basically load the global parameters to the local model
+        '''
+        # move local model to previous local model
+        # self.prev_local_model = self.local_model
+
+        # set the parameters for local as global model
+        self.local_model.load_state_dict(self.global_model.state_dict())
+
+    def train(self) -> None:
+        '''
+        Executes CrossEntropyLoss and Adam based Loop
+        '''
+
+        # move the local_model to the device, cpu or gpu
+        self.local_model = self.local_model.to(self.device)
+
+        criterion = torch.nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(
+            self.local_model.parameters(), lr=self.learning_rate)
+
+        # Epoch loop
+        for epoch in range(self.train_epochs):
+            self.local_model.train()
+            total_loss = 0.0
+
+            for i, (inputs, labels) in enumerate(self._train_set, 1):
+
+                # move tensors to the device, cpu or gpu
+                inputs, labels = inputs.to(self.device), labels.to(self.device)
+
+                optimizer.zero_grad()
+                outputs = self.local_model(inputs)
+                loss = criterion(outputs, labels)
+                loss.backward()
+                optimizer.step()
+                total_loss += loss.item()
+
+                print(
+                    f'Processing Batch {i}/{len(self._train_set)}.', end='\r')
+
+            average_loss = total_loss / len(self._train_set)
+            print(
+                f"Epoch [{epoch + 1}/{self.train_epochs}] - Loss: {average_loss:.4f}")
+
+        self.__sparsify_update()
+
+    def __sparsify_update(self) -> None:
+        '''
+        Keep the top-k entries of the update (local - global + residual) of every tensor,
+        and carry the rest over in the residuals
+        '''
+
+        with torch.no_grad():
+            self.global_model = self.global_model.to(self.device)
+            global_params = self.global_model.state_dict()
+
+            self.sparse_update = dict()
+            for param_name, param in self.local_model.state_dict().items():
+                # integer buffers (like counters) are not averaged
+                if not param.is_floating_point():
+                    continue
+
+                delta = (param - global_params[param_name]).reshape(-1)
+                if param_name in self._residuals:
+                    delta += self._residuals[param_name]
+
+                k = max(1, math.ceil(delta.numel() * self._top_k_fraction))
+                _, indices = torch.topk(delta.abs(), min(k, delta.numel()), sorted=False)
+
+                self.sparse_update[param_name] = {
+                    'indices': indices.to(torch.int32).cpu(),
+                    'values': delta[indices].cpu()
+                }
+
+                # whatever was not uploaded stays in the residual
+                self._residuals[param_name] = delta.index_fill_(0, indices, 0)
+
+    def test(self) -> dict:
+        '''
+        Tests the model using the test loader, and returns the metrics as a dict
+        '''
+
+        # move the model to the device, cpu or gpu and set to evaluation
+        if self.is_local:
+            model = self.local_model.to(self.device)
+        else:
+            model = self.global_model.to(self.device)
+
+        model.eval()
+
+        # the actual labels and predictions lists
+        actuals = []
+        preds = []
+
+        criterion = torch.nn.CrossEntropyLoss()
+
+        with torch.no_grad():
+
+            val_loss = 0.0
+
+            for i, (inputs, labels) in enumerate(self._test_set, 1):
+                # move tensors to the device, cpu or gpu
+                inputs, labels = inputs.to(self.device), labels.to(self.device)
+
+                outputs = model(inputs)
+
+                loss = criterion(outputs, labels)
+                val_loss += loss.item()
+
+                _, predicted = torch.max(outputs.data, 1)
+                # val_total += labels.size(0)
+                # val_correct += (predicted == labels).sum().item()
+
+                actuals += labels.tolist()
+                preds += predicted.tolist()
+
+                print(
+                    f'Processing batch {i} out of {len(self._test_set)}', end='\r')
+
+            average_loss = val_loss / len(self._test_set)
+
+        results = self.__get_metrics(actuals, preds)
+
+        results['loss'] = average_loss if not math.isnan(
+            average_loss) else -420.0
+
+        print(
+            f"Model Test Report:\n{results['classification_report']}\nLoss: {results['loss']}")
+
+        return results
+
+    def aggregate(self):
+        '''
+        Implementaion of the FedAvg Aggregation Algorithm over sparse client updates,
+        the global model moves by the weighted sum of the client updates,
+        without densifying any of them.
+        '''
+        super()._pre_aggregation()
+
+        with torch.no_grad():
+            self.global_model = self.global_model.to(self.device)
+
+            # get the model parameters, these share the storage of the model
+            global_params = self.global_model.state_dict()
+
+            # Add the weighted sparse client updates straight into the global parameters
+            for client_obj, weight in zip(self.client_objects, self.client_weights):
+                for param_name, update in client_obj.sparse_update.items():
+                    flat_param = global_params[param_name].view(-1)
+
+                    flat_param.index_add_(0, update['indices'].to(self.device),
+                                          (weight * update['values'].to(self.device)).type(flat_param.dtype))
+
+        super()._post_aggregation()
+
+    def append_client_object(self, bash64_state: str, client_weight: float) -> None:
+        '''
+        Append client objects from their base64 state strings
+        '''
+
+        self.client_objects.append(CIFAR10Strategy(
+            {}, {}, True, self.device, bash64_state))
+
+        self.client_weights.append(client_weight)
+
+    @staticmethod
+    def __get_metrics(actuals: list, preds: list) -> dict:
+        '''
+        Returns a dictionary of evaluation metrics.
+        accuracy, precision, recall, f-1 score, f-1 macro, f-1 micro, confusion matrix
+        '''
+
+        # print(actuals, preds)
+
+        accuracy = metrics.accuracy_score(actuals, preds)
+        precision_weighted = metrics.precision_score(actuals, preds,
+                                                     average='weighted')
+        precision_macro = metrics.precision_score(actuals, preds,
+                                                  average='macro')
+        recall_weighted = metrics.recall_score(
+            actuals, preds, average='weighted')
+        recall_macro = metrics.recall_score(actuals, preds, average='macro')
+        f1_macro = metrics.f1_score(actuals, preds, average='macro')
+        f1_weighted = metrics.f1_score(actuals, preds, average='weighted')
+        confusion_matrix = metrics.confusion_matrix(actuals, preds).tolist()
+        report = metrics.classification_report(actuals, preds)
+
+        results = {
+            'accuracy': accuracy,
+            'precision_weighted': precision_weighted,
+            'precision_macro': precision_macro,
+            'recall_weighted': recall_weighted,
+            'recall_macro': recall_macro,
+            'f1_macro': f1_macro,
+            'f1_weighted': f1_weighted,
+            'confusion_matrix': confusion_matrix,
+            'classification_report': report
+        }
+
+        return results
+
+
+# Dont forget to set this the alias as 'StrategyDefinition'
+StrategyDefinition = CIFAR10Strategy
@@ -3,12 +3,12 @@ DistLearn Strategy for training CIFAR-10 on a simple CNN,
 using FedAvg Aggregation
 '''
 import math
-from copy import deepcopy
 import torch
 from sklearn import metrics
 from templates.strategy.base.torch_strategy import TorchStrategyBase
 from templates.dataset.cifar10_torch import CIFAR10Dataset
 from templates.modules.models.tiny_cnn_cifar import CIFAR10SimpleCNN
+from templates.modules.aggregator.flat_buffer import flatten, weighted_sum_flat, unflatten, FlatAccumulator
 
 
 class CIFAR10Strategy(TorchStrategyBase):
@@ -143,59 +143,43 @@ class CIFAR10Strategy(TorchStrategyBase):
         with torch.no_grad():
             self.global_model = self.global_model.to(self.device)
 
-            # get the model parameters
-            global_params = self.global_model.state_dict()
+            # Aggregate client updates (basically FedAvg), as a single stacked weighted sum
+            new_global_flat = weighted_sum_flat(
+                [client_obj.local_model.state_dict() for client_obj in self.client_objects],
+                self.client_weights, self.device)
 
-            # define the next global parameters
-            new_global_params = deepcopy(
-                global_params)  # Create a deep copy
+            self.__apply_momentum(new_global_flat)
 
-            # also create the gradient
-            gradient = deepcopy(global_params)
-
-            # Initialize global parameters to zeros
-            for param_name, param in new_global_params.items():
-                param = param.to(self.device)
-                param.zero_()
-
-            # Initialize v_momentum to zero if not already (saves memory at client side)
-            if self.v_momenutm is None:
-                self.v_momenutm = deepcopy(global_params)
-                for param_name, param in self.v_momenutm.items():
-                    param = param.to(self.device)
-                    param.zero_()
-
-            # Aggregate client updates (basically FedAvg)
-            for client_obj, weight in zip(self.client_objects, self.client_weights):
-                client_obj.local_model = client_obj.local_model.to(self.device)
-                client_state_dict = client_obj.local_model.state_dict()
-
-                for param_name, param in client_state_dict.items():
-                    # move client param to gpu
-                    param = param.to(self.device)
+        super()._post_aggregation()
 
-                    new_global_params[param_name] += (weight * param).type(
-                        new_global_params[param_name].dtype)
+    def begin_round(self, shard=None, sample=None) -> None:
+        '''
+        Start the streaming FedAvgM Aggregation of a round, into a running weighted sum
+        '''
+        super().begin_round(shard, sample)
 
-            # compute the gradient (dw = w_old - w_new)
-            for param_name, param in new_global_params.items():
-                global_params[param_name] = global_params[param_name].to(
-                    self.device)
+        self._accumulator = FlatAccumulator(self.device, pairwise=self._deterministic)
 
-                gradient[param_name] = torch.sub(
-                    global_params[param_name], new_global_params[param_name])
+    def fold(self, client_payload, client_weight: float) -> None:
+        '''
+        Fold a client payload into the running weighted sum, the payload is not kept
+        '''
+        client_state = self._decode_client_state(client_payload)
 
-            # compute new v_momentum (v = beta.v + dw)
-            for param_name, param in self.v_momenutm.items():
-                self.v_momenutm[param_name] = torch.add((self.beta * param).type(
-                    new_global_params[param_name].dtype), gradient[param_name])
+        with torch.no_grad():
+            self._accumulator.fold(
+                client_state['local_model'].state_dict(), client_weight)
 
-            # compute new global parameters (w_new = w_old - v)
-            for param_name, param in new_global_params.items():
-                new_global_params[param_name] = torch.sub(
-                    global_params[param_name], self.v_momenutm[param_name])
+    def finalize(self) -> None:
+        '''
+        Apply the server momentum to the running weighted sum of the round
+        '''
+        with torch.no_grad():
+            self.global_model = self.global_model.to(self.device)
+            self.__apply_momentum(self._accumulator.result_flat(
+                self.global_model.state_dict()))
 
-            self.global_model.load_state_dict(new_global_params)
+        self._accumulator = None
 
         super()._post_aggregation()
 
@@ -209,6 +193,30 @@ class CIFAR10Strategy(TorchStrategyBase):
 
         self.client_weights.append(client_weight)
 
+    def __apply_momentum(self, new_global_flat: torch.Tensor) -> None:
+        '''
+        Update the server momentum and the global model from the flat FedAvg of the clients
+        '''
+        # get the current global parameters, as a flat buffer
+        global_params = self.global_model.state_dict()
+        global_flat = flatten(global_params, self.device)
+
+        # compute the gradient (dw = w_old - w_new)
+        gradient = global_flat - new_global_flat
+
+        # compute new v_momentum (v = beta.v + dw), v is zero if not already (saves memory at client side)
+        if self.v_momenutm is None:
+            v_flat = gradient
+        else:
+            v_flat = self.beta * \
+                flatten(self.v_momenutm, self.device) + gradient
+
+        self.v_momenutm = unflatten(v_flat, global_params)
+
+        # compute new global parameters (w_new = w_old - v)
+        self.global_model.load_state_dict(
+            unflatten(global_flat - v_flat, global_params))
+
     @staticmethod
     def __get_metrics(actuals: list, preds: list) -> dict:
         '''
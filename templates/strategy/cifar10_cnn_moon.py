@@ -9,6 +9,7 @@ from sklearn import metrics
 from templates.strategy.base.torch_strategy import TorchStrategyBase
 from templates.dataset.cifar10_torch import CIFAR10Dataset
 from templates.modules.models.tiny_cnn_cifar import CIFAR10SimpleCNN
+from templates.modules.aggregator.flat_buffer import weighted_sum
 
 
 class CIFAR10Strategy(TorchStrategyBase):
@@ -16,6 +17,10 @@ class CIFAR10Strategy(TorchStrategyBase):
     Class for CIFAR-10 using CNN and FedAvg
     '''
 
+    # the round is folded into self._new_accumulator(), over the slice of the shard or the sampled coordinates
+    supports_sharding = True
+    supports_digest = True
+
     def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
         super().__init__(hyperparams, dataset_params, is_local, device, base64_state)
 
@@ -166,23 +171,51 @@ class CIFAR10Strategy(TorchStrategyBase):
         with torch.no_grad():
             self.global_model = self.global_model.to(self.device)
 
-            # get the model parameters
-            global_params = self.global_model.state_dict()
+            # Aggregate client updates, as a single stacked weighted sum
+            global_params = weighted_sum(
+                [client_obj.local_model.state_dict() for client_obj in self.client_objects],
+                self.client_weights, self.device)
 
-            # Initialize global parameters to zeros
-            for param_name, param in global_params.items():
-                param.zero_()
+            self.global_model.load_state_dict(global_params)
 
-            # Aggregate client updates
-            for client_obj, weight in zip(self.client_objects, self.client_weights):
-                client_obj.local_model = client_obj.local_model.to(self.device)
-                client_state_dict = client_obj.local_model.state_dict()
+        super()._post_aggregation()
 
-                for param_name, param in client_state_dict.items():
-                    global_params[param_name] += (weight * param).type(
-                        global_params[param_name].dtype)
+    def begin_round(self, shard=None, sample=None) -> None:
+        '''
+        Start the streaming FedAvg Aggregation of a round, into a running weighted sum
+        (of only the slice of the shard in the sharded mode, or the sampled coordinates
+        of a digest verifier)
+        '''
+        super().begin_round(shard, sample)
 
-            self.global_model.load_state_dict(global_params)
+        self._accumulator = self._new_accumulator()
+
+    def fold(self, client_payload, client_weight: float) -> None:
+        '''
+        Fold a client payload into the running weighted sum, the payload is not kept
+        '''
+        client_state = self._decode_client_state(client_payload)
+
+        with torch.no_grad():
+            self._accumulator.fold(
+                client_state['local_model'].state_dict(), client_weight)
+
+    def finalize(self) -> None:
+        '''
+        Set the global model to the running weighted sum of the round
+        '''
+        with torch.no_grad():
+            self.global_model = self.global_model.to(self.device)
+
+            if self._shard is None and self._sample is None:
+                self.global_model.load_state_dict(self._accumulator.result(self.global_model.state_dict()))
+            else:
+                # only the slice (stitched from the slices of all the workers),
+                # or the sampled coordinates (checked against the digest of the proposer)
+                self._partial = self._accumulator.result_flat(
+                    self.global_model.state_dict())
+
+        self._accumulator = None
 
         super()._post_aggregation()
 
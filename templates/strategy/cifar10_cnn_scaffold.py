@@ -10,6 +10,7 @@ from templates.strategy.base.torch_strategy import TorchStrategyBase
 from templates.dataset.cifar10_torch import CIFAR10Dataset
 from templates.modules.models.tiny_cnn_cifar import CIFAR10SimpleCNN
 from templates.modules.optimizer.scaffold_optimizer import ScaffoldOptimizer
+from templates.modules.aggregator.flat_buffer import weighted_sum, FlatAccumulator
 
 
 class CIFAR10Strategy(TorchStrategyBase):
@@ -17,6 +18,12 @@ class CIFAR10Strategy(TorchStrategyBase):
     Class for CIFAR-10 using CNN and SCAFFOLD
     '''
 
+    # clients share their control delta, and the worker its server control
+    payload_fields = {
+        'local': ['local_model', 'delta_control'],
+        'global': ['global_model', 'server_control']
+    }
+
     def __init__(self, hyperparams: dict, dataset_params: dict, is_local: bool, device='cpu', base64_state=None):
         super().__init__(hyperparams, dataset_params, is_local, device, base64_state)
 
@@ -168,28 +175,60 @@ class CIFAR10Strategy(TorchStrategyBase):
         with torch.no_grad():
             self.global_model = self.global_model.to(self.device)
 
-            # get the model parameters
-            global_params = self.global_model.state_dict()
+            # Aggregate client updates, as a single stacked weighted sum
+            global_params = weighted_sum(
+                [client_obj.local_model.state_dict() for client_obj in self.client_objects],
+                self.client_weights, self.device)
 
-            # Initialize global parameters to zeros
-            for param_name, param in global_params.items():
-                param.zero_()
+            # also the weighted sum of the client control deltas
+            delta_control = weighted_sum(
+                [client_obj.delta_control for client_obj in self.client_objects],
+                self.client_weights, self.device)
 
-            # Aggregate client updates
-            for client_obj, weight in zip(self.client_objects, self.client_weights):
-                client_obj.local_model = client_obj.local_model.to(self.device)
-                client_state_dict = client_obj.local_model.state_dict()
+            for param_name, delta in delta_control.items():
+                self.server_control[param_name] += delta
 
-                for param_name, param in client_state_dict.items():
-                    global_params[param_name] += (weight * param).type(
-                        global_params[param_name].dtype)
+            self.global_model.load_state_dict(global_params)
 
-                    client_obj.delta_control[param_name] = client_obj.delta_control[param_name].to(
-                        self.device)
-                    self.server_control[param_name] += (
-                        weight * client_obj.delta_control[param_name])
+        super()._post_aggregation()
 
-            self.global_model.load_state_dict(global_params)
+    def begin_round(self, shard=None, sample=None) -> None:
+        '''
+        Start the streaming SCAFFOLD Aggregation of a round, into running weighted sums
+        of the client models and of the client control deltas
+        '''
+        super().begin_round(shard, sample)
+
+        self._accumulator = FlatAccumulator(self.device, pairwise=self._deterministic)
+        self._control_accumulator = FlatAccumulator(self.device, pairwise=self._deterministic)
+
+    def fold(self, client_payload, client_weight: float) -> None:
+        '''
+        Fold a client payload into the running weighted sums, the payload is not kept
+        '''
+        client_state = self._decode_client_state(client_payload)
+
+        with torch.no_grad():
+            self._accumulator.fold(
+                client_state['local_model'].state_dict(), client_weight)
+            self._control_accumulator.fold(
+                client_state['delta_control'], client_weight)
+
+    def finalize(self) -> None:
+        '''
+        Set the global model and update the server control from the running weighted sums
+        '''
+        with torch.no_grad():
+            self.global_model = self.global_model.to(self.device)
+
+            for param_name, delta in self._control_accumulator.result(self.server_control).items():
+                self.server_control[param_name] += delta
+
+            self.global_model.load_state_dict(
+                self._accumulator.result(self.global_model.state_dict()))
+
+        self._accumulator = None
+        self._control_accumulator = None
 
         super()._post_aggregation()
 
@@ -239,30 +278,6 @@ class CIFAR10Strategy(TorchStrategyBase):
 
         return results
 
-    def get_local_payload(self):
-        '''
-        Update the local payload, and remove the server_control and local_control
-        '''
-
-        payload = super().get_local_payload()
-
-        del payload['server_control']
-        del payload['local_control']
-
-        return payload
-
-    def get_global_payload(self):
-        '''
-        Update the global payload, and remove the delta_control and local_control
-        '''
-
-        payload = super().get_global_payload()
-
-        del payload['local_control']
-        del payload['delta_control']
-
-        return payload
-
 
 # Dont forget to set this the alias as 'StrategyDefinition'
 StrategyDefinition = CIFAR10Strategy
@@ -6,6 +6,7 @@ from time import sleep
 import numpy as np
 from sklearn import metrics
 from templates.strategy.base.sklearn_strategy import SKLearnStrategyBase
+from templates.modules.aggregator.flat_buffer import weighted_sum_arrays, ArrayAccumulator
 from templates.dataset.cifar10_tensorflow import CIFAR10Dataset
 from sklearn.neural_network import MLPClassifier
 
@@ -124,23 +125,52 @@ class SKLearnCIFAR10(SKLearnStrategyBase):
 
         sleep(2)
 
-        # Aggregate client updates
+        # Aggregate client updates, as a single stacked weighted sum
+        n_coefs = len(self.global_model.coefs_)
+        aggregated = weighted_sum_arrays(
+            [list(client_obj.local_model.coefs_) + list(client_obj.local_model.intercepts_)
+             for client_obj in self.client_objects], self.client_weights)
+
         for i, _ in enumerate(self.global_model.coefs_):
-            self.global_model.coefs_[i] = self.client_weights[0] * \
-                self.client_objects[0].local_model.coefs_[i]
+            self.global_model.coefs_[i] = aggregated[i]
 
         for i, _ in enumerate(self.global_model.intercepts_):
-            self.global_model.intercepts_[i] = self.client_weights[0] * \
-                self.client_objects[0].local_model.intercepts_[i]
+            self.global_model.intercepts_[i] = aggregated[n_coefs + i]
+
+        super()._post_aggregation()
 
-        for client_obj, weight in zip(self.client_objects[1:], self.client_weights[1:]):
-            for i, _ in enumerate(self.global_model.coefs_):
-                self.global_model.coefs_[i] += weight * \
-                    client_obj.local_model.coefs_[i]
+    def begin_round(self, shard=None, sample=None) -> None:
+        '''
+        Start the streaming FedAvg Aggregation of a round, into a running weighted sum
+        '''
+        super().begin_round(shard, sample)
+
+        self._accumulator = ArrayAccumulator(pairwise=self._deterministic)
+
+    def fold(self, client_payload, client_weight: float) -> None:
+        '''
+        Fold a client payload into the running weighted sum, the payload is not kept
+        '''
+        client_state = self._decode_client_state(client_payload)
+
+        self._accumulator.fold(
+            list(client_state['local_model'].coefs_) + list(client_state['local_model'].intercepts_), client_weight)
+
+    def finalize(self) -> None:
+        '''
+        Set the global model to the running weighted sum of the round
+        '''
+        n_coefs = len(self.global_model.coefs_)
+        aggregated = self._accumulator.result(
+            list(self.global_model.coefs_) + list(self.global_model.intercepts_))
+
+        for i, _ in enumerate(self.global_model.coefs_):
+            self.global_model.coefs_[i] = aggregated[i]
+
+        for i, _ in enumerate(self.global_model.intercepts_):
+            self.global_model.intercepts_[i] = aggregated[n_coefs + i]
 
-            for i, _ in enumerate(self.global_model.intercepts_):
-                self.global_model.intercepts_[i] += weight * \
-                    client_obj.local_model.intercepts_[i]
+        self._accumulator = None
 
         super()._post_aggregation()
 
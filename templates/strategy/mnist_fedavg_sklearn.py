@@ -6,6 +6,7 @@ from time import sleep
 import numpy as np
 from sklearn import metrics
 from templates.strategy.base.sklearn_strategy import SKLearnStrategyBase
+from templates.modules.aggregator.flat_buffer import weighted_sum_arrays, ArrayAccumulator
 from templates.dataset.mnist_sklearn import MNISTDataset
 from sklearn.linear_model import LogisticRegression
 
@@ -144,15 +145,38 @@ class SKLearnMNIST(SKLearnStrategyBase):
 
         sleep(2)
 
-        # Aggregate client updates
-        self.global_model.coef_ = self.client_weights[0] * \
-            self.client_objects[0].local_model.coef_
-        self.global_model.intercept_ = self.client_weights[0] * \
-            self.client_objects[0].local_model.intercept_
+        # Aggregate client updates, as a single stacked weighted sum
+        self.global_model.coef_, self.global_model.intercept_ = weighted_sum_arrays(
+            [[client_obj.local_model.coef_, client_obj.local_model.intercept_]
+             for client_obj in self.client_objects], self.client_weights)
 
-        for client_obj, weight in zip(self.client_objects[1:], self.client_weights[1:]):
-            self.global_model.coef_ += weight * client_obj.local_model.coef_
-            self.global_model.intercept_ += weight * client_obj.local_model.intercept_
+        super()._post_aggregation()
+
+    def begin_round(self, shard=None, sample=None) -> None:
+        '''
+        Start the streaming FedAvg Aggregation of a round, into a running weighted sum
+        '''
+        super().begin_round(shard, sample)
+
+        self._accumulator = ArrayAccumulator(pairwise=self._deterministic)
+
+    def fold(self, client_payload, client_weight: float) -> None:
+        '''
+        Fold a client payload into the running weighted sum, the payload is not kept
+        '''
+        client_state = self._decode_client_state(client_payload)
+
+        self._accumulator.fold(
+            [client_state['local_model'].coef_, client_state['local_model'].intercept_], client_weight)
+
+    def finalize(self) -> None:
+        '''
+        Set the global model to the running weighted sum of the round
+        '''
+        self.global_model.coef_, self.global_model.intercept_ = self._accumulator.result(
+            [self.global_model.coef_, self.global_model.intercept_])
+
+        self._accumulator = None
 
         super()._post_aggregation()
 
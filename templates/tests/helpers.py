@@ -0,0 +1,73 @@
+'''
+Client state_dicts shared by the aggregation tests
+'''
+import torch
+
+
+def make_state_dicts(clients: int, seed=0) -> list:
+    '''
+    Get the state_dicts of clients with the same layout,
+    a conv and a batch norm layer (with its integer num_batches_tracked)
+    '''
+    generator = torch.Generator().manual_seed(seed)
+
+    return [{'conv.weight': torch.randn((4, 3, 3, 3), generator=generator),
+             'conv.bias': torch.randn(4, generator=generator),
+             'bn.running_mean': torch.randn(4, generator=generator),
+             'bn.num_batches_tracked': torch.tensor(10 * (i + 1)),
+             'fc.weight': torch.randn((10, 36), generator=generator)}
+            for i in range(clients)]
+
+
+def naive_weighted_sum(state_dicts: list, weights: list) -> dict:
+    '''
+    Weighted sum of the state_dicts, one entry at a time
+    '''
+    return {name: sum(weight * state_dict[name].double() for state_dict, weight in zip(state_dicts, weights))
+            for name in state_dicts[0]}
+
+
+def make_strategy(hyperparams=None):
+    '''
+    Get a worker FedAvg strategy (CIFAR-10 simple CNN) with a seeded global model
+    '''
+    from templates.strategy.cifar10_cnn_fedavg import CIFAR10Strategy
+
+    torch.manual_seed(0)
+
+    return CIFAR10Strategy(hyperparams if hyperparams is not None else {}, {}, False)
+
+
+def make_client_payloads(strategy, clients: int) -> list:
+    '''
+    Get the raw bytes local payloads of clients, whose local models are
+    the global model of the strategy with seeded perturbations
+    '''
+    from templates.strategy.cifar10_cnn_fedavg import CIFAR10Strategy
+
+    payloads, local_models = list(), list()
+    for i in range(clients):
+        torch.manual_seed(i + 1)
+
+        client = CIFAR10Strategy({}, {}, True)
+        client.local_model.load_state_dict(strategy.global_model.state_dict())
+        with torch.no_grad():
+            for param in client.local_model.parameters():
+                param.add_(torch.randn_like(param) * 0.1)
+
+        payloads.append(client.get_bytes_local_payload())
+        local_models.append({name: value.clone() for name, value in client.local_model.state_dict().items()})
+
+    return payloads, local_models
+
+
+def aggregate(strategy, payloads: list, weights: list, shard=None, sample=None, order=None) -> None:
+    '''
+    Fold the client payloads into the strategy, in the given order of the clients
+    '''
+    strategy.begin_round(shard, sample)
+
+    for index in order if order is not None else range(len(payloads)):
+        strategy.fold(payloads[index], weights[index])
+
+    strategy.finalize()
@@ -0,0 +1,68 @@
+'''
+Tests of the deterministic aggregation mode, summing the clients in a fixed pairwise tree
+'''
+import numpy
+import torch
+from templates.modules.aggregator.flat_buffer import PairwiseSum, FlatAccumulator, ArrayAccumulator, weighted_sum
+from templates.tests.helpers import make_state_dicts, make_strategy, make_client_payloads, aggregate
+
+
+def test_pairwise_tree_only_depends_on_the_count():
+    values = [torch.tensor([1e8], dtype=torch.float32), torch.tensor([1.0]), torch.tensor([-1e8]),
+              torch.tensor([1.0]), torch.tensor([0.5])]
+
+    pairwise = PairwiseSum(torch.add)
+    for value in values:
+        pairwise.push(value)
+
+    a, b, c, d, e = values
+    assert torch.equal(pairwise.result(), ((a + b) + (c + d)) + e)
+
+
+def test_pairwise_holds_a_logarithmic_number_of_sums():
+    pairwise = PairwiseSum(lambda left, right: left + right)
+    for value in range(1, 101):
+        pairwise.push(value)
+
+    assert len(pairwise.partials) <= 7
+    assert pairwise.result() == 5050
+
+
+def test_pairwise_accumulator_is_reproducible():
+    state_dicts = make_state_dicts(7)
+    weights = [1 / 7] * 7
+
+    results = []
+    for _ in range(2):
+        accumulator = FlatAccumulator(pairwise=True)
+        for state_dict, weight in zip(state_dicts, weights):
+            accumulator.fold(state_dict, weight)
+        results.append(accumulator.result_flat())
+
+    assert torch.equal(results[0], results[1])
+
+    expected = weighted_sum(state_dicts, weights)
+    for name, value in accumulator.result().items():
+        assert torch.allclose(value.double(), expected[name].double(), atol=1e-6)
+
+
+def test_pairwise_arrays():
+    arrays_list = [[numpy.full(3, i, dtype=numpy.float64)] for i in range(5)]
+
+    accumulator = ArrayAccumulator(pairwise=True)
+    for arrays in arrays_list:
+        accumulator.fold(arrays, 0.2)
+
+    numpy.testing.assert_allclose(accumulator.result()[0], numpy.full(3, 2.0))
+
+
+def test_deterministic_workers_agree_bitwise():
+    workers = [make_strategy({'deterministic': True}) for _ in range(2)]
+    payloads, _ = make_client_payloads(workers[0], 5)
+    weights = [0.3, 0.1, 0.2, 0.25, 0.15]
+
+    for worker in workers:
+        aggregate(worker, payloads, weights)
+
+    first, second = (worker.global_model.state_dict() for worker in workers)
+    assert all(torch.equal(first[name], second[name]) for name in first)
@@ -0,0 +1,115 @@
+'''
+Tests of the digest consensus, verifying a proposed model by its sampled coordinates
+'''
+import importlib
+import math
+import pytest
+import torch
+from templates.modules.aggregator.flat_buffer import SampledAccumulator, FlatAccumulator, \
+    gather, get_layout, sample_indices
+from templates.modules.consensus import digest_2_3
+from templates.tests.helpers import make_state_dicts, make_strategy, make_client_payloads, aggregate
+
+
+def test_sample_indices_are_seeded():
+    indices = sample_indices(10000, 42, 256)
+
+    assert torch.equal(indices, sample_indices(10000, 42, 256))
+    assert not torch.equal(indices, sample_indices(10000, 43, 256))
+    assert torch.equal(indices, torch.unique(indices))
+    assert 0 <= int(indices.min()) and int(indices.max()) < 10000
+
+
+def test_sampled_sum_matches_the_full_sum():
+    state_dicts = make_state_dicts(4)
+    weights = [0.4, 0.3, 0.2, 0.1]
+    indices = sample_indices(get_layout(state_dicts[0]).numel, 7, 64)
+
+    full, sampled = FlatAccumulator(), SampledAccumulator(indices)
+    for state_dict, weight in zip(state_dicts, weights):
+        full.fold(state_dict, weight)
+        sampled.fold(state_dict, weight)
+
+    # also at the integer entries, which are truncated back
+    assert torch.allclose(sampled.result_flat(), gather(full.result(), indices), atol=1e-6)
+
+
+def test_pairwise_sampled_sum_is_the_same_bits():
+    state_dicts = make_state_dicts(5)
+    weights = [0.3, 0.1, 0.25, 0.2, 0.15]
+    indices = sample_indices(get_layout(state_dicts[0]).numel, 7, 64)
+
+    full, sampled = FlatAccumulator(pairwise=True), SampledAccumulator(indices, pairwise=True)
+    for state_dict, weight in zip(state_dicts, weights):
+        full.fold(state_dict, weight)
+        sampled.fold(state_dict, weight)
+
+    assert torch.equal(sampled.result_flat(), gather(full.result(), indices))
+
+
+def test_verifier_digest_matches_the_proposer():
+    proposer, verifier = make_strategy({'deterministic': True}), make_strategy({'deterministic': True})
+    payloads, _ = make_client_payloads(proposer, 5)
+    weights = [0.2, 0.3, 0.1, 0.25, 0.15]
+    sample = {'seed': 1234, 'count': 128}
+
+    aggregate(proposer, payloads, weights)
+    aggregate(verifier, payloads, weights, sample=sample)
+
+    assert verifier.get_digest(sample) == proposer.get_digest(sample)
+    assert digest_2_3.digests_match(verifier.get_digest(sample), proposer.get_digest(sample))
+
+
+def test_digest_of_another_model_does_not_match():
+    proposer, verifier = make_strategy({'deterministic': True}), make_strategy({'deterministic': True})
+    payloads, _ = make_client_payloads(proposer, 3)
+    sample = {'seed': 1234, 'count': 128}
+
+    aggregate(proposer, payloads, [0.2, 0.3, 0.5])
+    aggregate(verifier, payloads, [0.2, 0.3, 0.5 + 1e-6], sample=sample)
+
+    assert not digest_2_3.digests_match(verifier.get_digest(sample), proposer.get_digest(sample))
+
+
+def make_digest(values: list) -> dict:
+    return {'digest': {'seed': 1, 'count': len(values), 'values': values}}
+
+
+def test_proposed_param_is_accepted_by_two_thirds():
+    params = ['proposed', None, None]
+    extra_datas = [{**make_digest([1.0, 2.0]), 'epoch': 3}, make_digest([1.0, 2.0]), make_digest([5.0, 2.0])]
+
+    # the digest is not passed on with the global extra data
+    assert digest_2_3.consensus(params, extra_datas) == ('proposed', {'epoch': 3})
+
+
+def test_proposed_param_is_rejected_without_two_thirds():
+    params = ['proposed', None, None]
+    extra_datas = [make_digest([1.0, 2.0]), make_digest([1.5, 2.0]), make_digest([5.0, 2.0])]
+
+    with pytest.raises(ValueError):
+        digest_2_3.consensus(params, extra_datas)
+
+
+def test_digests_are_compared_exactly():
+    # one ulp off is a different model
+    assert digest_2_3.digests_match(make_digest([1.0, 2.0])['digest'], make_digest([1.0, 2.0])['digest'])
+    assert not digest_2_3.digests_match(make_digest([1.0, 2.0])['digest'],
+                                        make_digest([1.0, math.nextafter(2.0, 3.0)])['digest'])
+
+
+def test_full_params_without_digests():
+    assert digest_2_3.consensus(['a', 'a', 'b'], [None, None, None]) == ('a', None)
+
+    with pytest.raises(ValueError):
+        digest_2_3.consensus(['a', 'b', 'c'], [None, None, None])
+
+
+@pytest.mark.parametrize('module, supported', [('cifar10_cnn_fedavg', True), ('cifar10_cnn_moon', True),
+                                               ('cifar10_cnn_fedper', True), ('cifar10_cnn_fedavgm', False),
+                                               ('cifar10_cnn_scaffold', False), ('cifar10_cnn_fedavg_topk', False)])
+def test_only_sampled_aggregations_verify_digests(module, supported):
+    # strategies aggregating the full model would do all of the work of a proposer as a verifier
+    strategy = importlib.import_module(f'templates.strategy.{module}').StrategyDefinition
+
+    assert strategy.supports_digest == supported
@@ -0,0 +1,69 @@
+'''
+Tests of the FedRWA aggregator
+'''
+import torch
+from templates.modules.aggregator import fed_rwa
+from templates.tests.helpers import make_state_dicts
+
+
+def naive_similarities(client_params: list, global_params: dict):
+    '''
+    Layer-averaged cosine similarities, one client pair and one layer at a time
+    '''
+    cosine = torch.nn.CosineSimilarity(dim=0)
+    layers = [name for name, param in client_params[0].items() if torch.is_floating_point(param)]
+
+    sim_pairs = torch.zeros((len(client_params), len(client_params)), dtype=torch.float64)
+    sim_global = torch.zeros(len(client_params), dtype=torch.float64)
+
+    for i, theta_i in enumerate(client_params):
+        for name in layers:
+            sim_global[i] += cosine(theta_i[name].reshape(-1), global_params[name].reshape(-1)).item()
+            for j, theta_j in enumerate(client_params):
+                sim_pairs[i, j] += cosine(theta_i[name].reshape(-1), theta_j[name].reshape(-1)).item()
+
+    return sim_pairs / len(layers), sim_global / len(layers)
+
+
+def test_similarities_match_the_pairwise_cosines():
+    client_params = make_state_dicts(5)
+    global_params = make_state_dicts(1, seed=1)[0]
+
+    sim_pairs, sim_global = fed_rwa.layer_similarities(client_params, global_params)
+    expected_pairs, expected_global = naive_similarities(client_params, global_params)
+
+    assert torch.allclose(sim_pairs, expected_pairs, atol=1e-6)
+    assert torch.allclose(sim_global, expected_global, atol=1e-6)
+
+
+def test_zero_layers_do_not_divide_by_zero():
+    client_params = [{'w': torch.zeros(4)}, {'w': torch.ones(4)}]
+
+    sim_pairs, sim_global = fed_rwa.layer_similarities(client_params, {'w': torch.ones(4)})
+
+    assert torch.isfinite(sim_pairs).all() and torch.isfinite(sim_global).all()
+    assert sim_global.tolist() == [0.0, 1.0]
+
+
+def test_aggregator_reweights_the_clients():
+    torch.manual_seed(0)
+    model = torch.nn.Linear(6, 3)
+    client_params = [torch.nn.Linear(6, 3).state_dict() for _ in range(4)]
+    copies = [{name: value.clone() for name, value in params.items()} for params in client_params]
+    weights = [0.25] * 4
+    kwargs = {'fed_rwa': {'lambda_l': 0.5, 'lambda_g': 0.5}}
+
+    sim_pairs, sim_global = naive_similarities(client_params, model.state_dict())
+    sim_l = (sim_pairs.sum(dim=1) - sim_pairs.diagonal()) / 3
+    new_weights = [(0.5 * sl + 0.5 * sg) * w for sl, sg, w in zip(sim_l.tolist(), sim_global.tolist(), weights)]
+    new_weights = [w / sum(new_weights) for w in new_weights]
+
+    model = fed_rwa.aggregator(model, client_params, weights, None, kwargs=kwargs)
+
+    for name, value in model.state_dict().items():
+        expected = sum(w * params[name] for w, params in zip(new_weights, client_params))
+        assert torch.allclose(value, expected, atol=1e-5)
+
+    # the client parameters are left untouched
+    for params, copy in zip(client_params, copies):
+        assert all(torch.equal(params[name], copy[name]) for name in params)
@@ -0,0 +1,64 @@
+'''
+Tests of the flat-buffer aggregation engine
+'''
+import numpy
+import torch
+from templates.modules.aggregator import flat_buffer
+from templates.tests.helpers import make_state_dicts, naive_weighted_sum
+
+
+def test_weighted_sum_matches_the_naive_sum():
+    state_dicts = make_state_dicts(5)
+    weights = [0.1, 0.2, 0.3, 0.25, 0.15]
+
+    result = flat_buffer.weighted_sum(state_dicts, weights)
+    expected = naive_weighted_sum(state_dicts, weights)
+
+    for name, value in expected.items():
+        assert result[name].dtype == state_dicts[0][name].dtype
+        assert result[name].shape == state_dicts[0][name].shape
+
+        # integer entries are truncated back
+        if name == 'bn.num_batches_tracked':
+            assert result[name] == int(value)
+        else:
+            assert torch.allclose(result[name].double(), value, atol=1e-6)
+
+
+def test_clients_reduced_in_blocks(monkeypatch):
+    state_dicts = make_state_dicts(7)
+    weights = [1 / 7] * 7
+
+    full = flat_buffer.weighted_sum_flat(state_dicts, weights)
+
+    # a workspace of two client rows
+    numel = flat_buffer.get_layout(state_dicts[0]).numel
+    monkeypatch.setattr(flat_buffer, 'WORKSPACE_BYTES', 2 * numel * 4)
+
+    assert torch.allclose(flat_buffer.weighted_sum_flat(state_dicts, weights), full, atol=1e-6)
+
+
+def test_flatten_round_trip():
+    state_dict = make_state_dicts(1)[0]
+
+    restored = flat_buffer.unflatten(flat_buffer.flatten(state_dict), state_dict)
+
+    for name, value in state_dict.items():
+        assert torch.equal(restored[name], value)
+
+
+def test_layouts_are_cached_by_signature():
+    first, second = make_state_dicts(2)
+
+    assert flat_buffer.get_layout(first) is flat_buffer.get_layout(second)
+    assert flat_buffer.get_layout({'x': torch.zeros(3)}) is not flat_buffer.get_layout(first)
+
+
+def test_weighted_sum_arrays():
+    arrays_list = [[numpy.full((2, 3), i, dtype=numpy.float64), numpy.full(3, -i, dtype=numpy.float64)]
+                   for i in range(1, 4)]
+
+    coef, intercept = flat_buffer.weighted_sum_arrays(arrays_list, [0.5, 0.25, 0.25])
+
+    numpy.testing.assert_allclose(coef, numpy.full((2, 3), 1.75))
+    numpy.testing.assert_allclose(intercept, numpy.full(3, -1.75))
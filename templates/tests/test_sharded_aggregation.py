@@ -0,0 +1,106 @@
+'''
+Tests of the sharded aggregation, each worker aggregating a slice of the parameters
+'''
+import importlib
+import numpy
+import pytest
+import torch
+from templates.modules.aggregator.flat_buffer import FlatAccumulator, ArrayAccumulator, \
+    get_layout, shard_range
+from templates.tests.helpers import make_state_dicts, make_strategy, make_client_payloads, aggregate
+
+
+@pytest.mark.parametrize('numel, count', [(10, 3), (1000, 7), (5, 5), (3, 4)])
+def test_shards_cover_the_layout(numel, count):
+    ranges = [shard_range(numel, index, count) for index in range(count)]
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == numel
+    assert all(ranges[i][1] == ranges[i + 1][0] for i in range(count - 1))
+
+
+def test_sliced_sums_match_the_full_sum():
+    state_dicts = make_state_dicts(4)
+    weights = [0.1, 0.2, 0.3, 0.4]
+    numel = get_layout(state_dicts[0]).numel
+
+    full = FlatAccumulator()
+    slices = [FlatAccumulator('cpu', *shard_range(numel, index, 3)) for index in range(3)]
+    for state_dict, weight in zip(state_dicts, weights):
+        for accumulator in [full] + slices:
+            accumulator.fold(state_dict, weight)
+
+    stitched = torch.cat([accumulator.result_flat() for accumulator in slices])
+
+    assert torch.equal(stitched, full.result_flat())
+
+
+def test_workers_stitch_the_same_global_model():
+    reference = make_strategy()
+    payloads, _ = make_client_payloads(reference, 3)
+    weights = [0.5, 0.3, 0.2]
+
+    aggregate(reference, payloads, weights)
+
+    workers = [make_strategy() for _ in range(3)]
+    for index, worker in enumerate(workers):
+        aggregate(worker, payloads, weights, shard={'index': index, 'count': 3})
+
+    partial_payloads = [worker.get_bytes_partial_payload() for worker in workers]
+
+    for worker in workers:
+        worker.load_partial_payloads(partial_payloads)
+
+        for name, value in reference.global_model.state_dict().items():
+            assert torch.allclose(worker.global_model.state_dict()[name], value, atol=1e-6)
+
+
+def test_missing_slice_is_rejected():
+    workers = [make_strategy() for _ in range(3)]
+    payloads, _ = make_client_payloads(workers[0], 2)
+
+    for index, worker in enumerate(workers):
+        aggregate(worker, payloads, [0.5, 0.5], shard={'index': index, 'count': 3})
+
+    with pytest.raises(ValueError):
+        workers[0].load_partial_payloads([worker.get_bytes_partial_payload() for worker in workers[:2]])
+
+
+def test_empty_round_is_zeros():
+    like = make_state_dicts(1)[0]
+    numel = get_layout(like).numel
+
+    result = FlatAccumulator().result(like)
+    assert all(torch.equal(result[name], torch.zeros_like(value)) for name, value in like.items())
+
+    start, end = shard_range(numel, 1, 3)
+    assert torch.equal(FlatAccumulator('cpu', start, end).result_flat(like), torch.zeros(end - start))
+    assert torch.equal(FlatAccumulator(pairwise=True).result_flat(like), torch.zeros(numel))
+
+    arrays = ArrayAccumulator().result([numpy.ones((2, 3)), numpy.ones(3)])
+    assert [array.tolist() for array in arrays] == [numpy.zeros((2, 3)).tolist(), [0.0] * 3]
+
+
+def test_empty_round_without_a_layout():
+    with pytest.raises(ValueError):
+        FlatAccumulator().result()
+
+    with pytest.raises(ValueError):
+        ArrayAccumulator().result()
+
+
+def test_strategy_finalizes_an_empty_round():
+    strategy = make_strategy()
+
+    aggregate(strategy, [], [])
+
+    assert all(torch.count_nonzero(value) == 0 for value in strategy.global_model.state_dict().values())
+
+
+@pytest.mark.parametrize('module, supported', [('cifar10_cnn_fedavg', True), ('cifar10_cnn_moon', True),
+                                               ('cifar10_cnn_fedper', True), ('cifar10_cnn_fedavgm', False),
+                                               ('cifar10_cnn_scaffold', False), ('cifar10_cnn_fedavg_topk', False)])
+def test_only_partial_aggregations_are_sharded(module, supported):
+    # strategies aggregating the full model would publish it in place of a slice
+    strategy = importlib.import_module(f'templates.strategy.{module}').StrategyDefinition
+
+    assert strategy.supports_sharding == supported
@@ -0,0 +1,59 @@
+'''
+Tests of the streaming aggregation, folding the clients in one at a time
+'''
+import numpy
+import pytest
+import torch
+from templates.modules.aggregator.flat_buffer import FlatAccumulator, ArrayAccumulator, \
+    weighted_sum, weighted_sum_arrays
+from templates.tests.helpers import make_state_dicts, make_strategy, make_client_payloads, aggregate
+
+
+def test_folded_sum_matches_the_stacked_sum():
+    state_dicts = make_state_dicts(6)
+    weights = [0.3, 0.1, 0.1, 0.2, 0.2, 0.1]
+
+    accumulator = FlatAccumulator()
+    for state_dict, weight in zip(state_dicts, weights):
+        accumulator.fold(state_dict, weight)
+
+    result, expected = accumulator.result(), weighted_sum(state_dicts, weights)
+    for name, value in expected.items():
+        assert torch.allclose(result[name].double(), value.double(), atol=1e-6)
+
+
+def test_folded_arrays_match_the_stacked_sum():
+    arrays_list = [[numpy.full((2, 3), i, dtype=numpy.float64), numpy.full(3, -i, dtype=numpy.float64)]
+                   for i in range(1, 4)]
+    weights = [0.5, 0.25, 0.25]
+
+    accumulator = ArrayAccumulator()
+    for arrays, weight in zip(arrays_list, weights):
+        accumulator.fold(arrays, weight)
+
+    for result, expected in zip(accumulator.result(), weighted_sum_arrays(arrays_list, weights)):
+        numpy.testing.assert_allclose(result, expected)
+
+
+def test_different_layouts_are_not_folded():
+    accumulator = FlatAccumulator()
+    accumulator.fold({'x': torch.zeros(3)}, 1.0)
+
+    with pytest.raises(ValueError):
+        accumulator.fold({'x': torch.zeros(4)}, 1.0)
+
+
+def test_strategy_folds_the_client_payloads():
+    strategy = make_strategy()
+    payloads, local_models = make_client_payloads(strategy, 4)
+    weights = [0.4, 0.3, 0.2, 0.1]
+    originals = [bytes(payload) for payload in payloads]
+
+    aggregate(strategy, payloads, weights)
+
+    expected = weighted_sum(local_models, weights)
+    for name, value in strategy.global_model.state_dict().items():
+        assert torch.allclose(value, expected[name], atol=1e-6)
+
+    # the client payloads are folded without being modified
+    assert payloads == originals
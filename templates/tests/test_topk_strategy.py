@@ -0,0 +1,110 @@
+'''
+Tests of the FedAvg Aggregation of Top-k Sparsified Client Updates
+'''
+import math
+import torch
+from templates.strategy.cifar10_cnn_fedavg_topk import CIFAR10Strategy
+from templates.tests.helpers import make_strategy, make_client_payloads, aggregate
+
+
+def make_topk_client(global_state: dict, fraction: float, seed: int):
+    '''
+    Get a top-k client whose local model is the global model with a seeded perturbation
+    '''
+    client = CIFAR10Strategy({'client_extra_params': {'top_k': {'fraction': fraction}}}, {}, True)
+    client.global_model.load_state_dict(global_state)
+    client.local_model.load_state_dict(global_state)
+
+    torch.manual_seed(seed)
+    with torch.no_grad():
+        for param in client.local_model.parameters():
+            param.add_(torch.randn_like(param) * 0.1)
+
+    return client
+
+
+def get_deltas(client) -> dict:
+    global_state = client.global_model.state_dict()
+
+    return {name: (value - global_state[name]).reshape(-1)
+            for name, value in client.local_model.state_dict().items()}
+
+
+def sparsify(client) -> None:
+    client._CIFAR10Strategy__sparsify_update()
+
+
+def test_sparsify_keeps_the_top_k_entries():
+    torch.manual_seed(0)
+    client = make_topk_client(CIFAR10Strategy({}, {}, False).global_model.state_dict(), 0.1, 1)
+    deltas = get_deltas(client)
+
+    sparsify(client)
+
+    assert client.sparse_update.keys() == deltas.keys()
+    for name, update in client.sparse_update.items():
+        k = math.ceil(deltas[name].numel() * 0.1)
+        assert update['indices'].numel() == k
+        assert update['indices'].unique().numel() == k
+
+        # the kept entries are the largest ones by magnitude
+        assert torch.equal(update['values'], deltas[name][update['indices'].long()])
+        assert update['values'].abs().min() >= deltas[name].abs().topk(k).values.min()
+
+
+def test_dropped_entries_carry_over():
+    torch.manual_seed(0)
+    client = make_topk_client(CIFAR10Strategy({}, {}, False).global_model.state_dict(), 0.1, 1)
+    deltas = get_deltas(client)
+
+    sparsify(client)
+    first = {name: update['values'].clone() for name, update in client.sparse_update.items()}
+    first_indices = {name: update['indices'].long() for name, update in client.sparse_update.items()}
+
+    # nothing of the update is lost, it is either uploaded or in the residual
+    for name, delta in deltas.items():
+        uploaded = torch.zeros_like(delta).index_put_((first_indices[name],), first[name])
+        assert torch.allclose(uploaded + client._residuals[name], delta)
+
+    # the same update again, plus the residual of the previous round
+    sparsify(client)
+    for name, delta in deltas.items():
+        uploaded = torch.zeros_like(delta).index_put_((first_indices[name],), first[name])
+        uploaded.index_add_(0, client.sparse_update[name]['indices'].long(), client.sparse_update[name]['values'])
+        assert torch.allclose(uploaded + client._residuals[name], 2 * delta, atol=1e-6)
+
+
+def test_full_fraction_matches_fedavg():
+    fedavg = make_strategy()
+    payloads, local_models = make_client_payloads(fedavg, 3)
+    weights = [0.5, 0.3, 0.2]
+
+    torch.manual_seed(0)
+    strategy = CIFAR10Strategy({}, {}, False)
+    global_state = {name: value.clone() for name, value in fedavg.global_model.state_dict().items()}
+    strategy.global_model.load_state_dict(global_state)
+
+    # top-k clients with the same local models as the FedAvg ones, uploading all of their update
+    sparse_payloads = list()
+    for local_model in local_models:
+        client = CIFAR10Strategy({'client_extra_params': {'top_k': {'fraction': 1.0}}}, {}, True)
+        client.global_model.load_state_dict(global_state)
+        client.local_model.load_state_dict(local_model)
+        sparsify(client)
+
+        assert all(update['indices'].numel() == local_model[name].numel()
+                   for name, update in client.sparse_update.items())
+
+        sparse_payloads.append(client.get_bytes_local_payload())
+
+    aggregate(fedavg, payloads, weights)
+    aggregate(strategy, sparse_payloads, weights)
+
+    expected = fedavg.global_model.state_dict()
+    for name, value in strategy.global_model.state_dict().items():
+        assert torch.allclose(value, expected[name], atol=1e-6)
+
+
+def test_round_is_not_sharded():
+    assert not CIFAR10Strategy.supports_sharding
+    assert not CIFAR10Strategy.supports_digest